@@ -203,6 +203,26 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'io-executor': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'ipam': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'provisioning-jobs': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'retention': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
         'settings': {
             'handlers': ['console', 'file'],
             'level': 'INFO',
@@ -12,6 +12,7 @@ class CoreConfig(AppConfig):
         # Import here to avoid AppRegistryNotReady error
         from django.contrib.auth.models import User
         from core.settings import Settings
+        import core.signals
 
         # Set global state
         try:
@@ -1,6 +1,6 @@
 import re
 import ipaddress
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -11,12 +11,16 @@ class ImmutableFieldMixin:
     
     def save(self, *args, **kwargs):
         if self.pk:  # If the object exists in the database
-            original = self.__class__.objects.get(pk=self.pk)
-            for field in self.immutable_fields:
-                if getattr(original, field) != getattr(self, field):
-                    raise ValueError(f"{field} is immutable.")
+            self.validate_immutable_fields(self.__class__.objects.get(pk=self.pk))
         super().save(*args, **kwargs)
 
+    def validate_immutable_fields(self, original):
+        # Compare raw column values so foreign keys are not loaded
+        for field in self.immutable_fields:
+            attname = self._meta.get_field(field).attname
+            if getattr(original, attname) != getattr(self, attname):
+                raise ValueError(f"{field} is immutable.")
+
 class DefaultManager(models.Manager):
     def get_or_new(self, **kwargs):
         try:
@@ -103,6 +107,7 @@ class Router(models.Model):
     first_discovered = models.DateTimeField(auto_now_add=True, help_text="When this router was first discovered")
     last_discovered = models.DateTimeField(auto_now=True, help_text="When this router was last discovered")
     reachable = models.BooleanField(default=False, help_text="Whether the router is currently reachable")
+    config_fingerprints = models.JSONField(default=dict, help_text="Hash of each configuration subtree as of the last discovery")
 
     class Meta:
         verbose_name = "Router"
@@ -179,13 +184,14 @@ class Interface(ImmutableFieldMixin, models.Model):
     def __str__(self):
         return f"{self.router} - {self.name}"
 
-    def validate(self):
+    def validate(self, current=None):
+        # A preloaded snapshot of the stored interface can be passed to avoid reading it again
         if self.pk:
-            current = Interface.objects.get(pk=self.pk)
+            current = current or Interface.objects.get(pk=self.pk)
             if self.addressing == 'dhcp' and current.addressing == 'static':
                 self.ip_address = self.subnet_mask = None
 
-        if self.vrf and self.vrf.router != self.router:
+        if self.vrf and self.vrf.router_id != self.router_id:
             raise ValidationError(f"VRF '{self.vrf}' does not exist on router")
 
     def save(self, *args, **kwargs):
@@ -283,14 +289,6 @@ class Site(models.Model):
     def __str__(self):
         return f"{self.customer.name} - {self.name}"
     
-    def get_min_available_id(self):
-        # Get all used IDs and find the smallest missing positive integer
-        used_ids = set(Site.objects.values_list('id', flat=True))
-        i = 1
-        while i in used_ids:
-            i += 1
-        return i
-
     def validate(self):
         # Validate if the assigned interface belongs to a PE router
         if self.assigned_interface and self.assigned_interface.router.role != 'PE':
@@ -319,11 +317,35 @@ class Site(models.Model):
                 raise ValidationError(f"Link network is already in use by site '{conflicting_site.name}' for the same customer")
     
     def save(self, *args, **kwargs):
-        if not self.id:
-            self.id = self.get_min_available_id()
-        # Validate before saving
+        if self.id:
+            # Validate before saving
+            self.validate()
+            return super().save(*args, **kwargs)
+
+        # Validate before taking an ID so a rejected site does not use one up
         self.validate()
-        super().save(*args, **kwargs)
+
+        from core.modules.ipam import IPAM
+        for attempt in range(3):
+            self.id = IPAM.allocate_site_id()
+            try:
+                # Always insert, another process that took the same ID must never be overwritten
+                with transaction.atomic():
+                    return super().save(*args, **dict(kwargs, force_insert=True))
+            except IntegrityError as e:
+                # Only an ID taken outside this process can collide, it stays reserved
+                error = e
+                if not Site.objects.filter(pk=self.id).exists():
+                    IPAM.release_site_id(self.id)
+                    self.id = None
+                    raise
+            except Exception:
+                IPAM.release_site_id(self.id)
+                self.id = None
+                raise
+        # Every ID tried was taken elsewhere, the site was not saved
+        self.id = None
+        raise error
 
 class VPN(models.Model):
     name = models.CharField(max_length=255, help_text="VPN name")
@@ -427,8 +449,35 @@ class Notification(models.Model):
         self.acknowledged_at = timezone.now()
         self.save()
 
-class RouterMetric(models.Model):
-    router = models.ForeignKey('Router', on_delete=models.CASCADE, related_name='metrics')
+class ProvisioningJob(models.Model):
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, help_text="Provisioning workflow run by this job")
+    description = models.CharField(max_length=255, help_text="What the job does")
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued', help_text="Current job status")
+    devices = models.JSONField(default=list, help_text="Management addresses of the routers the job locks")
+    events = models.JSONField(default=list, help_text="Progress messages reported while the job ran")
+    result = models.JSONField(null=True, blank=True, help_text="Data returned by a successful job")
+    error = models.TextField(null=True, blank=True, help_text="Why the job failed")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When this job was queued")
+    started_at = models.DateTimeField(null=True, blank=True, help_text="When this job started running")
+    finished_at = models.DateTimeField(null=True, blank=True, help_text="When this job finished")
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+
+class RouterMetricValues(models.Model):
     cpu_usage_5s = models.FloatField(help_text="5-second CPU usage percentage")
     cpu_usage_1m = models.FloatField(help_text="1-minute CPU usage percentage")
     cpu_usage_5m = models.FloatField(help_text="5-minute CPU usage percentage")
@@ -442,6 +491,12 @@ class RouterMetric(models.Model):
     storage_free = models.BigIntegerField(help_text="Free storage in KB")
     timestamp = models.DateTimeField(default=timezone.now, help_text="When this metric was collected")
     
+    class Meta:
+        abstract = True
+
+class RouterMetric(RouterMetricValues):
+    router = models.ForeignKey('Router', on_delete=models.CASCADE, related_name='metrics')
+    
     class Meta:
         ordering = ['-timestamp']
         indexes = [
@@ -451,8 +506,7 @@ class RouterMetric(models.Model):
     def __str__(self):
         return f"{self.router.hostname} - {self.timestamp}"
 
-class InterfaceMetric(models.Model):
-    interface = models.ForeignKey('Interface', on_delete=models.CASCADE, related_name='metrics')
+class InterfaceMetricValues(models.Model):
     operational_status = models.CharField(max_length=50, help_text="Operational status of the interface")
     in_octets = models.BigIntegerField(help_text="Input octets")
     out_octets = models.BigIntegerField(help_text="Output octets")
@@ -464,6 +518,12 @@ class InterfaceMetric(models.Model):
     bps_out = models.BigIntegerField(help_text="Bits per second out")
     timestamp = models.DateTimeField(default=timezone.now, help_text="When this metric was collected")
     
+    class Meta:
+        abstract = True
+
+class InterfaceMetric(InterfaceMetricValues):
+    interface = models.ForeignKey('Interface', on_delete=models.CASCADE, related_name='metrics')
+    
     class Meta:
         ordering = ['-timestamp']
         indexes = [
@@ -471,4 +531,53 @@ class InterfaceMetric(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.interface} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.interface} - {self.timestamp}"
+
+class LatestRouterMetric(RouterMetricValues):
+    router = models.OneToOneField('Router', on_delete=models.CASCADE, primary_key=True, related_name='latest_metric')
+    metric_id = models.BigIntegerField(help_text="Id of the RouterMetric this sample was copied from")
+    
+    def __str__(self):
+        return f"{self.router.hostname} - {self.timestamp} (latest)"
+
+class LatestInterfaceMetric(InterfaceMetricValues):
+    interface = models.OneToOneField('Interface', on_delete=models.CASCADE, primary_key=True, related_name='latest_metric')
+    metric_id = models.BigIntegerField(help_text="Id of the InterfaceMetric this sample was copied from")
+    
+    def __str__(self):
+        return f"{self.interface} - {self.timestamp} (latest)"
+
+class RouterMetricRollup(models.Model):
+    RESOLUTIONS = [(60, '1 minute'), (300, '5 minutes'), (3600, '1 hour')]
+
+    router = models.ForeignKey('Router', on_delete=models.CASCADE, related_name='metric_rollups')
+    resolution = models.PositiveIntegerField(choices=RESOLUTIONS, help_text="Bucket width in seconds")
+    bucket = models.DateTimeField(help_text="Start of the aggregated time bucket")
+    count = models.PositiveIntegerField(default=0, help_text="Number of samples in the bucket")
+    values = models.JSONField(default=dict, help_text="Min, max, sum and last value of every metric field")
+    last_timestamp = models.DateTimeField(help_text="Timestamp of the last sample in the bucket")
+
+    class Meta:
+        ordering = ['-bucket']
+        unique_together = [['router', 'resolution', 'bucket']]
+
+    def __str__(self):
+        return f"{self.router.hostname} - {self.bucket} ({self.resolution}s)"
+
+class InterfaceMetricRollup(models.Model):
+    RESOLUTIONS = [(60, '1 minute'), (300, '5 minutes'), (3600, '1 hour')]
+
+    interface = models.ForeignKey('Interface', on_delete=models.CASCADE, related_name='metric_rollups')
+    resolution = models.PositiveIntegerField(choices=RESOLUTIONS, help_text="Bucket width in seconds")
+    bucket = models.DateTimeField(help_text="Start of the aggregated time bucket")
+    count = models.PositiveIntegerField(default=0, help_text="Number of samples in the bucket")
+    values = models.JSONField(default=dict, help_text="Min, max, sum and last value of every metric field")
+    operational_status = models.CharField(max_length=50, help_text="Last operational status in the bucket")
+    last_timestamp = models.DateTimeField(help_text="Timestamp of the last sample in the bucket")
+
+    class Meta:
+        ordering = ['-bucket']
+        unique_together = [['interface', 'resolution', 'bucket']]
+
+    def __str__(self):
+        return f"{self.interface} - {self.bucket} ({self.resolution}s)"
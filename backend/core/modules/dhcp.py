@@ -3,9 +3,12 @@ import struct
 import logging
 import ipaddress
 from threading import Thread, Event
-from django.utils import timezone
-from core.models import DHCPLease, DHCPScope
+from collections import namedtuple
+from core.models import DHCPLease
 from core.modules.scheduler import Scheduler
+from core.modules.dhcp_leases import Leases
+from core.modules.dhcp_scopes import Scopes
+from core.modules.dhcp_workers import PacketWorkers
 from core.settings import get_settings
 
 # DHCP Message Type Options
@@ -33,6 +36,21 @@ DHCP_TFTP_SERVER_IP = 150
 # Fixed config filename
 CONFIG_FILENAME = "router-confg"
 
+MAGIC_COOKIE = b'\x63\x82\x53\x63'
+
+# Everything the handlers need from a client packet, decoded in a single pass
+DHCPPacket = namedtuple('DHCPPacket', [
+    'data', 'xid', 'raw_giaddr', 'giaddr', 'chaddr', 'client_mac', 'message_type', 'hostname', 'requested_ip', 'options'
+])
+
+# Packet engines, packets are either handled on the receive thread or by MAC-sharded workers
+ENGINE_INLINE = 'inline'
+ENGINE_WORKERS = 'workers'
+
+# Largest datagram read and kernel receive buffer, sized for bursts of mass ZTP boots
+MAX_PACKET_SIZE = 4096
+SOCKET_RECEIVE_BUFFER = 4 * 1024 * 1024
+
 class _DHCPServer:
     def __init__(self): 
         self.server_ip = None
@@ -45,6 +63,12 @@ class _DHCPServer:
         self.sock = None
         self.server_thread = None
         self.stop_event = Event()
+        self.engine = ENGINE_WORKERS
+        self.workers = None
+        self.reply_template = None  # Reply with the options that only depend on the server configuration
+        self.reply_offsets = {}
+        self.leases = Leases
+        self.scopes = Scopes
         self.logger = logging.getLogger('dhcp')
     
     def ip_to_int(self, ip):
@@ -57,181 +81,169 @@ class _DHCPServer:
         return DHCPLease.objects.filter(active=True)
     
     def get_lease_by_mac(self, mac_address):
-        try:
-            return DHCPLease.objects.get(mac_address=mac_address)
-        except DHCPLease.DoesNotExist:
-            return None
+        return self.leases.get(mac_address)
     
-    def get_available_ip(self, client_mac, relay_ip=None):
-        # First, check if client already has a lease
-        existing_lease = self.get_lease_by_mac(client_mac)
-        if existing_lease:
-            # Find the scope this IP belongs to
-            ip_obj = ipaddress.ip_address(existing_lease.ip_address)
-            
-            # Check secondary scopes first
-            for scope in DHCPScope.objects.all():
-                network = ipaddress.IPv4Network(f"{scope.network}/{scope.subnet_mask}", strict=False)
-                if ip_obj in network:
-                    return existing_lease.ip_address, scope.subnet_mask
-            
-            # If not in any secondary scope, must be in main scope
-            return existing_lease.ip_address, self.main_scope_subnet_mask
+    def get_available_ip(self, client_mac, relay_ip=None, xid=None):
+        # Given a transaction ID, the address is also reserved for that transaction as it is chosen
         
-        # Get all active leases
-        active_leases = set(lease.ip_address for lease in self.get_active_leases_from_db())
+        # First, check if client already has a lease whose address nobody else took since
+        existing_lease = self.get_lease_by_mac(client_mac)
+        if existing_lease and self.leases.holder(existing_lease.ip_address) in (None, client_mac):
+            # Check secondary scopes first, if not in any secondary scope it must be in the main scope
+            scope = self.scopes.find(existing_lease.ip_address)
+            subnet_mask = scope.subnet_mask if scope else self.main_scope_subnet_mask
+            if xid is None or self.leases.offer(client_mac, xid, existing_lease.ip_address, subnet_mask):
+                return existing_lease.ip_address, subnet_mask
         
         # If no relay agent is involved, only check the main scope
         if not relay_ip or relay_ip == '0.0.0.0':
-            network = ipaddress.IPv4Network(f"{self.main_scope_address}/{self.main_scope_subnet_mask}", strict=False)
-            
-            # Normal IP allocation for main scope
-            for ip in network.hosts():
-                ip_str = str(ip)
-                
-                # Skip server IP
-                if (ip_str == self.server_ip or 
-                    ip_str in active_leases):
-                    continue
-                
+            if xid is None:
+                ip_str = self.leases.next_free()
+            else:
+                ip_str = self.leases.offer_next_free(client_mac, xid, self.main_scope_subnet_mask)
+            if ip_str:
                 return ip_str, self.main_scope_subnet_mask
             
             return None, None
         
-        # If relay agent is involved, find the matching secondary scope
-        secondary_scopes = DHCPScope.objects.all()
-        for scope in secondary_scopes:
-            # Check if the scope is active
-            if not scope.is_active:
-                continue
-
-            network = ipaddress.IPv4Network(f"{scope.network}/{scope.subnet_mask}", strict=False)
+        # If relay agent is involved, find the active secondary scope holding the relay IP
+        scope = self.scopes.find(relay_ip, active_only=True)
+        if scope:
+            # Offer the last host address of this scope
+            last_host = self.scopes.last_host(scope)
+            
+            # Check if last host is available
+            if self.leases.holder(last_host) in (None, client_mac) and (xid is None or self.leases.offer(client_mac, xid, last_host, scope.subnet_mask)):
+                return last_host, scope.subnet_mask
             
-            # Check if relay IP is in this scope
-            if ipaddress.ip_address(relay_ip) in network:
-                # Offer the last host address of this scope
-                last_host = str(list(network.hosts())[-1])
-                
-                # Check if last host is available
-                if last_host not in active_leases:
-                    return last_host, scope.subnet_mask
-                
-                # If last host is not available, return None
-                return None, None
+            # If last host is not available, return None
+            return None, None
         
         # If no matching scope found for relay IP
         return None, None
     
     def create_or_update_lease(self, mac_address, ip_address, hostname=None):
-        updated = DHCPLease.objects.filter(mac_address=mac_address).update(
-            ip_address=ip_address,
-            hostname=hostname or 'Unknown',
-            active=True,
-            last_updated=timezone.now()
-        )
-        
-        if not updated:
-            DHCPLease.objects.create(
-                mac_address=mac_address,
-                ip_address=ip_address,
-                hostname=hostname or 'Unknown',
-                active=True,
-                last_updated=timezone.now()
-            )
+        # Returns whether the address was leased and the previous lease of the client
+        return self.leases.commit(mac_address, ip_address, hostname)
     
     def delete_lease(self, mac_address):
         # Instead of deleting, mark as inactive
-        DHCPLease.objects.filter(mac_address=mac_address).update(active=False)
+        return self.leases.release(mac_address)
     
-    def create_dhcp_packet(self, client_packet, message_type, yiaddr='0.0.0.0', subnet_mask=None):
-        xid = client_packet[4:8]
-        client_mac = client_packet[28:34]
-        giaddr = client_packet[24:28]
-        
+    def build_reply_template(self):
+        # Fixed header fields and options of every reply, only the per-client fields are filled in later
+        options = bytearray()
+        options += struct.pack('!BB', DHCP_MESSAGE_TYPE, 1)
+        message_type_offset = 240 + len(options)
+        options += b'\x00'
+        options += struct.pack('!BB4s', DHCP_SERVER_ID, 4, socket.inet_aton(self.server_ip))
+        options += struct.pack('!BBI', DHCP_LEASE_TIME, 4, self.lease_time)
+        options += struct.pack('!BB', DHCP_SUBNET_MASK, 4)
+        subnet_mask_offset = 240 + len(options)
+        options += b'\x00' * 4
+        options += struct.pack('!BB4s', DHCP_ROUTER, 4, socket.inet_aton(self.server_ip))
+        options += struct.pack('!BB4s', DHCP_DNS, 4, socket.inet_aton(self.server_ip))
+        options += struct.pack('!BB4s', DHCP_TFTP_SERVER_IP, 4, socket.inet_aton(self.tftp_server_ip))
+        options += struct.pack('!BB', DHCP_BOOTFILE, len(self.config_filename))
+        options += self.config_filename.encode('ascii')
+        options += struct.pack('!B', DHCP_END)
+
+        template = bytearray(max(300, 240 + len(options)))
+        struct.pack_into('!BBBB', template, 0, 2, 1, 6, 0)
+        struct.pack_into('!H', template, 10, 0x8000)
+        struct.pack_into('!4s', template, 20, socket.inet_aton(self.server_ip))
+        template[236:240] = MAGIC_COOKIE
+        template[240:240 + len(options)] = options
+
+        self.reply_template = template
+        self.reply_offsets = {
+            'message_type': message_type_offset,
+            'subnet_mask': subnet_mask_offset,
+            'main_subnet_mask': socket.inet_aton(self.main_scope_subnet_mask)
+        }
+
+    def create_dhcp_packet(self, packet, message_type, yiaddr='0.0.0.0', subnet_mask=None):
+        if self.reply_template is None:
+            self.build_reply_template()
+
+        reply = bytearray(self.reply_template)
+        struct.pack_into('!4s', reply, 4, packet.xid)
+        struct.pack_into('!4s', reply, 16, socket.inet_aton(yiaddr))
+        struct.pack_into('!4s6s', reply, 24, packet.raw_giaddr, packet.chaddr)
+        struct.pack_into('!B', reply, self.reply_offsets['message_type'], message_type)
         # If no specific subnet mask is provided, use the main one
-        if subnet_mask is None:
-            subnet_mask = self.main_scope_subnet_mask
-        
-        packet = b''
-        packet += b'\x02'
-        packet += b'\x01'
-        packet += b'\x06'
-        packet += b'\x00'
-        packet += xid
-        packet += b'\x00\x00'
-        packet += b'\x80\x00'
-        packet += b'\x00\x00\x00\x00'
-        packet += socket.inet_aton(yiaddr)
-        packet += socket.inet_aton(self.server_ip)
-        packet += giaddr
-        
-        packet += client_mac + b'\x00' * 10
-        packet += b'\x00' * 64
-        packet += b'\x00' * 128
-        packet += b'\x63\x82\x53\x63'
-        
-        packet += struct.pack('!BBB', DHCP_MESSAGE_TYPE, 1, message_type)
-        packet += struct.pack('!BB4s', DHCP_SERVER_ID, 4, socket.inet_aton(self.server_ip))
-        packet += struct.pack('!BBI', DHCP_LEASE_TIME, 4, self.lease_time)
-        packet += struct.pack('!BB4s', DHCP_SUBNET_MASK, 4, socket.inet_aton(subnet_mask))
-        packet += struct.pack('!BB4s', DHCP_ROUTER, 4, socket.inet_aton(self.server_ip))
-        packet += struct.pack('!BB4s', DHCP_DNS, 4, socket.inet_aton(self.server_ip))
-        packet += struct.pack('!BB4s', DHCP_TFTP_SERVER_IP, 4, socket.inet_aton(self.tftp_server_ip))
-        
-        packet += struct.pack('!BB', DHCP_BOOTFILE, len(self.config_filename))
-        packet += self.config_filename.encode('ascii')
-        
-        packet += struct.pack('!B', DHCP_END)
-        
-        if len(packet) < 300:
-            packet += b'\x00' * (300 - len(packet))
-            
-        return packet
+        struct.pack_into(
+            '!4s', reply, self.reply_offsets['subnet_mask'],
+            socket.inet_aton(subnet_mask) if subnet_mask is not None else self.reply_offsets['main_subnet_mask']
+        )
+        return reply
     
-    def parse_dhcp_options(self, data):
+    def parse_packet(self, data):
+        # Decodes the fixed fields and every option in one pass, option values are views into the datagram
+        if len(data) < 240 or data[236:240] != MAGIC_COOKIE:
+            return None
+
+        view = memoryview(data)
         options = {}
-        options_start = data.find(b'\x63\x82\x53\x63') + 4
-        i = options_start
-        
-        while i < len(data) and data[i] != DHCP_END:
+        hostname = 'Unknown'
+        requested_ip = None
+        message_type = None
+        length = len(data)
+        i = 240
+
+        while i < length:
             option = data[i]
+            if option == DHCP_END:
+                break
             if option == 0:
                 i += 1
                 continue
-            
-            if i + 1 >= len(data):
+            if i + 1 >= length:
                 break
-                
-            length = data[i+1]
-            value = data[i+2:i+2+length]
+
+            size = data[i + 1]
+            value = view[i + 2:i + 2 + size]
             options[option] = value
-            i += 2 + length
-        
-        return options
+            if option == DHCP_MESSAGE_TYPE and size:
+                message_type = value[0]
+            elif option == DHCP_HOSTNAME and hostname == 'Unknown':
+                hostname = bytes(value).decode('utf-8', errors='ignore')
+            elif option == DHCP_REQUESTED_IP and size == 4:
+                requested_ip = socket.inet_ntoa(value)
+            i += 2 + size
+
+        chaddr = bytes(view[28:34])
+        raw_giaddr = bytes(view[24:28])
+        return DHCPPacket(
+            data=view,
+            xid=bytes(view[4:8]),
+            raw_giaddr=raw_giaddr,
+            giaddr=socket.inet_ntoa(raw_giaddr),
+            chaddr=chaddr,
+            client_mac=chaddr.hex(':'),
+            message_type=message_type,
+            hostname=hostname,
+            requested_ip=requested_ip,
+            options=options
+        )
     
-    def process_dhcp_discover(self, data, addr, giaddr):
+    def process_dhcp_discover(self, packet, addr):
         self.logger.info('Processing DHCP DISCOVER')
-        client_mac = data[28:34].hex(':')
-        
-        hostname = 'Unknown'
-        options_start = data.find(b'\x63\x82\x53\x63') + 4
-        i = options_start
-        
-        while i < len(data) and data[i] != DHCP_END:
-            option = data[i]
-            if option == DHCP_HOSTNAME:
-                length = data[i+1]
-                hostname = data[i+2:i+2+length].decode('utf-8', errors='ignore')
-                break
-            elif option == 0:
-                i += 1
-                continue
-            else:
-                length = data[i+1]
-                i += 2 + length
-        
-        # If a relay agent is involved, pass its IP
-        ip_to_offer, subnet_mask = self.get_available_ip(client_mac, relay_ip=giaddr if giaddr != '0.0.0.0' else None)
+        client_mac = packet.client_mac
+        hostname = packet.hostname
+        giaddr = packet.giaddr
+        
+        # A client retransmitting its DISCOVER is offered the address it was already offered
+        offer = self.leases.get_offer(client_mac)
+        if offer and self.leases.offer(client_mac, packet.xid, offer.ip_address, offer.subnet_mask):
+            ip_to_offer, subnet_mask = offer.ip_address, offer.subnet_mask
+        else:
+            # If a relay agent is involved, pass its IP, the address is reserved so no other client is offered it
+            ip_to_offer, subnet_mask = self.get_available_ip(
+                client_mac,
+                relay_ip=giaddr if giaddr != '0.0.0.0' else None,
+                xid=packet.xid
+            )
         
         if not ip_to_offer:
             self.logger.warning(f'No available IP addresses for client {client_mac} (Hostname: {hostname})')
@@ -239,7 +251,7 @@ class _DHCPServer:
         
         self.logger.info(f'Offering IP {ip_to_offer}/{subnet_mask} to client {client_mac} (Hostname: {hostname})')
         
-        offer_packet = self.create_dhcp_packet(data, DHCP_OFFER, ip_to_offer, subnet_mask)
+        offer_packet = self.create_dhcp_packet(packet, DHCP_OFFER, ip_to_offer, subnet_mask)
         
         if giaddr != '0.0.0.0':
             self.logger.info(f'Sending offer via relay agent at {giaddr}')
@@ -247,54 +259,43 @@ class _DHCPServer:
         else:
             self.sock.sendto(offer_packet, ('255.255.255.255', 68))
     
-    def process_dhcp_request(self, data, addr):
+    def process_dhcp_request(self, packet, addr):
         self.logger.info('Processing DHCP REQUEST')
-        client_mac = data[28:34].hex(':')
-        
-        hostname = 'Unknown'
-        requested_ip = None
-        options_start = data.find(b'\x63\x82\x53\x63') + 4
-        i = options_start
-        giaddr = socket.inet_ntoa(data[24:28])
-        
-        while i < len(data) and data[i] != DHCP_END:
-            option = data[i]
-            if option == DHCP_HOSTNAME:
-                length = data[i+1]
-                hostname = data[i+2:i+2+length].decode('utf-8', errors='ignore')
-                i += 2 + length
-            elif option == DHCP_REQUESTED_IP:
-                length = data[i+1]
-                requested_ip = socket.inet_ntoa(data[i+2:i+2+length])
-                i += 2 + length
-            elif option == 0:
-                i += 1
-                continue
-            else:
-                length = data[i+1]
-                i += 2 + length
-        
-        # If a relay agent is involved, pass its IP
-        available_ip, subnet_mask = self.get_available_ip(
-            client_mac, 
-            relay_ip=giaddr if giaddr != '0.0.0.0' else None
-        )
+        client_mac = packet.client_mac
+        hostname = packet.hostname
+        requested_ip = packet.requested_ip
+        giaddr = packet.giaddr
+        
+        # The address offered in this transaction is already reserved for the client
+        offer = self.leases.get_offer(client_mac, packet.xid)
+        if offer:
+            available_ip, subnet_mask = offer.ip_address, offer.subnet_mask
+        else:
+            # If a relay agent is involved, pass its IP
+            available_ip, subnet_mask = self.get_available_ip(
+                client_mac, 
+                relay_ip=giaddr if giaddr != '0.0.0.0' else None
+            )
         
+        claimed, previous_lease = False, None
         if available_ip and (not requested_ip or available_ip == requested_ip):
-            # Check if this is the first time this MAC has received a lease
-            is_first_time = not self.get_lease_by_mac(client_mac)
-            self.create_or_update_lease(
+            # Another worker may have leased the address to another client in the meantime
+            claimed, previous_lease = self.create_or_update_lease(
                 mac_address=client_mac,
                 ip_address=available_ip,
                 hostname=hostname
             )
+        
+        if claimed:
+            # Check if this is the first time this MAC has received a lease
+            is_first_time = not previous_lease
             
             self.logger.info(f'Acknowledging IP {available_ip}/{subnet_mask} to client {client_mac} (Hostname: {hostname})')
             
             # Schedule discovery with is_first_time flag
             Scheduler.schedule_discovery(available_ip, is_first_time=is_first_time)
             
-            ack_packet = self.create_dhcp_packet(data, DHCP_ACK, available_ip, subnet_mask)
+            ack_packet = self.create_dhcp_packet(packet, DHCP_ACK, available_ip, subnet_mask)
             
             if giaddr != '0.0.0.0':
                 self.sock.sendto(ack_packet, (giaddr, 67))
@@ -303,56 +304,49 @@ class _DHCPServer:
         else:
             self.logger.warning(f'Requested IP {requested_ip} not available for client {client_mac}')
             
-            nak_packet = self.create_dhcp_packet(data, DHCP_NAK)
+            nak_packet = self.create_dhcp_packet(packet, DHCP_NAK)
             
             if giaddr != '0.0.0.0':
                 self.sock.sendto(nak_packet, (giaddr, 67))
             else:
                 self.sock.sendto(nak_packet, ('255.255.255.255', 68))
     
-    def process_dhcp_release(self, data, addr):
+    def process_dhcp_release(self, packet, addr):
         self.logger.info('Processing DHCP RELEASE')
-        client_mac = data[28:34].hex(':')
+        client_mac = packet.client_mac
         
-        lease = self.get_lease_by_mac(client_mac)
+        lease = self.delete_lease(client_mac)
         if lease:
             released_ip = lease.ip_address
             hostname = lease.hostname
             self.logger.info(f'Client {client_mac} (Hostname: {hostname}) released IP {released_ip}')
-            
-            self.delete_lease(client_mac)
     
     def process_packet(self, data, addr):
-        if len(data) < 240:
-            return
-            
-        if data[236:240] != b'\x63\x82\x53\x63':
+        packet = self.parse_packet(data)
+        if packet is None:
             return
-            
-        giaddr = socket.inet_ntoa(data[24:28])
-        
-        options = self.parse_dhcp_options(data)
         
-        if DHCP_MESSAGE_TYPE in options:
-            message_type = options[DHCP_MESSAGE_TYPE][0]
-            
-            if message_type == DHCP_DISCOVER:
-                self.process_dhcp_discover(data, addr, giaddr)
-            elif message_type == DHCP_REQUEST:
-                self.process_dhcp_request(data, addr)
-            elif message_type == DHCP_RELEASE:
-                self.process_dhcp_release(data, addr)
+        if packet.message_type == DHCP_DISCOVER:
+            self.process_dhcp_discover(packet, addr)
+        elif packet.message_type == DHCP_REQUEST:
+            self.process_dhcp_request(packet, addr)
+        elif packet.message_type == DHCP_RELEASE:
+            self.process_dhcp_release(packet, addr)
     
     def server_loop(self):
         self.logger.info(f'DHCP server running on {self.server_ip}')
         self.logger.info(f'Main scope: {str(ipaddress.IPv4Network(f"{self.main_scope_address}/{self.main_scope_subnet_mask}", strict=False))}')
+        self.logger.info(f'Packet engine: {self.engine}')
         
         try:
             self.sock.settimeout(1)
             while not self.stop_event.is_set():
                 try:
-                    data, addr = self.sock.recvfrom(1024)
-                    self.process_packet(data, addr)
+                    data, addr = self.sock.recvfrom(MAX_PACKET_SIZE)
+                    if self.workers:
+                        self.workers.submit(data, addr)
+                    else:
+                        self.process_packet(data, addr)
                 except socket.timeout:
                     continue
         
@@ -360,13 +354,21 @@ class _DHCPServer:
             self.logger.error(f'Error in DHCP server: {e}')
             
         finally:
+            # Let the workers finish what they were handed before the socket goes away
+            if self.workers:
+                self.workers.stop()
+                self.workers = None
+            try:
+                self.leases.flush()
+            except Exception as e:
+                self.logger.error(f'Failed to save DHCP leases: {e}')
             if self.sock:
                 self.sock.close()
                 self.sock = None
             self.running = False
             self.logger.info('DHCP server stopped')
     
-    def start(self, server_ip=None, tftp_server_ip=None, main_scope_address=None, main_scope_subnet_mask=None, config_filename=CONFIG_FILENAME):
+    def start(self, server_ip=None, tftp_server_ip=None, main_scope_address=None, main_scope_subnet_mask=None, config_filename=CONFIG_FILENAME, engine=ENGINE_WORKERS, workers=4):
         if self.running:
             self.logger.warning("DHCP server is already running")
             return False
@@ -384,6 +386,14 @@ class _DHCPServer:
             self.main_scope_address = main_scope_address or settings.dhcp_provider_network_address
             self.main_scope_subnet_mask = main_scope_subnet_mask or settings.dhcp_provider_network_subnet_mask
             self.config_filename = config_filename
+            self.build_reply_template()
+            
+            # Load the leases once, they are served from memory from now on
+            self.leases.load(
+                ipaddress.IPv4Network(f"{self.main_scope_address}/{self.main_scope_subnet_mask}", strict=False),
+                reserved=[self.server_ip]
+            )
+            self.scopes.load()
             
             self.stop_event.clear()
             
@@ -391,8 +401,14 @@ class _DHCPServer:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RECEIVE_BUFFER)
             self.sock.bind((self.server_ip, 67))
             
+            self.engine = engine
+            if engine == ENGINE_WORKERS:
+                self.workers = PacketWorkers(self.process_packet, workers=workers)
+                self.workers.start()
+            
             self.running = True
             self.server_thread = Thread(target=self.server_loop, daemon=True)
             self.server_thread.start()
@@ -400,6 +416,9 @@ class _DHCPServer:
             
         except Exception as e:
             self.logger.error(f"Failed to start DHCP server: {e}")
+            if self.workers:
+                self.workers.stop()
+                self.workers = None
             if self.sock:
                 self.sock.close()
                 self.sock = None
@@ -436,18 +455,20 @@ class _DHCPServer:
             "config": {
                 "server_ip": self.server_ip,
                 "main_scope": str(ipaddress.IPv4Network(f"{self.main_scope_address}/{self.main_scope_subnet_mask}", strict=False)),
-                "tftp_server_ip": self.tftp_server_ip
-            } if self.running else None
+                "tftp_server_ip": self.tftp_server_ip,
+                "engine": self.engine
+            } if self.running else None,
+            "engine": self.workers.get_stats() if self.workers else None
         }
         return status
     
     def get_active_leases(self):
         leases = {}
-        for lease in self.get_active_leases_from_db():
+        for lease in (self.leases.get_active() if self.leases.loaded else self.get_active_leases_from_db()):
             leases[lease.mac_address] = {
                 'ip': lease.ip_address,
                 'hostname': lease.hostname,
-                'active': lease.is_active
+                'active': lease.active
             }
         return leases
 
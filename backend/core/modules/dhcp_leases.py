@@ -0,0 +1,272 @@
+import time
+import socket
+import struct
+import logging
+import threading
+from collections import namedtuple
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+from core.models import DHCPLease
+
+Lease = namedtuple('Lease', ['mac_address', 'ip_address', 'hostname', 'active'])
+Offer = namedtuple('Offer', ['xid', 'ip_address', 'subnet_mask', 'expires'])
+
+def ip_to_int(ip):
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+def int_to_ip(ip_int):
+    return socket.inet_ntoa(struct.pack('!I', ip_int))
+
+class LeaseStore:
+    # Authoritative copy of the DHCP leases, changes are written behind to the database in batches
+    def __init__(self, flush_interval=0.5, offer_ttl=60, sweep_interval=5):
+        self.logger = logging.getLogger('dhcp')
+        self.lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self.pending = {}  # Latest unsaved state of every changed lease, keyed by MAC address
+        self.flush_lock = threading.Lock()  # Keeps flushes in order
+        self.flushing = {}  # Leases the running flush is saving, keyed by MAC address
+        self.forgotten = set()  # MAC addresses forgotten while the running flush was saving them
+        self.flush_event = threading.Event()
+        self.flusher = None
+        self.offer_ttl = offer_ttl
+        self.sweep_interval = sweep_interval
+        self.sweeper = None
+        self.offers = {}  # Address reserved by every outstanding offer, keyed by MAC address
+        self.offered = {}  # MAC address every offered IP address is reserved for
+        self.leases = {}  # Lease of every known client, keyed by MAC address
+        self.addresses = {}  # MAC address holding every actively leased IP address
+        self.base = 0  # First address of the main scope
+        self.used = bytearray()  # One byte per main scope address, set while it cannot be offered
+        self.cursor = 0  # No main scope address below this one is free
+        self.loaded = False
+
+    def load(self, network, reserved=()):
+        leases = {
+            lease.mac_address: Lease(lease.mac_address, lease.ip_address, lease.hostname, lease.active)
+            for lease in DHCPLease.objects.all()
+        }
+
+        with self.lock:
+            self.leases = leases
+            self.addresses = {lease.ip_address: lease.mac_address for lease in leases.values() if lease.active}
+            self.offers = {}
+            self.offered = {}
+            self.base = int(network.network_address)
+            self.used = bytearray(network.num_addresses)
+            # The network and broadcast addresses are not hosts
+            if network.prefixlen < 31:
+                self.used[0] = self.used[-1] = 1
+            for address in [*reserved, *self.addresses]:
+                self._mark(address, 1)
+            self.cursor = 0
+            self.loaded = True
+
+        if self.flusher is None:
+            self.flusher = threading.Thread(target=self._flush_loop, name='dhcp-lease-flusher', daemon=True)
+            self.flusher.start()
+        if self.sweeper is None:
+            self.sweeper = threading.Thread(target=self._sweep_loop, name='dhcp-offer-sweeper', daemon=True)
+            self.sweeper.start()
+
+        self.logger.info(f"Loaded {len(leases)} DHCP leases, {len(self.addresses)} active")
+
+    def _mark(self, ip_address, value):
+        index = ip_to_int(ip_address) - self.base
+        if 0 <= index < len(self.used):
+            self.used[index] = value
+            if not value and index < self.cursor:
+                self.cursor = index
+
+    def get(self, mac_address):
+        with self.lock:
+            return self.leases.get(mac_address)
+
+    def holder(self, ip_address):
+        # MAC address actively leasing the IP address or holding an offer for it, if any
+        with self.lock:
+            return self.addresses.get(ip_address) or self.offered.get(ip_address)
+
+    def next_free(self):
+        # Lowest main scope address that is neither leased nor reserved, it is only taken once committed
+        with self.lock:
+            return self._find_free()
+
+    def _find_free(self):
+        index = self.used.find(0, self.cursor)
+        if index < 0:
+            self.cursor = len(self.used)
+            return None
+        self.cursor = index
+        return int_to_ip(self.base + index)
+
+    def offer(self, mac_address, xid, ip_address, subnet_mask):
+        # Reserves the address for the client until it requests it or the offer expires, returns whether it could
+        with self.lock:
+            if self.addresses.get(ip_address, mac_address) != mac_address or self.offered.get(ip_address, mac_address) != mac_address:
+                return False
+            self._reserve(mac_address, xid, ip_address, subnet_mask)
+            return True
+
+    def offer_next_free(self, mac_address, xid, subnet_mask):
+        # Picks and reserves the lowest free main scope address at once, so concurrent clients never get the same one
+        with self.lock:
+            ip_address = self._find_free()
+            if ip_address is not None:
+                self._reserve(mac_address, xid, ip_address, subnet_mask)
+            return ip_address
+
+    def _reserve(self, mac_address, xid, ip_address, subnet_mask):
+        self._drop_offer(mac_address)
+        self.offers[mac_address] = Offer(xid, ip_address, subnet_mask, time.monotonic() + self.offer_ttl)
+        self.offered[ip_address] = mac_address
+        self._mark(ip_address, 1)
+
+    def get_offer(self, mac_address, xid=None):
+        # Outstanding offer of the client, only if it was made in the given transaction when one is given
+        with self.lock:
+            offer = self.offers.get(mac_address)
+            if offer is None or offer.expires <= time.monotonic() or (xid is not None and offer.xid != xid):
+                return None
+            return offer
+
+    def _drop_offer(self, mac_address):
+        offer = self.offers.pop(mac_address, None)
+        if offer and self.offered.get(offer.ip_address) == mac_address:
+            del self.offered[offer.ip_address]
+            if offer.ip_address not in self.addresses:
+                self._mark(offer.ip_address, 0)
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                self.logger.error(f"Failed to expire DHCP offers: {e}")
+
+    def sweep(self):
+        # Frees the addresses of offers that were never requested
+        now = time.monotonic()
+        with self.lock:
+            expired = [mac_address for mac_address, offer in self.offers.items() if offer.expires <= now]
+            for mac_address in expired:
+                self._drop_offer(mac_address)
+        if expired:
+            self.logger.debug(f"Expired {len(expired)} DHCP offers")
+        return len(expired)
+
+    def commit(self, mac_address, ip_address, hostname=None):
+        # Records the lease unless another client holds the address, returns whether it did and the previous lease
+        hostname = hostname or 'Unknown'
+        with self.lock:
+            if self.addresses.get(ip_address, mac_address) != mac_address or self.offered.get(ip_address, mac_address) != mac_address:
+                return False, None
+            # The offer is fulfilled, or superseded if the client took another address
+            self._drop_offer(mac_address)
+            previous = self.leases.get(mac_address)
+            if previous and previous.active and previous.ip_address != ip_address:
+                self.addresses.pop(previous.ip_address, None)
+                self._mark(previous.ip_address, 0)
+            lease = Lease(mac_address, ip_address, hostname, True)
+            self.leases[mac_address] = lease
+            self.addresses[ip_address] = mac_address
+            self._mark(ip_address, 1)
+            self.pending[mac_address] = lease
+
+        self.flush_event.set()
+        return True, previous
+
+    def release(self, mac_address):
+        # Marks the lease inactive and returns it, the client keeps its address if it asks again
+        with self.lock:
+            lease = self.leases.get(mac_address)
+            if lease is None:
+                return None
+            if lease.active:
+                if self.addresses.get(lease.ip_address) == mac_address:
+                    self.addresses.pop(lease.ip_address)
+                    self._mark(lease.ip_address, 0)
+                self.leases[mac_address] = lease._replace(active=False)
+                self.pending[mac_address] = self.leases[mac_address]
+
+        self.flush_event.set()
+        return lease
+
+    def forget(self, mac_address):
+        # Drops a lease that was deleted from the database
+        with self.lock:
+            self.pending.pop(mac_address, None)
+            if mac_address in self.flushing:
+                self.forgotten.add(mac_address)
+            lease = self.leases.pop(mac_address, None)
+            if lease and lease.active and self.addresses.get(lease.ip_address) == mac_address:
+                self.addresses.pop(lease.ip_address)
+                self._mark(lease.ip_address, 0)
+
+    def _flush_loop(self):
+        while True:
+            self.flush_event.wait()
+            # Gather the changes of a burst into one write
+            time.sleep(self.flush_interval)
+            self.flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Failed to save DHCP leases: {e}")
+            close_old_connections()
+
+    def flush(self):
+        # Saves every pending change in a single transaction
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                self.flushing = pending
+            if not pending:
+                return 0
+
+            now = timezone.now()
+            try:
+                with transaction.atomic():
+                    DHCPLease.objects.bulk_create(
+                        [
+                            DHCPLease(mac_address=lease.mac_address, ip_address=lease.ip_address, hostname=lease.hostname, active=lease.active, last_updated=now)
+                            for lease in pending.values()
+                        ],
+                        update_conflicts=True,
+                        unique_fields=['mac_address'],
+                        update_fields=['ip_address', 'hostname', 'active', 'last_updated']
+                    )
+            except Exception:
+                # Put the changes back unless newer ones were made or the lease was forgotten meanwhile
+                with self.lock:
+                    self.pending = {**{mac: lease for mac, lease in pending.items() if mac not in self.forgotten}, **self.pending}
+                    self.flushing, self.forgotten = {}, set()
+                self.flush_event.set()
+                raise
+
+            # Leases deleted while being saved were just written back, remove them again unless the client returned
+            with self.lock:
+                stale = [mac for mac in self.forgotten if mac not in self.leases]
+                self.flushing, self.forgotten = {}, set()
+            if stale:
+                DHCPLease.objects.filter(mac_address__in=stale).delete()
+
+            self.logger.debug(f"Saved {len(pending)} DHCP leases")
+            return len(pending)
+
+    def get_active(self):
+        with self.lock:
+            return [lease for lease in self.leases.values() if lease.active]
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "leases": len(self.leases),
+                "active": len(self.addresses),
+                "pending": len(self.pending),
+                "offers": len(self.offers),
+                "main_scope_free": self.used.count(0)
+            }
+
+Leases = LeaseStore()
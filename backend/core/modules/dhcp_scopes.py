@@ -0,0 +1,84 @@
+import bisect
+import logging
+import threading
+import ipaddress
+from collections import namedtuple
+from core.models import DHCPScope
+from core.modules.dhcp_leases import ip_to_int, int_to_ip
+
+Scope = namedtuple('Scope', ['first', 'last', 'subnet_mask', 'active'])
+
+class ScopeIndex:
+    # Secondary DHCP scopes as integer intervals sorted by first address, kept current by DHCPScope signals
+    def __init__(self):
+        self.logger = logging.getLogger('dhcp')
+        self.lock = threading.Lock()
+        self.scopes = {}  # Interval of every scope, keyed by scope ID
+        self.keys = []  # (first address, scope ID) of every scope, sorted
+        self.loaded = False
+
+    def load(self):
+        scopes = {scope.pk: self._interval(scope) for scope in DHCPScope.objects.all()}
+        with self.lock:
+            self.scopes = scopes
+            self.keys = sorted((interval.first, pk) for pk, interval in scopes.items())
+            self.loaded = True
+        self.logger.info(f"Indexed {len(scopes)} DHCP scopes")
+
+    def _interval(self, scope):
+        network = ipaddress.IPv4Network(f"{scope.network}/{scope.subnet_mask}", strict=False)
+        return Scope(int(network.network_address), int(network.broadcast_address), scope.subnet_mask, scope.is_active)
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def update(self, scope):
+        if not self.loaded:
+            return
+        interval = self._interval(scope)
+        with self.lock:
+            self._remove(scope.pk)
+            self.scopes[scope.pk] = interval
+            bisect.insort(self.keys, (interval.first, scope.pk))
+
+    def remove(self, scope_id):
+        if not self.loaded:
+            return
+        with self.lock:
+            self._remove(scope_id)
+
+    def _remove(self, scope_id):
+        interval = self.scopes.pop(scope_id, None)
+        if interval is not None:
+            index = bisect.bisect_left(self.keys, (interval.first, scope_id))
+            del self.keys[index]
+
+    def find(self, ip_address, active_only=False):
+        # Scope holding the address, site scopes never overlap so only the closest one below can
+        self._ensure_loaded()
+        address = ip_to_int(ip_address)
+        with self.lock:
+            index = bisect.bisect_right(self.keys, (address, float('inf'))) - 1
+            while index >= 0:
+                interval = self.scopes[self.keys[index][1]]
+                if interval.last >= address and (interval.active or not active_only):
+                    return interval
+                # Walk back only over scopes starting at the same address
+                if index == 0 or self.keys[index - 1][0] != self.keys[index][0]:
+                    return None
+                index -= 1
+            return None
+
+    def last_host(self, scope):
+        # Highest usable address of the scope
+        return int_to_ip(scope.last - 1 if scope.last - scope.first > 1 else scope.last)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "scopes": len(self.scopes),
+                "active": sum(1 for interval in self.scopes.values() if interval.active)
+            }
+
+Scopes = ScopeIndex()
@@ -0,0 +1,75 @@
+import queue
+import logging
+import threading
+from django.db import close_old_connections
+
+class PacketWorkers:
+    # Packets are sharded by client MAC so each client's packets are handled in order by one worker
+    def __init__(self, handler, workers=4, queue_size=1024):
+        self.logger = logging.getLogger('dhcp')
+        self.handler = handler
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.threads = []
+        # Counters are only written by the receive thread or by the worker they belong to
+        self.received = 0
+        self.dropped = 0
+        self.processed = [0] * workers
+        self.errors = [0] * workers
+        self.max_depth = [0] * workers
+
+    def start(self):
+        for index, packets in enumerate(self.queues):
+            thread = threading.Thread(target=self._work, args=(index, packets), name=f'dhcp-worker-{index}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, data, addr):
+        # Called by the receive thread, packets are dropped rather than stalling it when a worker falls behind
+        self.received += 1
+        index = int.from_bytes(data[28:34], 'big') % len(self.queues) if len(data) >= 34 else 0
+        packets = self.queues[index]
+        try:
+            packets.put_nowait((data, addr))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                self.logger.warning(f"DHCP worker {index} queue is full, {self.dropped} packets dropped so far")
+            return False
+        depth = packets.qsize()
+        if depth > self.max_depth[index]:
+            self.max_depth[index] = depth
+        return True
+
+    def _work(self, index, packets):
+        while True:
+            item = packets.get()
+            if item is None:
+                break
+            try:
+                self.handler(*item)
+                self.processed[index] += 1
+            except Exception as e:
+                self.errors[index] += 1
+                self.logger.error(f"Error handling DHCP packet: {e}")
+        close_old_connections()
+
+    def stop(self, timeout=5):
+        for packets in self.queues:
+            try:
+                packets.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        self.threads = []
+
+    def get_stats(self):
+        return {
+            "workers": len(self.queues),
+            "received": self.received,
+            "dropped": self.dropped,
+            "processed": sum(self.processed),
+            "errors": sum(self.errors),
+            "queue_depths": [packets.qsize() for packets in self.queues],
+            "max_queue_depths": list(self.max_depth)
+        }
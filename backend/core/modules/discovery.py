@@ -1,18 +1,41 @@
+import copy
+import json
+import hashlib
 import logging
+import threading
 import ipaddress
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from core.modules.utils.restconf import RestconfWrapper
+from core.modules.utils.query_counter import count_queries
+from core.modules.utils.fetched_data_store import FetchedDataStore
+from core.modules.utils.executor import IOExecutor
 from core.models import DHCPLease, Router, VRF, RouteTarget, Interface, Site, OSPFNetwork, OSPFProcess, Notification
 from core.settings import get_settings
 
+# Operational interface fields used by discovery, everything else (counters, timestamps) is ignored
+OPER_INTERFACE_FIELDS = ['admin-status', 'description', 'phys-address', 'ipv4', 'ipv4-subnet-mask', 'vrf']
+
+LLDP_PATH = "Cisco-IOS-XE-lldp-oper:lldp-entries"
+
+# Interface fields reconciled from discovered data
+INTERFACE_FIELDS = ['description', 'enabled', 'addressing', 'ip_address', 'subnet_mask', 'dhcp_helper_address', 'vlan', 'vrf']
+
 class _NetworkDiscoverer:
-    def __init__(self, max_workers=5):
+    def __init__(self):
         self.logger = logging.getLogger('network-discoverer')
-        self.max_workers = max_workers
         self.router_cache = {}  # Cache router objects to avoid duplicate DB queries
         self.interface_cache = {}  # Cache interface objects
         self.initialized = False
+        self.full_pass_interval = 12  # Every Nth network discovery ignores fingerprints and reconciles everything
+        self.discovery_cycles = 0
+        self.stats_lock = threading.Lock()
+        self.fetched_data = None  # Payloads fetched during the current discovery run
+        self.reset_stats()
+    
+    def reset_stats(self):
         # Track discovery statistics
         self.stats = {
             "discovered_devices": 0,
@@ -42,7 +65,23 @@ class _NetworkDiscoverer:
                 "removed": 0
             },
             "connections": {
-                "created": 0
+                "created": 0,
+                "removed": 0
+            },
+            "subtrees": {
+                "processed": 0,
+                "skipped": 0
+            },
+            "queries": {
+                "total": 0,
+                "per_router": {}
+            },
+            "fetched_data": {
+                "entries": 0,
+                "size_bytes": 0,
+                "hits": 0,
+                "misses": 0,
+                "hit_rate": 0.0
             }
         }
     
@@ -73,58 +112,18 @@ class _NetworkDiscoverer:
         self.logger.info("Starting network discovery process")
         
         # Reset statistics
-        self.stats = {
-            "discovered_devices": 0,
-            "routers": {
-                "created": 0,
-                "updated": 0,
-                "total": 0,
-                "provider_core": 0,
-                "provider_edge": 0,
-                "customer_edge": 0,
-                "reachable": 0,
-                "unreachable": 0
-            },
-            "vrfs": {
-                "created": 0,
-                "updated": 0,
-                "removed": 0
-            },
-            "interfaces": {
-                "created": 0,
-                "updated": 0,
-                "removed": 0
-            },
-            "ospf_processes": {
-                "created": 0,
-                "updated": 0,
-                "removed": 0
-            },
-            "connections": {
-                "created": 0
-            }
-        }
-        
-        # Get all active DHCP leases
-        active_leases = DHCPLease.objects.filter(active=True)
-        self.logger.info(f"Found {active_leases.count()} active DHCP leases")
+        self.reset_stats()
         
-        # Process devices in parallel with thread pool
-        discovered_devices = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_ip = {executor.submit(self.discover_ip, lease.ip_address): lease.ip_address for lease in active_leases}
-            for future in as_completed(future_to_ip):
-                ip_address = future_to_ip[future]
-                try:
-                    device_data = future.result()
-                    if device_data:
-                        discovered_devices.append(device_data)
-                        self.stats["discovered_devices"] += 1
-                except Exception as e:
-                    self.logger.error(f"Error processing device at {ip_address}: {str(e)}")
+        # Periodically reconcile every subtree regardless of fingerprints
+        force = self.discovery_cycles % self.full_pass_interval == 0
+        self.discovery_cycles += 1
         
-        # Update connections between interfaces after discovery
-        self.update_interface_connections()
+        # Keep every payload fetched during this run so later phases can reuse it
+        self.fetched_data = FetchedDataStore()
+        try:
+            self.discover_all_devices(force)
+        finally:
+            self.release_fetched_data()
         
         # Update router role counts
         routers = Router.objects.filter(reachable=True)
@@ -136,6 +135,33 @@ class _NetworkDiscoverer:
         
         return self.stats
     
+    def discover_all_devices(self, force):
+        # Get all active DHCP leases
+        active_leases = DHCPLease.objects.filter(active=True)
+        self.logger.info(f"Found {active_leases.count()} active DHCP leases")
+        
+        # Process devices in parallel on the discovery lane
+        discovered_devices = []
+        future_to_ip = {IOExecutor.submit('discovery', self.run_counted, lease.ip_address, self.discover_ip, lease.ip_address, force): lease.ip_address for lease in active_leases}
+        for future in as_completed(future_to_ip):
+            ip_address = future_to_ip[future]
+            try:
+                device_data = future.result()
+                if device_data:
+                    discovered_devices.append(device_data)
+                    self.stats["discovered_devices"] += 1
+            except Exception as e:
+                self.logger.error(f"Error processing device at {ip_address}: {str(e)}")
+        
+        # Update connections between interfaces after discovery
+        self.update_interface_connections()
+    
+    def release_fetched_data(self):
+        # Report how much the run reused and drop the payloads
+        if self.fetched_data:
+            self.stats["fetched_data"] = self.fetched_data.get_stats()
+            self.fetched_data = None
+    
     def discover_single_device(self, ip_address):
         self.logger.info(f"Starting single device discovery for {ip_address}")
         
@@ -144,47 +170,19 @@ class _NetworkDiscoverer:
             self.initialize()
         
         # Reset statistics for this discovery
-        self.stats = {
-            "discovered_devices": 0,
-            "routers": {
-                "created": 0,
-                "updated": 0,
-                "total": 0,
-                "provider_core": 0,
-                "provider_edge": 0,
-                "customer_edge": 0,
-                "reachable": 0,
-                "unreachable": 0
-            },
-            "vrfs": {
-                "created": 0,
-                "updated": 0,
-                "removed": 0
-            },
-            "interfaces": {
-                "created": 0,
-                "updated": 0,
-                "removed": 0
-            },
-            "ospf_processes": {
-                "created": 0,
-                "updated": 0,
-                "removed": 0
-            },
-            "connections": {
-                "created": 0
-            }
-        }
+        self.reset_stats()
         
         # Discover the device
+        self.fetched_data = FetchedDataStore()
         try:
-            device_data = self.discover_ip(ip_address)
+            # Single device discovery always reconciles every subtree
+            device_data = self.run_counted(ip_address, self.discover_ip, ip_address, True)
             if device_data:
                 self.stats["discovered_devices"] += 1
                 
                 # Update connections for this device
                 router = Router.objects.get(chassis_id=device_data["chassis_id"])
-                self.process_router_connections(router)
+                self.run_counted(router.management_ip_address, self.process_router_connections, router)
                 
                 # Update router role counts for reachable routers
                 reachable_routers = Router.objects.filter(reachable=True)
@@ -213,8 +211,21 @@ class _NetworkDiscoverer:
                 "error": f"Device discovery error: {str(e)}",
                 "stats": self.stats
             }
+        finally:
+            self.release_fetched_data()
 
-    def discover_ip(self, ip_address):
+    def run_counted(self, ip_address, function, *args):
+        # Run a discovery step and add its database queries to the router's count
+        with count_queries() as queries:
+            try:
+                return function(*args)
+            finally:
+                with self.stats_lock:
+                    per_router = self.stats["queries"]["per_router"]
+                    per_router[ip_address] = per_router.get(ip_address, 0) + queries.count
+                    self.stats["queries"]["total"] += queries.count
+    
+    def discover_ip(self, ip_address, force=False):
         try:
             self.logger.info(f"Processing device at {ip_address}")
             
@@ -242,7 +253,7 @@ class _NetworkDiscoverer:
                 return None
             
             # Get LLDP information
-            lldp_data = self.get_device_data(ip_address, "Cisco-IOS-XE-lldp-oper:lldp-entries")
+            lldp_data = self.get_device_data(ip_address, LLDP_PATH)
             if not lldp_data:
                 self.logger.warning(f"No LLDP data for {ip_address}, skipping")
                 return None
@@ -275,18 +286,27 @@ class _NetworkDiscoverer:
             
             # Get device data
             device_data = self.fetch_device_data(ip_address)
+            fingerprints = self.compute_fingerprints(device_data)
             
             # Process VRFs
             if device_data.get('vrf_data'):
-                self.process_vrfs(router, device_data['vrf_data'])
+                # Interfaces and OSPF processes reference VRFs, so they are reprocessed when VRFs change
+                if self.reconcile_subtree(router, 'vrfs', fingerprints['vrfs'], force, self.process_vrfs, device_data['vrf_data']):
+                    force = True
+            
+            # Index the router's VRFs once for interface and OSPF parsing
+            vrfs_by_name = {vrf.name: vrf for vrf in VRF.objects.filter(router=router)}
             
             # Process interfaces
             if device_data.get('native_interfaces'):
-                self.process_interfaces(router, device_data['native_interfaces'], device_data['oper_interfaces'])
+                self.reconcile_subtree(router, 'interfaces', fingerprints['interfaces'], force, self.process_interfaces, device_data['native_interfaces'], device_data['oper_interfaces'], vrfs_by_name)
             
             # Process OSPF
             if device_data.get('ospf_data'):
-                self.process_ospf(router, device_data['ospf_data'])
+                self.reconcile_subtree(router, 'ospf', fingerprints['ospf'], force, self.process_ospf, device_data['ospf_data'], vrfs_by_name)
+            
+            # Only remember fingerprints once every subtree was reconciled
+            router.save(update_fields=['config_fingerprints'])
             
             return {
                 "hostname": hostname,
@@ -300,18 +320,17 @@ class _NetworkDiscoverer:
             return None
     
     def fetch_device_data(self, ip_address):
-        # Get router data in parallel
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            vrf_future = executor.submit(self.get_device_data, ip_address, "Cisco-IOS-XE-native:native/vrf/definition")
-            native_interfaces_future = executor.submit(self.get_device_data, ip_address, "Cisco-IOS-XE-native:native/interface")
-            oper_interfaces_future = executor.submit(self.get_device_data, ip_address, "Cisco-IOS-XE-interfaces-oper:interfaces")
-            ospf_future = executor.submit(self.get_device_data, ip_address, "Cisco-IOS-XE-native:native/router/router-ospf/ospf")
-            
-            # Wait for all data to be fetched
-            vrf_data = vrf_future.result()
-            native_interfaces = native_interfaces_future.result()
-            oper_interfaces_data = oper_interfaces_future.result()
-            ospf_data = ospf_future.result()
+        # Get router data in parallel, runs inline when the discovery lane is already full
+        vrf_future = IOExecutor.submit('discovery', self.get_device_data, ip_address, "Cisco-IOS-XE-native:native/vrf/definition")
+        native_interfaces_future = IOExecutor.submit('discovery', self.get_device_data, ip_address, "Cisco-IOS-XE-native:native/interface")
+        oper_interfaces_future = IOExecutor.submit('discovery', self.get_device_data, ip_address, "Cisco-IOS-XE-interfaces-oper:interfaces")
+        ospf_future = IOExecutor.submit('discovery', self.get_device_data, ip_address, "Cisco-IOS-XE-native:native/router/router-ospf/ospf")
+        
+        # Wait for all data to be fetched
+        vrf_data = vrf_future.result()
+        native_interfaces = native_interfaces_future.result()
+        oper_interfaces_data = oper_interfaces_future.result()
+        ospf_data = ospf_future.result()
         
         # Process operational interfaces data for easier access
         oper_interfaces = self.process_oper_interfaces(oper_interfaces_data)
@@ -323,6 +342,38 @@ class _NetworkDiscoverer:
             'ospf_data': ospf_data
         }
     
+    def compute_fingerprints(self, device_data):
+        # Operational interface data is reduced to the fields discovery uses, so counters do not change its hash
+        oper_interfaces = {
+            name: {field: intf.get(field) for field in OPER_INTERFACE_FIELDS}
+            for name, intf in (device_data.get('oper_interfaces') or {}).items()
+        }
+        
+        return {
+            'vrfs': self.fingerprint(device_data.get('vrf_data')),
+            'interfaces': self.fingerprint(device_data.get('native_interfaces'), oper_interfaces),
+            'ospf': self.fingerprint(device_data.get('ospf_data'))
+        }
+    
+    def fingerprint(self, *subtrees):
+        return hashlib.sha256(json.dumps(subtrees, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def reconcile_subtree(self, router, subtree, fingerprint, force, process, *args):
+        if not force and router.config_fingerprints.get(subtree) == fingerprint:
+            self.logger.debug(f"Skipping unchanged {subtree} on router {router.hostname}")
+            self.stats["subtrees"]["skipped"] += 1
+            return False
+        
+        process(router, *args)
+        router.config_fingerprints[subtree] = fingerprint
+        self.stats["subtrees"]["processed"] += 1
+        return True
+    
+    def invalidate_fingerprints(self, router):
+        # Forces the next discovery of this router to reconcile every subtree
+        Router.objects.filter(pk=router.pk).update(config_fingerprints={})
+        router.config_fingerprints = {}
+    
     def detect_router_role(self, ip_address):
         # Check if IP is in DHCP sites network
         try:
@@ -357,7 +408,17 @@ class _NetworkDiscoverer:
             return 'P'
     
     def get_device_data(self, ip_address, path):
-        return self.restconf.get(ip_address, path)
+        # Reuse payloads already fetched during this discovery run
+        fetched_data = self.fetched_data
+        if fetched_data:
+            found, data = fetched_data.lookup(ip_address, path)
+            if found:
+                return data
+        
+        data = self.restconf.get(ip_address, path)
+        if fetched_data and data is not None:
+            fetched_data.put(ip_address, path, data)
+        return data
     
     def process_oper_interfaces(self, oper_data):
         if not oper_data:
@@ -453,6 +514,9 @@ class _NetworkDiscoverer:
     def process_vrfs(self, router, vrf_data):
         definitions = vrf_data.get('Cisco-IOS-XE-native:definition', [])
         
+        # Load existing VRFs and their route targets once to diff against
+        existing_vrfs = {vrf.name: vrf for vrf in VRF.objects.filter(router=router).prefetch_related('route_targets')}
+        
         # Create set of valid VRF names to later clean up deleted VRFs
         discovered_vrf_names = set()
         
@@ -466,54 +530,43 @@ class _NetworkDiscoverer:
             # Extract route distinguisher
             rd = vrf_def.get('rd', None)
             
-            # Create or update VRF
-            vrf, created = VRF.objects.update_or_create(
-                name=vrf_name,
-                router=router,
-                defaults={
-                    'route_distinguisher': rd
-                }
-            )
+            # Create the VRF or update it only if its route distinguisher changed
+            vrf = existing_vrfs.get(vrf_name)
+            created = vrf is None
+            changed = False
+            if created:
+                vrf = VRF.objects.create(name=vrf_name, router=router, route_distinguisher=rd)
+                existing_rts = set()
+            else:
+                if vrf.route_distinguisher != rd:
+                    vrf.route_distinguisher = rd
+                    vrf.save()
+                    changed = True
+                existing_rts = {(rt.value, rt.target_type) for rt in vrf.route_targets.all()}
             
             # Process route targets
             route_target = vrf_def.get('route-target', {})
-            
-            # Get existing route targets for this VRF
-            existing_rts = set(RouteTarget.objects.filter(vrf=vrf).values_list('value', 'target_type'))
             discovered_rts = set()
-
-            # Import route targets
-            import_rts = route_target.get('import', [])
-            for rt in import_rts:
-                rt_value = rt.get('asn-ip', '')
-                if rt_value:
-                    discovered_rts.add((rt_value, 'import'))
-                    RouteTarget.objects.update_or_create(
-                        vrf=vrf,
-                        value=rt_value,
-                        target_type='import'
-                    )
-            
-            # Export route targets
-            export_rts = route_target.get('export', [])
-            for rt in export_rts:
-                rt_value = rt.get('asn-ip', '')
-                if rt_value:
-                    discovered_rts.add((rt_value, 'export'))
-                    RouteTarget.objects.update_or_create(
-                        vrf=vrf,
-                        value=rt_value,
-                        target_type='export'
-                    )
-            
-            # Remove route targets that no longer exist
-            for rt_value, target_type in existing_rts - discovered_rts:
-                RouteTarget.objects.filter(vrf=vrf, value=rt_value, target_type=target_type).delete()
+            for target_type in ('import', 'export'):
+                for rt in route_target.get(target_type, []):
+                    rt_value = rt.get('asn-ip', '')
+                    if rt_value:
+                        discovered_rts.add((rt_value, target_type))
+            
+            # Only write route targets that were added or removed
+            if discovered_rts != existing_rts:
+                RouteTarget.objects.bulk_create([
+                    RouteTarget(vrf=vrf, value=rt_value, target_type=target_type)
+                    for rt_value, target_type in discovered_rts - existing_rts
+                ])
+                for rt_value, target_type in existing_rts - discovered_rts:
+                    RouteTarget.objects.filter(vrf=vrf, value=rt_value, target_type=target_type).delete()
+                changed = True
             
             if created:
                 self.logger.info(f"Created new VRF: {vrf_name} with RD: {rd} on router {router.hostname}")
                 self.stats["vrfs"]["created"] += 1
-            else:
+            elif changed:
                 self.logger.info(f"Updated existing VRF: {vrf_name} on router {router.hostname}")
                 self.stats["vrfs"]["updated"] += 1
         
@@ -523,7 +576,7 @@ class _NetworkDiscoverer:
             self.logger.info(f"Removed {removed_count} VRFs that no longer exist on router {router.hostname}")
             self.stats["vrfs"]["removed"] += removed_count
     
-    def process_ospf(self, router, ospf_data):
+    def process_ospf(self, router, ospf_data, vrfs_by_name):
         """Process OSPF configuration data and create/update OSPF processes and networks."""
         if not ospf_data or 'Cisco-IOS-XE-ospf:ospf' not in ospf_data:
             self.logger.debug(f"No OSPF data found for router {router.hostname}")
@@ -532,6 +585,12 @@ class _NetworkDiscoverer:
         ospf_config = ospf_data['Cisco-IOS-XE-ospf:ospf']
         discovered_process_ids = set()
         
+        # Load existing processes and their networks once to diff against
+        existing_processes = {
+            process.process_id: process
+            for process in OSPFProcess.objects.filter(router=router).prefetch_related('networks')
+        }
+        
         # Process regular OSPF processes (without VRF)
         regular_processes = ospf_config.get('process-id', [])
         for process_data in regular_processes:
@@ -540,7 +599,7 @@ class _NetworkDiscoverer:
                 continue
                 
             discovered_process_ids.add(process_id)
-            self.process_single_ospf_process(router, process_data, None)
+            self.process_single_ospf_process(router, process_data, None, existing_processes.get(process_id))
         
         # Process VRF-aware OSPF processes
         vrf_processes = ospf_config.get('process-id-vrf', [])
@@ -554,12 +613,11 @@ class _NetworkDiscoverer:
             discovered_process_ids.add(process_id)
             
             # Find the VRF object
-            try:
-                vrf = VRF.objects.get(name=vrf_name, router=router)
-                self.process_single_ospf_process(router, process_data, vrf)
-            except VRF.DoesNotExist:
+            vrf = vrfs_by_name.get(vrf_name)
+            if not vrf:
                 self.logger.warning(f"VRF {vrf_name} not found for OSPF process {process_id} on router {router.hostname}")
                 continue
+            self.process_single_ospf_process(router, process_data, vrf, existing_processes.get(process_id))
         
         # Clean up OSPF processes that no longer exist
         removed_count = OSPFProcess.objects.filter(router=router).exclude(process_id__in=discovered_process_ids).delete()[0]
@@ -567,29 +625,35 @@ class _NetworkDiscoverer:
             self.logger.info(f"Removed {removed_count} OSPF processes that no longer exist on router {router.hostname}")
             self.stats["ospf_processes"]["removed"] += removed_count
 
-    def process_single_ospf_process(self, router, process_data, vrf):
+    def process_single_ospf_process(self, router, process_data, vrf, ospf_process=None):
         """Process a single OSPF process configuration."""
         process_id = process_data.get('id')
         router_id = process_data.get('router-id')
         priority = process_data.get('priority')
         
-        # Create or update OSPF process
-        ospf_process, created = OSPFProcess.objects.update_or_create(
-            router=router,
-            process_id=process_id,
-            defaults={
-                'vrf': vrf,
-                'ospf_router_id': router_id,
-                'priority': priority
-            }
-        )
-        
+        # Create the OSPF process or update only the fields that changed
+        created = ospf_process is None
+        changed = False
         if created:
-            self.logger.info(f"Created OSPF process {process_id} on router {router.hostname}")
-            self.stats["ospf_processes"]["created"] += 1
+            ospf_process = OSPFProcess.objects.create(
+                router=router,
+                process_id=process_id,
+                vrf=vrf,
+                ospf_router_id=router_id,
+                priority=priority
+            )
+            existing_networks = {}
         else:
-            self.logger.info(f"Updated OSPF process {process_id} on router {router.hostname}")
-            self.stats["ospf_processes"]["updated"] += 1
+            changed_fields = [field for field, value in (('ospf_router_id', router_id), ('priority', priority)) if getattr(ospf_process, field) != value]
+            if ospf_process.vrf_id != (vrf.id if vrf else None):
+                changed_fields.append('vrf')
+            if changed_fields:
+                ospf_process.vrf = vrf
+                ospf_process.ospf_router_id = router_id
+                ospf_process.priority = priority
+                ospf_process.save(update_fields=changed_fields)
+                changed = True
+            existing_networks = {(network.network, network.subnet_mask): network for network in ospf_process.networks.all()}
         
         # Process networks for this OSPF process
         networks = process_data.get('network', [])
@@ -606,34 +670,37 @@ class _NetworkDiscoverer:
             # Convert wildcard to subnet mask (Cisco uses inverted masks)
             try:
                 subnet_mask = self.wildcard_to_subnet_mask(wildcard)
-                discovered_networks.add((network_ip, subnet_mask, area))
-                
-                # Create or update OSPF network
-                ospf_network, created = OSPFNetwork.objects.update_or_create(
-                    process=ospf_process,
-                    network=network_ip,
-                    subnet_mask=subnet_mask,
-                    defaults={
-                        'area': area
-                    }
-                )
+                discovered_networks.add((network_ip, subnet_mask))
                 
-                if created:
+                # Create or update OSPF network only when it is new or its area changed
+                ospf_network = existing_networks.get((network_ip, subnet_mask))
+                if ospf_network is None:
+                    OSPFNetwork.objects.create(process=ospf_process, network=network_ip, subnet_mask=subnet_mask, area=area)
                     self.logger.debug(f"Created OSPF network {network_ip}/{subnet_mask} in area {area} for process {process_id}")
-                else:
+                    changed = True
+                elif ospf_network.area != area:
+                    ospf_network.area = area
+                    ospf_network.save(update_fields=['area'])
                     self.logger.debug(f"Updated OSPF network {network_ip}/{subnet_mask} in area {area} for process {process_id}")
+                    changed = True
                     
             except ValueError as e:
                 self.logger.error(f"Error processing OSPF network {network_ip}/{wildcard}: {str(e)}")
                 continue
         
         # Clean up OSPF networks that no longer exist for this process
-        existing_networks = OSPFNetwork.objects.filter(process=ospf_process)
-        for network in existing_networks:
-            network_tuple = (network.network, network.subnet_mask, network.area)
-            if network_tuple not in discovered_networks:
+        for network_key, network in existing_networks.items():
+            if network_key not in discovered_networks:
                 network.delete()
                 self.logger.debug(f"Removed OSPF network {network.network}/{network.subnet_mask} from process {process_id}")
+                changed = True
+        
+        if created:
+            self.logger.info(f"Created OSPF process {process_id} on router {router.hostname}")
+            self.stats["ospf_processes"]["created"] += 1
+        elif changed:
+            self.logger.info(f"Updated OSPF process {process_id} on router {router.hostname}")
+            self.stats["ospf_processes"]["updated"] += 1
     
     def wildcard_to_subnet_mask(self, wildcard):
         try:
@@ -654,7 +721,7 @@ class _NetworkDiscoverer:
         except (ValueError, IndexError) as e:
             raise ValueError(f"Invalid wildcard mask: {wildcard}")
 
-    def process_interfaces(self, router, native_interfaces, oper_interfaces):
+    def process_interfaces(self, router, native_interfaces, oper_interfaces, vrfs_by_name):
         self.logger.info(f"Processing interfaces for router {router.hostname}")
         
         # Dictionary to collect interface data before creating/updating
@@ -665,7 +732,7 @@ class _NetworkDiscoverer:
             for intf_name, oper_intf in oper_interfaces.items():
                 # Add interface to our collection if not already there
                 if intf_name not in interface_data:
-                    interface_data[intf_name] = self.extract_interface_data_from_oper(router, intf_name, oper_intf)
+                    interface_data[intf_name] = self.extract_interface_data_from_oper(router, intf_name, oper_intf, vrfs_by_name)
         
         # Process native interface data to get additional configuration details
         discovered_interfaces = set()
@@ -684,12 +751,12 @@ class _NetworkDiscoverer:
                     discovered_interfaces.add(name)
                     
                     # Create or update the interface data
-                    self.update_interface_data_from_native(interface_data, router, name, intf)
+                    self.update_interface_data_from_native(interface_data, router, name, intf, vrfs_by_name)
         
         # Now create or update interfaces with the collected data
         self.save_interfaces(router, interface_data, discovered_interfaces)
     
-    def extract_interface_data_from_oper(self, router, intf_name, oper_intf):
+    def extract_interface_data_from_oper(self, router, intf_name, oper_intf, vrfs_by_name):
         # Extract base interface data from operational data
         data = {
             'router': router,
@@ -714,15 +781,13 @@ class _NetworkDiscoverer:
         # Get VRF info from operational data
         vrf_name = oper_intf.get('vrf')
         if vrf_name:
-            try:
-                vrf = VRF.objects.get(name=vrf_name, router=router)
-                data['vrf'] = vrf
-            except VRF.DoesNotExist:
+            data['vrf'] = vrfs_by_name.get(vrf_name)
+            if not data['vrf']:
                 self.logger.warning(f"VRF {vrf_name} on router {router.hostname} not found")
         
         return data
     
-    def update_interface_data_from_native(self, interface_data, router, name, intf):
+    def update_interface_data_from_native(self, interface_data, router, name, intf, vrfs_by_name):
         # Create entry if not already in our collection
         if name not in interface_data:
             interface_data[name] = {
@@ -750,10 +815,10 @@ class _NetworkDiscoverer:
         # Get VRF information
         if 'vrf' in intf and 'forwarding' in intf['vrf']:
             vrf_name = intf['vrf']['forwarding']
-            try:
-                vrf = VRF.objects.get(name=vrf_name, router=router)
+            vrf = vrfs_by_name.get(vrf_name)
+            if vrf:
                 interface_data[name]['vrf'] = vrf
-            except VRF.DoesNotExist:
+            else:
                 self.logger.warning(f"VRF {vrf_name} on router {router.hostname} not found")
         
         # Get DHCP helper address if available
@@ -768,53 +833,69 @@ class _NetworkDiscoverer:
     
     def save_interfaces(self, router, interface_data, discovered_interfaces):
         with transaction.atomic():
-            # Create or update interfaces
+            # Load the router's interfaces once, they are the snapshot validation runs against
+            existing_interfaces = {interface.name: interface for interface in Interface.objects.filter(router=router)}
+            created_interfaces = []
+            updated_interfaces = []
+            
+            # Work out creates and updates in memory
             for name, data in interface_data.items():
                 try:
-                    # Get or create a new interface object
-                    interface, new = Interface.objects.get_or_new(
-                        router=router,
-                        name=name,
-                    )
+                    original = existing_interfaces.get(name)
                     
-                    # Only set MAC address for new interfaces (immutable field)
-                    if new:
-                        interface.mac_address = data['mac_address']
-                        self.stats["interfaces"]["created"] += 1
+                    if original is None:
+                        # Only set MAC address for new interfaces (immutable field)
+                        interface = Interface(router=router, name=name, mac_address=data['mac_address'])
+                        for field in INTERFACE_FIELDS:
+                            setattr(interface, field, data[field])
+                        interface.validate()
+                        created_interfaces.append(interface)
                     else:
-                        self.stats["interfaces"]["updated"] += 1
-                    
-                    # Update the interface with collected data
-                    interface.description = data['description']
-                    interface.enabled = data['enabled']
-                    interface.addressing = data['addressing']
-                    interface.ip_address = data['ip_address']
-                    interface.subnet_mask = data['subnet_mask']
-                    interface.dhcp_helper_address = data['dhcp_helper_address']
-                    interface.vlan = data['vlan']
-                    interface.vrf = data['vrf']
-                    
-                    # Save the interface
-                    interface.save()
+                        # Compare field by field and skip interfaces that did not change
+                        changed_fields = self.get_changed_interface_fields(original, data)
+                        interface = original
+                        if changed_fields:
+                            interface = copy.copy(original)
+                            for field in changed_fields:
+                                setattr(interface, field, data[field])
+                            interface.validate(current=original)
+                            interface.validate_immutable_fields(original)
+                            updated_interfaces.append(interface)
+                            self.logger.debug(f"Updating interface: {router.hostname} - {name} ({', '.join(changed_fields)})")
                     
                     # Add to interface cache for connection discovery later
                     key = f"{router.hostname}:{name}"
                     self.interface_cache[key] = interface
-                    
-                    if new:
-                        self.logger.debug(f"Created new interface: {router.hostname} - {name}")
-                    else:
-                        self.logger.debug(f"Updated existing interface: {router.hostname} - {name}")
                 
                 except Exception as e:
                     self.logger.error(f"Error saving interface {name} on router {router.hostname}: {str(e)}")
             
+            # Apply them in bulk
+            Interface.objects.bulk_create(created_interfaces, batch_size=500)
+            Interface.objects.bulk_update(updated_interfaces, INTERFACE_FIELDS, batch_size=500)
+            self.stats["interfaces"]["created"] += len(created_interfaces)
+            self.stats["interfaces"]["updated"] += len(updated_interfaces)
+            if created_interfaces or updated_interfaces:
+                self.logger.info(f"Created {len(created_interfaces)} and updated {len(updated_interfaces)} interfaces on router {router.hostname}")
+            
             # Remove interfaces that no longer exist on the router
             if discovered_interfaces:
                 removed_count = Interface.objects.filter(router=router).exclude(name__in=discovered_interfaces).delete()[0]
                 if removed_count > 0:
                     self.logger.info(f"Removed {removed_count} interfaces that no longer exist on router {router.hostname}")
                     self.stats["interfaces"]["removed"] += removed_count
+            
+            # Bulk operations skip auto_now, so mark every reconciled interface as discovered in one query
+            Interface.objects.filter(router=router, name__in=list(interface_data)).update(last_discovered=timezone.now())
+    
+    def get_changed_interface_fields(self, interface, data):
+        changed_fields = [field for field in INTERFACE_FIELDS if field != 'vrf' and getattr(interface, field) != data[field]]
+        
+        # Compare VRFs by id to avoid loading the related object
+        if interface.vrf_id != (data['vrf'].id if data['vrf'] else None):
+            changed_fields.append('vrf')
+        
+        return changed_fields
     
     def update_interface_connections(self):
         self.logger.info("Starting interface connection update")
@@ -822,37 +903,57 @@ class _NetworkDiscoverer:
         # Only process connections for routers that were reachable
         reachable_routers = Router.objects.filter(reachable=True)
         
-        # Process connections in parallel
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {executor.submit(self.process_router_connections, router): router 
-                    for router in reachable_routers}
-            
-            for future in as_completed(futures):
-                router = futures[future]
-                try:
-                    future.result()
-                except Exception as e:
-                    self.logger.error(f"Error updating connections for router {router.hostname}: {str(e)}")
+        # Fetch LLDP neighbors in parallel
+        lldp_by_router = {}
+        futures = {IOExecutor.submit('discovery', self.get_device_data, router.management_ip_address, LLDP_PATH): router 
+                for router in reachable_routers}
+        
+        for future in as_completed(futures):
+            router = futures[future]
+            try:
+                lldp_data = future.result()
+                if lldp_data:
+                    lldp_by_router[router] = lldp_data
+            except Exception as e:
+                self.logger.error(f"Error updating connections for router {router.hostname}: {str(e)}")
+        
+        # Reconcile the whole topology at once
+        with count_queries() as queries:
+            self.reconcile_connections(lldp_by_router)
+        with self.stats_lock:
+            self.stats["queries"]["total"] += queries.count
         
         self.logger.info("Finished interface connection update")
     
     def process_router_connections(self, router):
         try:
             # Get LLDP data
-            lldp_data = self.get_device_data(router.management_ip_address, "Cisco-IOS-XE-lldp-oper:lldp-entries")
+            lldp_data = self.get_device_data(router.management_ip_address, LLDP_PATH)
             if not lldp_data:
                 return
             
-            # Get LLDP interface details
+            self.reconcile_connections({router: lldp_data})
+        
+        except Exception as e:
+            self.logger.error(f"Error processing connections for router {router.hostname}: {str(e)}")
+    
+    def reconcile_connections(self, lldp_by_router):
+        # Get routers by chassis ID for faster lookup (only use reachable routers)
+        routers_by_chassis = {r.chassis_id: r for r in Router.objects.filter(reachable=True)}
+        
+        # Index interfaces by (router, name) and subinterfaces by (router, parent name, VLAN)
+        interfaces = {}
+        subinterfaces = {}
+        for interface_id, router_id, name, vlan in Interface.objects.filter(router__reachable=True).order_by('id').values_list('id', 'router_id', 'name', 'vlan'):
+            interfaces[(router_id, name)] = (interface_id, vlan)
+            if '.' in name and vlan:
+                subinterfaces.setdefault((router_id, name.split('.', 1)[0], vlan), interface_id)
+        
+        # Build the desired edges from the LLDP neighbors of every router that answered
+        desired_edges = set()
+        for router, lldp_data in lldp_by_router.items():
             lldp_intf_details = lldp_data.get('Cisco-IOS-XE-lldp-oper:lldp-entries', {}).get('lldp-intf-details', [])
             
-            # Get all interfaces for this router
-            router_interfaces = {interface.name: interface for interface in Interface.objects.filter(router=router)}
-            
-            # Get routers by chassis ID for faster lookup (only use reachable routers)
-            routers_by_chassis = {r.chassis_id: r for r in Router.objects.filter(reachable=True)}
-            
-            # Process LLDP interface details
             for intf_detail in lldp_intf_details:
                 local_interface_name = intf_detail.get('if-name')
                 neighbor_details = intf_detail.get('lldp-neighbor-details', [])
@@ -860,30 +961,51 @@ class _NetworkDiscoverer:
                 if not local_interface_name or not neighbor_details:
                     continue
                 
-                # Get the local interface
-                local_interface = router_interfaces.get(local_interface_name)
-                if not local_interface:
+                if (router.id, local_interface_name) not in interfaces:
                     self.logger.warning(f"Local interface {router.hostname}:{local_interface_name} not found")
                     continue
                 
-                # Clear existing connections for this interface
-                with transaction.atomic():
-                    local_interface.connected_interfaces.clear()
-                
-                # Process each neighbor
                 for neighbor in neighbor_details:
-                    self.process_neighbor_connection(local_interface, neighbor, routers_by_chassis)
+                    edge = self.resolve_neighbor_edge(router, local_interface_name, neighbor, routers_by_chassis, interfaces, subinterfaces)
+                    if edge:
+                        desired_edges.add(edge)
         
-        except Exception as e:
-            self.logger.error(f"Error processing connections for router {router.hostname}: {str(e)}")
+        # Diff against the stored edges of those routers, fetching both directions of every edge
+        Connection = Interface.connected_interfaces.through
+        router_ids = [router.id for router in lldp_by_router]
+        current_rows = Connection.objects.filter(
+            Q(from_interface__router_id__in=router_ids) | Q(to_interface__router_id__in=router_ids)
+        ).values_list('id', 'from_interface_id', 'to_interface_id')
+        current_edges = {}
+        for row_id, from_id, to_id in current_rows:
+            current_edges.setdefault((min(from_id, to_id), max(from_id, to_id)), []).append(row_id)
+        
+        removed_edges = [edge for edge in current_edges if edge not in desired_edges]
+        added_edges = [edge for edge in desired_edges if edge not in current_edges]
+        
+        if not removed_edges and not added_edges:
+            return
+        
+        # Apply only the changes, both directions are stored for symmetrical relations
+        with transaction.atomic():
+            Connection.objects.filter(id__in=[row_id for edge in removed_edges for row_id in current_edges[edge]]).delete()
+            Connection.objects.bulk_create([
+                Connection(from_interface_id=from_id, to_interface_id=to_id)
+                for first_id, second_id in added_edges
+                for from_id, to_id in {(first_id, second_id), (second_id, first_id)}
+            ], ignore_conflicts=True)
+        
+        self.logger.info(f"Interface connections updated: {len(added_edges)} added, {len(removed_edges)} removed")
+        self.stats["connections"]["created"] += len(added_edges)
+        self.stats["connections"]["removed"] += len(removed_edges)
     
-    def process_neighbor_connection(self, local_interface, neighbor, routers_by_chassis):
+    def resolve_neighbor_edge(self, router, local_interface_name, neighbor, routers_by_chassis, interfaces, subinterfaces):
         remote_system_name = neighbor.get('system-name')
         port_id = neighbor.get('port-id', '')
         remote_chassis_id = neighbor.get('chassis-id')
         
         if not (remote_system_name and port_id and remote_chassis_id):
-            return
+            return None
         
         # Normalize interface name (handle various formats)
         remote_interface_name = self.normalize_interface_name(port_id)
@@ -892,72 +1014,39 @@ class _NetworkDiscoverer:
         remote_router = routers_by_chassis.get(remote_chassis_id)
         if not remote_router:
             self.logger.warning(f"Remote router {remote_system_name} not found or not reachable")
-            return
+            return None
         
         # Find the remote interface
-        try:
-            remote_interface = Interface.objects.get(router=remote_router, name=remote_interface_name)
-        except Interface.DoesNotExist:
+        remote = interfaces.get((remote_router.id, remote_interface_name))
+        if not remote:
             self.logger.warning(f"Remote interface {remote_system_name}:{remote_interface_name} not found")
-            return
+            return None
+        
+        local_id, local_vlan = interfaces[(router.id, local_interface_name)]
+        remote_id, remote_vlan = remote
         
         # Check if either interface is a subinterface
-        local_is_subinterface = '.' in local_interface.name
-        remote_is_subinterface = '.' in remote_interface.name
+        local_is_subinterface = '.' in local_interface_name
+        remote_is_subinterface = '.' in remote_interface_name
         
-        # If one is a subinterface and the other is physical, look for matching subinterface
+        # If one is a subinterface and the other is physical, look for the matching subinterface by VLAN
         if local_is_subinterface != remote_is_subinterface:
             if local_is_subinterface:
-                # Local is subinterface, remote is physical, find matching remote subinterface
-                matching_remote = self.find_matching_subinterface(local_interface, remote_interface)
-                if matching_remote:
-                    remote_interface = matching_remote
-                else:
-                    self.logger.debug(f"No matching subinterface found for {local_interface} on remote router")
-                    return
+                if not local_vlan:
+                    self.logger.warning(f"Subinterface {router.hostname}:{local_interface_name} has no VLAN assigned")
+                    return None
+                remote_id = subinterfaces.get((remote_router.id, remote_interface_name, local_vlan))
             else:
-                # Remote is subinterface, local is physical, find matching local subinterface
-                matching_local = self.find_matching_subinterface(remote_interface, local_interface)
-                if matching_local:
-                    local_interface = matching_local
-                else:
-                    self.logger.debug(f"No matching subinterface found for {remote_interface} on local router")
-                    return
-        
-        # Create the connection
-        with transaction.atomic():
-            local_interface.connected_interfaces.add(remote_interface)
-            self.logger.debug(f"Connected {local_interface} to {remote_interface}")
-            self.stats["connections"]["created"] += 1
-
-    def find_matching_subinterface(self, subinterface, physical_interface):
-        if not subinterface.vlan:
-            self.logger.warning(f"Subinterface {subinterface} has no VLAN assigned")
-            return None
-        
-        # Extract base physical interface name from physical_interface
-        base_name = physical_interface.name
+                if not remote_vlan:
+                    self.logger.warning(f"Subinterface {remote_system_name}:{remote_interface_name} has no VLAN assigned")
+                    return None
+                local_id = subinterfaces.get((router.id, local_interface_name, remote_vlan))
+            
+            if not local_id or not remote_id:
+                self.logger.debug(f"No matching subinterface found for {router.hostname}:{local_interface_name} and {remote_system_name}:{remote_interface_name}")
+                return None
         
-        # Find all subinterfaces of the physical interface with the same VLAN
-        try:
-            matching_subinterface = Interface.objects.get(
-                router=physical_interface.router,
-                name__startswith=f"{base_name}.",
-                vlan=subinterface.vlan
-            )
-            self.logger.debug(f"Found matching subinterface {matching_subinterface} with VLAN {subinterface.vlan}")
-            return matching_subinterface
-        except Interface.DoesNotExist:
-            self.logger.debug(f"No matching subinterface with VLAN {subinterface.vlan} found on {physical_interface.router}")
-            return None
-        except Interface.MultipleObjectsReturned:
-            self.logger.warning(f"Multiple matching subinterfaces with VLAN {subinterface.vlan} found on {physical_interface.router}")
-            # Get the first one in this case
-            return Interface.objects.filter(
-                router=physical_interface.router,
-                name__startswith=f"{base_name}.",
-                vlan=subinterface.vlan
-            ).first()
+        return (min(local_id, remote_id), max(local_id, remote_id))
     
     def normalize_interface_name(self, port_id):
         # Common interface abbreviation mappings
@@ -0,0 +1,128 @@
+import logging
+import ipaddress
+import threading
+from core.models import DHCPScope, Site
+from core.settings import get_settings
+from core.modules.utils.allocator import IntervalAllocator
+
+# Every customer numbers its PE-CE links from the same range
+LINK_NETWORKS = ipaddress.IPv4Network('192.168.0.0/16')
+
+# Site DHCP scopes and links are all /30 networks
+BLOCK_PREFIX = 30
+
+# Site IDs are positive and fit the site primary key
+SITE_IDS = (1, 2 ** 31)
+
+class _IPAM:
+    def __init__(self):
+        self.logger = logging.getLogger('ipam')
+        self.lock = threading.Lock()
+        self.pools = {}  # Allocator of every pool and the network it was built for, keyed by pool name
+        self.site_ids = None
+
+    def _get_pool(self, key, network, load_used_networks):
+        # Pools are built from the database on first use and whenever their network changes
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None or pool[0] != network:
+                block_size = 2 ** (32 - BLOCK_PREFIX)
+                allocator = IntervalAllocator(0, network.num_addresses // block_size)
+                base = int(network.network_address)
+                for used_network in load_used_networks():
+                    if not used_network.overlaps(network):
+                        continue
+                    # Every block the used network touches is taken
+                    first = max(int(used_network.network_address), base)
+                    last = min(int(used_network.broadcast_address), int(network.broadcast_address))
+                    for index in range((first - base) // block_size, (last - base) // block_size + 1):
+                        allocator.reserve(index)
+                pool = (network, allocator)
+                self.pools[key] = pool
+                self.logger.debug(f"Loaded IPAM pool {key} on {network}: {allocator.free} free blocks")
+            return pool
+
+    def _allocate(self, key, network, load_used_networks):
+        network, allocator = self._get_pool(key, network, load_used_networks)
+        index = allocator.allocate()
+        if index is None:
+            self.logger.error(f"IPAM pool {key} on {network} is exhausted")
+            return None
+        return ipaddress.IPv4Network((int(network.network_address) + index * 2 ** (32 - BLOCK_PREFIX), BLOCK_PREFIX))
+
+    def _release(self, key, address):
+        with self.lock:
+            pool = self.pools.get(key)
+        if pool is None:
+            return False
+        network, allocator = pool
+        address = ipaddress.IPv4Address(address)
+        if address not in network:
+            return False
+        return allocator.release((int(address) - int(network.network_address)) // 2 ** (32 - BLOCK_PREFIX))
+
+    def get_site_scopes_network(self):
+        settings = get_settings()
+        if not settings:
+            return None
+        return ipaddress.IPv4Network(f"{settings.dhcp_sites_network_address}/{settings.dhcp_sites_network_subnet_mask}", strict=False)
+
+    def allocate_site_scope(self):
+        # Returns the lowest free /30 of the sites DHCP network
+        network = self.get_site_scopes_network()
+        if network is None:
+            self.logger.error("Cannot allocate site DHCP scope: No system settings found")
+            return None
+        return self._allocate('site-scopes', network, lambda: [
+            ipaddress.IPv4Network(f"{scope.network}/{scope.subnet_mask}", strict=False)
+            for scope in DHCPScope.objects.all()
+        ])
+
+    def release_site_scope(self, address):
+        return self._release('site-scopes', address)
+
+    def allocate_link_network(self, customer):
+        # Returns the lowest /30 of the link range the customer does not use yet
+        return self._allocate(f"links-{customer.pk}", LINK_NETWORKS, lambda: [
+            ipaddress.IPv4Network(f"{address}/{BLOCK_PREFIX}", strict=False)
+            for address in Site.objects.filter(customer=customer).exclude(link_network=None).values_list('link_network', flat=True)
+        ])
+
+    def release_link_network(self, customer_id, address):
+        return self._release(f"links-{customer_id}", address)
+
+    def drop_link_networks(self, customer_id):
+        with self.lock:
+            return self.pools.pop(f"links-{customer_id}", None) is not None
+
+    def _get_site_ids(self):
+        with self.lock:
+            if self.site_ids is None:
+                allocator = IntervalAllocator(*SITE_IDS)
+                allocator.load(Site.objects.order_by('id').values_list('id', flat=True).iterator())
+                self.site_ids = allocator
+                self.logger.debug(f"Loaded site IDs: {allocator.get_stats()['fragments']} gaps")
+            return self.site_ids
+
+    def allocate_site_id(self):
+        # Returns the smallest unused site ID, IDs stay compact as they are part of route distinguishers
+        site_id = self._get_site_ids().allocate()
+        if site_id is None:
+            raise ValueError("No site ID available")
+        return site_id
+
+    def release_site_id(self, site_id):
+        with self.lock:
+            allocator = self.site_ids
+        return allocator.release(site_id) if allocator else False
+
+    def get_stats(self):
+        with self.lock:
+            pools = dict(self.pools)
+            site_ids = self.site_ids
+        stats = {key: dict(allocator.get_stats(), network=str(network)) for key, (network, allocator) in pools.items()}
+        if site_ids:
+            stats['site-ids'] = site_ids.get_stats()
+        return stats
+
+IPAM = _IPAM()
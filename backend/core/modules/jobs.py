@@ -0,0 +1,218 @@
+import logging
+import threading
+from collections import namedtuple
+from django.db import close_old_connections
+from django.utils import timezone
+from core.models import ProvisioningJob
+from core.modules.utils.executor import IOExecutor
+
+# Loggers whose messages are reported as progress of the job running on the same thread
+PROGRESS_LOGGERS = ['network-controller', 'service-controller']
+
+QueuedJob = namedtuple('QueuedJob', ['job_id', 'devices', 'function', 'args', 'kwargs'])
+
+class _JobProgressHandler(logging.Handler):
+    def __init__(self, manager):
+        super().__init__(level=logging.INFO)
+        self.manager = manager
+
+    def emit(self, record):
+        job_id = getattr(self.manager.local, 'job_id', None)
+        if job_id is not None:
+            self.manager.add_event(job_id, record.levelname.lower(), record.getMessage())
+
+class _ProvisioningJobManager:
+    def __init__(self):
+        self.logger = logging.getLogger('provisioning-jobs')
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)  # Notified on every job update, used for streaming
+        self.jobs = {}  # State of the jobs queued or running in this process
+        self.waiting = []  # Jobs not started yet, in the order they were queued
+        self.busy_devices = set()  # Routers touched by a running job, jobs on the same router run one at a time
+        self.runners = 0  # Provisioning lane tasks running jobs
+        self.max_runners = IOExecutor.get_lane('provisioning').max_workers
+        self.local = threading.local()
+        self.initialized = False
+
+    def initialize(self):
+        if self.initialized:
+            return
+
+        try:
+            # Jobs that were queued or running when the process stopped will never finish
+            interrupted = ProvisioningJob.objects.filter(status__in=['queued', 'running']).update(
+                status='failed',
+                error='Interrupted by a restart',
+                finished_at=timezone.now()
+            )
+            if interrupted:
+                self.logger.warning(f"Marked {interrupted} interrupted provisioning jobs as failed")
+        except Exception as e:
+            self.logger.debug(f"Cannot recover provisioning jobs: {str(e)}")
+            return
+
+        handler = _JobProgressHandler(self)
+        for name in PROGRESS_LOGGERS:
+            logging.getLogger(name).addHandler(handler)
+        self.initialized = True
+
+    def enqueue(self, kind, description, devices, function, *args, **kwargs):
+        # Returns the queued job right away, the workflow runs on the provisioning lane
+        self.initialize()
+
+        devices = sorted({device for device in devices if device})
+        job = ProvisioningJob.objects.create(kind=kind, description=description, devices=devices)
+        with self.lock:
+            self.jobs[job.id] = self.serialize(job)
+            self.waiting.append(QueuedJob(job.id, devices, function, args, kwargs))
+            runners = self._add_runners(len(self._ready()))
+
+        self.logger.info(f"Queued {kind} job {job.id} on {', '.join(devices) or 'no devices'}")
+        self._start_runners(runners)
+        return job
+
+    def _ready(self):
+        # Queued jobs that can start now, none of their routers is busy or claimed by a job queued before them
+        blocked = set(self.busy_devices)
+        ready = []
+        for queued_job in self.waiting:
+            if blocked.isdisjoint(queued_job.devices):
+                ready.append(queued_job)
+            blocked.update(queued_job.devices)
+        return ready
+
+    def _add_runners(self, wanted):
+        # Called with the lock held, the lane never gets more runners than it has workers
+        count = max(0, min(wanted, self.max_runners - self.runners))
+        self.runners += count
+        return count
+
+    def _start_runners(self, count):
+        for _ in range(count):
+            IOExecutor.submit('provisioning', self._work)
+
+    def _work(self):
+        # Runs jobs as long as one is ready, jobs waiting for a busy router never hold a lane worker
+        close_old_connections()
+        try:
+            while True:
+                with self.lock:
+                    ready = self._ready()
+                    if not ready:
+                        self.runners -= 1
+                        return
+                    queued_job = ready[0]
+                    self.waiting.remove(queued_job)
+                    self.busy_devices.update(queued_job.devices)
+                    # Other jobs the last one was holding back get runners of their own
+                    runners = self._add_runners(len(ready) - 1)
+
+                self._start_runners(runners)
+                try:
+                    self._run(*queued_job)
+                finally:
+                    with self.lock:
+                        self.busy_devices.difference_update(queued_job.devices)
+        finally:
+            close_old_connections()
+
+    def _run(self, job_id, devices, function, args, kwargs):
+        success, result, error = False, None, None
+        try:
+            self._update(job_id, status='running', started_at=timezone.now())
+            self.local.job_id = job_id
+            try:
+                outcome = function(*args, **kwargs)
+                # Workflows return either a success flag or a (success, result) pair
+                success, result = outcome if isinstance(outcome, tuple) else (bool(outcome), None)
+                if not success:
+                    error = 'Provisioning workflow failed, see the job events for details'
+            except Exception as e:
+                self.logger.error(f"Provisioning job {job_id} raised: {str(e)}")
+                error = str(e)
+            finally:
+                self.local.job_id = None
+
+            self._update(
+                job_id,
+                status='succeeded' if success else 'failed',
+                result=result,
+                error=error,
+                finished_at=timezone.now()
+            )
+            self.logger.info(f"Provisioning job {job_id} {'succeeded' if success else 'failed'}")
+        finally:
+            with self.changed:
+                self.jobs.pop(job_id, None)
+                self.changed.notify_all()
+
+    def _update(self, job_id, **fields):
+        with self.changed:
+            state = self.jobs.get(job_id)
+            if state is not None:
+                state.update({
+                    name: value.isoformat() if hasattr(value, 'isoformat') else value
+                    for name, value in fields.items()
+                })
+                # Progress events are only kept in memory until the next status change
+                fields['events'] = list(state['events'])
+                state['version'] += 1
+                self.changed.notify_all()
+
+        ProvisioningJob.objects.filter(pk=job_id).update(**fields)
+
+    def add_event(self, job_id, level, message):
+        with self.changed:
+            state = self.jobs.get(job_id)
+            if state is None:
+                return
+            state['events'].append({
+                'time': timezone.now().isoformat(),
+                'level': level,
+                'message': message
+            })
+            state['version'] += 1
+            self.changed.notify_all()
+
+    def get(self, job_id):
+        # Live state for jobs of this process, stored state for the others
+        state = self.get_live(job_id)
+        if state is not None:
+            return state
+
+        job = ProvisioningJob.objects.filter(pk=job_id).first()
+        return self.serialize(job) if job else None
+
+    def get_live(self, job_id):
+        with self.lock:
+            state = self.jobs.get(job_id)
+            return dict(state, events=list(state['events'])) if state is not None else None
+
+    def wait_for_change(self, job_id, version, timeout=15):
+        # Blocks until the job moves past the given version, returns None once it is no longer live
+        with self.changed:
+            self.changed.wait_for(
+                lambda: job_id not in self.jobs or self.jobs[job_id]['version'] != version,
+                timeout=timeout
+            )
+            state = self.jobs.get(job_id)
+            return dict(state, events=list(state['events'])) if state else None
+
+    def serialize(self, job):
+        return {
+            'id': job.id,
+            'kind': job.kind,
+            'description': job.description,
+            'status': job.status,
+            'devices': job.devices,
+            'events': list(job.events),
+            'result': job.result,
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+            'version': 0
+        }
+
+ProvisioningJobs = _ProvisioningJobManager()
+ProvisioningJobs.initialize()
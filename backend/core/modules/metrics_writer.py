@@ -0,0 +1,106 @@
+import time
+import logging
+import threading
+from django.db import transaction
+from django.db.models import Max
+from core.models import RouterMetric, InterfaceMetric, RouterMetricValues, InterfaceMetricValues, LatestRouterMetric, LatestInterfaceMetric
+
+# Sample fields copied into the latest sample tables
+ROUTER_VALUE_FIELDS = [field.name for field in RouterMetricValues._meta.fields]
+INTERFACE_VALUE_FIELDS = [field.name for field in InterfaceMetricValues._meta.fields]
+
+class MetricsWriter:
+    def __init__(self):
+        self.logger = logging.getLogger('network-monitor')
+        self.lock = threading.Lock()
+        self.router_metrics = []
+        self.interface_metrics = []
+        self.latest_backfilled = False
+        self.stats = {
+            "flushes": 0,
+            "rows_written": 0,
+            "last_batch_size": 0,
+            "last_flush_latency": 0.0
+        }
+
+    def add_router_metric(self, router_metric):
+        with self.lock:
+            self.router_metrics.append(router_metric)
+
+    def add_interface_metrics(self, interface_metrics):
+        with self.lock:
+            self.interface_metrics.extend(interface_metrics)
+
+    def pending(self):
+        with self.lock:
+            return len(self.router_metrics) + len(self.interface_metrics)
+
+    def flush(self):
+        # Swap the buffers so collection can continue while we write
+        with self.lock:
+            router_metrics, self.router_metrics = self.router_metrics, []
+            interface_metrics, self.interface_metrics = self.interface_metrics, []
+
+        batch_size = len(router_metrics) + len(interface_metrics)
+        if not batch_size:
+            return [], []
+
+        if not self.latest_backfilled:
+            self.backfill_latest()
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            RouterMetric.objects.bulk_create(router_metrics)
+            InterfaceMetric.objects.bulk_create(interface_metrics)
+            self.upsert_latest(router_metrics, interface_metrics)
+        latency = time.perf_counter() - start
+
+        with self.lock:
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += batch_size
+            self.stats["last_batch_size"] = batch_size
+            self.stats["last_flush_latency"] = latency
+
+        self.logger.info(f"Flushed {len(router_metrics)} device metrics and {len(interface_metrics)} interface metrics in {latency * 1000:.1f} ms")
+        return router_metrics, interface_metrics
+
+    def upsert_latest(self, router_metrics, interface_metrics):
+        # Keep only the newest sample of each router and interface in the batch
+        latest_routers = {metric.router_id: metric for metric in router_metrics}
+        latest_interfaces = {metric.interface_id: metric for metric in interface_metrics}
+
+        LatestRouterMetric.objects.bulk_create(
+            [self._copy(LatestRouterMetric, metric, ROUTER_VALUE_FIELDS, router_id=metric.router_id) for metric in latest_routers.values()],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['router'],
+            update_fields=ROUTER_VALUE_FIELDS + ['metric_id']
+        )
+        LatestInterfaceMetric.objects.bulk_create(
+            [self._copy(LatestInterfaceMetric, metric, INTERFACE_VALUE_FIELDS, interface_id=metric.interface_id) for metric in latest_interfaces.values()],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['interface'],
+            update_fields=INTERFACE_VALUE_FIELDS + ['metric_id']
+        )
+
+    def backfill_latest(self):
+        # Fill the latest sample tables from metrics stored before they existed
+        self.latest_backfilled = True
+        try:
+            with transaction.atomic():
+                if not LatestRouterMetric.objects.exists():
+                    latest_ids = RouterMetric.objects.order_by().values('router').annotate(latest_id=Max('id')).values_list('latest_id', flat=True)
+                    self.upsert_latest(RouterMetric.objects.filter(id__in=latest_ids), [])
+                if not LatestInterfaceMetric.objects.exists():
+                    latest_ids = InterfaceMetric.objects.order_by().values('interface').annotate(latest_id=Max('id')).values_list('latest_id', flat=True)
+                    self.upsert_latest([], InterfaceMetric.objects.filter(id__in=latest_ids))
+        except Exception as exception:
+            self.logger.error(f"Error backfilling latest metrics: {str(exception)}")
+
+    def _copy(self, model, metric, fields, **kwargs):
+        return model(metric_id=metric.id, **{field: getattr(metric, field) for field in fields}, **kwargs)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, pending=len(self.router_metrics) + len(self.interface_metrics))
@@ -1,11 +1,21 @@
+import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from django.utils import timezone
 from core.models import Router, RouterMetric, InterfaceMetric, Notification
-from core.modules.utils.restconf import RestconfWrapper
+from core.modules.metrics_writer import MetricsWriter
+from core.modules.sample_cache import InterfaceSampleCache
+from core.modules.rollup import MetricRollup
+from core.modules.retention import RetentionManager
+from core.modules.utils.restconf import RestconfWrapper, AsyncRestconfClient, DeviceHealth
 from core.settings import get_settings
 
+# RESTCONF paths polled on every monitoring cycle
+CPU_PATH = "Cisco-IOS-XE-process-cpu-oper:cpu-usage/cpu-utilization"
+MEMORY_PATH = "Cisco-IOS-XE-platform-software-oper:cisco-platform-software/control-processes/control-process=fru-rp,0,0,-1/memory-stats"
+STORAGE_PATH = "Cisco-IOS-XE-platform-software-oper:cisco-platform-software/q-filesystem"
+INTERFACES_PATH = "Cisco-IOS-XE-interfaces-oper:interfaces/interface"
+
 class _NetworkMonitor:
     def __init__(self):
         self.logger = logging.getLogger('network-monitor')
@@ -24,7 +34,10 @@ class _NetworkMonitor:
         self.last_notification_hashes = {}
         self.is_running = False
         self.monitor_interval = 30  # seconds
-        self.max_workers = 5  # Default number of worker threads
+        self.max_concurrency = 50  # Maximum in-flight RESTCONF requests per monitoring cycle
+        self.metrics_writer = MetricsWriter()  # Buffers samples and bulk inserts them once per cycle
+        self.sample_cache = InterfaceSampleCache()  # Previous sample of every interface for delta checks
+        self.metric_rollup = MetricRollup()  # 1 minute, 5 minute and 1 hour aggregates for long ranges
 
     def initialize(self):
         if self.initialized:
@@ -39,26 +52,88 @@ class _NetworkMonitor:
         self.initialized = True
         
     def monitor_all_routers(self):
-        routers = Router.objects.all()  # Monitor all routers, not just reachable ones
-        self.logger.info(f"Starting network-wide monitoring cycle for {routers.count()} devices")
+        routers = list(Router.objects.all())  # Monitor all routers, not just reachable ones
+        self.logger.info(f"Starting network-wide monitoring cycle for {len(routers)} devices")
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_router = {executor.submit(self.monitor_router, router): router for router in routers}
-            
-            for future in future_to_router:
-                router = future_to_router[future]
-                try:
-                    future.result()
-                except Exception as e:
-                    self.logger.error(f"Error monitoring device {router.hostname}: {str(e)}")
+        # Fetch every path of every router concurrently, then process the results here
+        results = asyncio.run(self.fetch_all_routers(routers))
+        
+        for router, result in zip(routers, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Error monitoring device {router.hostname}: {str(result)}")
+                continue
+            try:
+                self.process_router(router, result)
+            except Exception as e:
+                self.logger.error(f"Error monitoring device {router.hostname}: {str(e)}")
+        
+        # Write the samples of every router in a single transaction
+        self.flush_metrics()
         
         self.logger.info("Completed network-wide monitoring cycle")
 
+    async def fetch_all_routers(self, routers):
+        async with AsyncRestconfClient(self.restconf, max_concurrency=self.max_concurrency) as client:
+            return await asyncio.gather(
+                *(self.fetch_router(client, router) for router in routers),
+                return_exceptions=True
+            )
+
+    async def fetch_router(self, client, router):
+        ip_address = router.management_ip_address
+        
+        # Devices with an open circuit breaker are known to be down, skip them without using a worker
+        if DeviceHealth.is_open(ip_address):
+            return None
+        
+        # Skip the metric paths entirely when RESTCONF is down
+        if not await client.is_available(ip_address):
+            return None
+        
+        cpu_data, memory_data, storage_data, interfaces_data = await asyncio.gather(
+            client.get(ip_address, CPU_PATH),
+            client.get(ip_address, MEMORY_PATH),
+            client.get(ip_address, STORAGE_PATH),
+            client.get(ip_address, INTERFACES_PATH)
+        )
+        
+        return {
+            'cpu_data': cpu_data,
+            'memory_data': memory_data,
+            'storage_data': storage_data,
+            'interfaces_data': interfaces_data
+        }
+
     def monitor_router(self, router):
         self.logger.info(f"Monitoring device {router.hostname} ({router.management_ip_address})")
         
         # Check if RESTCONF is available
-        if not self.restconf.is_available(router.management_ip_address):
+        if DeviceHealth.is_open(router.management_ip_address) or not self.restconf.is_available(router.management_ip_address):
+            self.process_router(router, None)
+            return
+        
+        self.process_router(router, {
+            'cpu_data': self.restconf.get(router.management_ip_address, CPU_PATH),
+            'memory_data': self.restconf.get(router.management_ip_address, MEMORY_PATH),
+            'storage_data': self.restconf.get(router.management_ip_address, STORAGE_PATH),
+            'interfaces_data': self.restconf.get(router.management_ip_address, INTERFACES_PATH)
+        })
+        self.flush_metrics()
+
+    def flush_metrics(self):
+        try:
+            router_metrics, interface_metrics = self.metrics_writer.flush()
+        except Exception as e:
+            self.logger.error(f"Error writing collected metrics: {str(e)}")
+            return
+
+        try:
+            self.metric_rollup.add(router_metrics, interface_metrics)
+        except Exception as e:
+            self.logger.error(f"Error updating metric rollups: {str(e)}")
+
+    def process_router(self, router, data):
+        if data is None:
             self.logger.warning(f"Device {router.hostname} is not reachable via RESTCONF")
             if router.reachable:  # Only update if status changed
                 router.reachable = False
@@ -84,41 +159,32 @@ class _NetworkMonitor:
                 source="monitoring"
             )
         
-        # Collect system metrics
-        self.collect_system_metrics(router)
+        # Process system metrics
+        self.process_system_metrics(router, data['cpu_data'], data['memory_data'], data['storage_data'])
         
-        # Collect interface metrics
-        self.collect_interface_metrics(router)
+        # Process interface metrics
+        self.process_interface_metrics(router, data['interfaces_data'])
         
         self.logger.info(f"Completed monitoring for device {router.hostname}")
 
     def collect_system_metrics(self, router):
-        # Collect CPU usage metrics
-        cpu_data = self.restconf.get(
-            router.management_ip_address,
-            "Cisco-IOS-XE-process-cpu-oper:cpu-usage/cpu-utilization"
+        self.process_system_metrics(
+            router,
+            self.restconf.get(router.management_ip_address, CPU_PATH),
+            self.restconf.get(router.management_ip_address, MEMORY_PATH),
+            self.restconf.get(router.management_ip_address, STORAGE_PATH)
         )
-        
+        self.flush_metrics()
+
+    def process_system_metrics(self, router, cpu_data, memory_data, storage_data):
         if not cpu_data:
             self.logger.warning(f"Failed to collect CPU metrics for {router.hostname}")
             return
         
-        # Collect memory metrics
-        memory_data = self.restconf.get(
-            router.management_ip_address,
-            "Cisco-IOS-XE-platform-software-oper:cisco-platform-software/control-processes/control-process=fru-rp,0,0,-1/memory-stats"
-        )
-        
         if not memory_data or 'Cisco-IOS-XE-platform-software-oper:memory-stats' not in memory_data:
             self.logger.warning(f"Failed to collect memory metrics for {router.hostname}")
             return
         
-        # Collect storage metrics
-        storage_data = self.restconf.get(
-            router.management_ip_address,
-            "Cisco-IOS-XE-platform-software-oper:cisco-platform-software/q-filesystem"
-        )
-        
         if not storage_data or 'Cisco-IOS-XE-platform-software-oper:q-filesystem' not in storage_data:
             self.logger.warning(f"Failed to collect storage metrics for {router.hostname}")
             return
@@ -161,7 +227,7 @@ class _NetworkMonitor:
         storage_free = storage_total - storage_used
         storage_used_percent = float(storage_stats.get('used-percent', 0))
         
-        # Store metrics in database
+        # Queue metrics for the end of cycle flush
         router_metric = RouterMetric(
             router=router,
             cpu_usage_5s=cpu_5s,
@@ -176,7 +242,7 @@ class _NetworkMonitor:
             storage_used=storage_used,
             storage_free=storage_free,
         )
-        router_metric.save()
+        self.metrics_writer.add_router_metric(router_metric)
         
         # Check thresholds and create notifications if needed
         self._check_cpu_thresholds(router, cpu_5m)
@@ -226,24 +292,32 @@ class _NetworkMonitor:
         return cpu_info
 
     def collect_interface_metrics(self, router):
-        interfaces_data = self.restconf.get(
-            router.management_ip_address,
-            "Cisco-IOS-XE-interfaces-oper:interfaces/interface"
+        self.process_interface_metrics(
+            router,
+            self.restconf.get(router.management_ip_address, INTERFACES_PATH)
         )
-        
+        self.flush_metrics()
+
+    def process_interface_metrics(self, router, interfaces_data):
         if not interfaces_data or 'Cisco-IOS-XE-interfaces-oper:interface' not in interfaces_data:
             self.logger.warning(f"Failed to collect interface metrics for {router.hostname}")
             return
         
         interface_list = interfaces_data.get('Cisco-IOS-XE-interfaces-oper:interface', [])
         
+        if not self.sample_cache.warmed:
+            self.warm_sample_cache()
+        
+        # Load all interfaces of the router once instead of querying them one by one
+        interfaces_by_name = {interface.name: interface for interface in router.interfaces.all()}
+        interface_metrics = []
+        
         for intf_data in interface_list:
             interface_name = intf_data.get('name')
             
             # Find the interface in the database
-            try:
-                interface = router.interfaces.get(name=interface_name)
-            except router.interfaces.model.DoesNotExist:
+            interface = interfaces_by_name.get(interface_name)
+            if not interface:
                 self.logger.debug(f"Interface {interface_name} not found in database for device {router.hostname}")
                 continue
             
@@ -264,7 +338,7 @@ class _NetworkMonitor:
             bps_in = rx_kbps * 1000
             bps_out = tx_kbps * 1000
             
-            # Store metrics in database
+            # Queue metrics for the end of cycle flush
             interface_metric = InterfaceMetric(
                 interface=interface,
                 operational_status=operational_status,
@@ -277,11 +351,17 @@ class _NetworkMonitor:
                 bps_in=bps_in,
                 bps_out=bps_out
             )
-            interface_metric.save()
+            interface_metrics.append(interface_metric)
+            
+            # Compare against the previous sample held in memory
+            deltas = self.sample_cache.update(interface.id, self.sample_cache.sample_from_metric(interface_metric))
             
             # Check interface status
             self._check_interface_status(interface, operational_status)
-            self._check_interface_errors(interface, in_errors, out_errors)
+            if deltas:
+                self._check_interface_errors(interface, interface_metric, deltas)
+        
+        self.metrics_writer.add_interface_metrics(interface_metrics)
     
     def _check_cpu_thresholds(self, router, cpu_usage):
         if cpu_usage >= self.thresholds['cpu_critical']:
@@ -341,30 +421,34 @@ class _NetworkMonitor:
                 source="monitoring"
             )
     
-    def _check_interface_errors(self, interface, in_errors, out_errors):
-        previous_metrics = InterfaceMetric.objects.filter(
-            interface=interface
-        ).order_by('-timestamp')[1:2]  # Get the second-to-last metric
-        
-        if previous_metrics:
-            prev_in_errors = previous_metrics[0].in_errors
-            prev_out_errors = previous_metrics[0].out_errors
-            
-            if in_errors > prev_in_errors:
-                self._create_notification(
-                    title=f"Increasing input errors on {interface.name}",
-                    message=f"Input errors on interface {interface.name} increased from {prev_in_errors} to {in_errors}",
-                    severity="warning",
-                    source="monitoring"
-                )
-            
-            if out_errors > prev_out_errors:
-                self._create_notification(
-                    title=f"Increasing output errors on {interface.name}",
-                    message=f"Output errors on interface {interface.name} increased from {prev_out_errors} to {out_errors}",
-                    severity="warning",
-                    source="monitoring"
-                )
+    def _check_interface_errors(self, interface, interface_metric, deltas):
+        previous = deltas['previous']
+        minutes = deltas['elapsed'] / 60
+        
+        counters = [
+            ('in_errors', 'input errors'),
+            ('out_errors', 'output errors'),
+            ('in_discards', 'input discards'),
+            ('out_discards', 'output discards')
+        ]
+        for field, label in counters:
+            if deltas[field] <= 0:
+                continue
+            rate = f" ({deltas[field] / minutes:.1f} per minute)" if minutes > 0 else ""
+            self._create_notification(
+                title=f"Increasing {label} on {interface.name}",
+                message=f"{label.capitalize()} on interface {interface.name} increased from {getattr(previous, field)} to {getattr(interface_metric, field)}{rate}",
+                severity="warning",
+                source="monitoring"
+            )
+    
+    def warm_sample_cache(self):
+        try:
+            self.sample_cache.warm()
+        except Exception as exception:
+            # Deltas will start from the next sample instead
+            self.sample_cache.warmed = True
+            self.logger.error(f"Error warming interface sample cache: {str(exception)}")
     
     def _create_notification(self, title, message, severity, source, router=None, interface=None):
         import hashlib
@@ -420,13 +504,14 @@ class _NetworkMonitor:
         ).order_by('timestamp')
     
     def purge_old_metrics(self, days=30):
+        # Only raw metrics, deleted in chunks like scheduled retention does
         cutoff_date = timezone.now() - timedelta(days=days)
-        
-        deleted_router_metrics = RouterMetric.objects.filter(timestamp__lt=cutoff_date).delete()
-        self.logger.info(f"Purged {deleted_router_metrics[0]} old device metrics")
-        
-        deleted_interface_metrics = InterfaceMetric.objects.filter(timestamp__lt=cutoff_date).delete()
-        self.logger.info(f"Purged {deleted_interface_metrics[0]} old interface metrics")
+
+        deleted_router_metrics = RetentionManager.purge_table(RouterMetric, 'timestamp', cutoff_date)
+        self.logger.info(f"Purged {deleted_router_metrics['purged']} old device metrics")
+
+        deleted_interface_metrics = RetentionManager.purge_table(InterfaceMetric, 'timestamp', cutoff_date)
+        self.logger.info(f"Purged {deleted_interface_metrics['purged']} old interface metrics")
 
     def get_device_info(self, router):
         """
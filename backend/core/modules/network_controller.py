@@ -1,9 +1,14 @@
 import logging
 import ipaddress
 from typing import List
+from collections import defaultdict
+from django.db import transaction
 from core.modules.utils.host_network_manager import HostNetworkManager
 from core.modules.discovery import NetworkDiscoverer
+from core.modules.ipam import IPAM, LINK_NETWORKS
 from core.modules.utils.restconf import RestconfWrapper
+from core.modules.utils.executor import IOExecutor
+from core.modules.utils.config_compiler import ConfigCompiler, config_workflow
 from core.models import Interface, Site, Router, VRF, RouteTarget, Customer, DHCPScope
 from core.settings import get_settings
 
@@ -25,6 +30,20 @@ class _NetworkController:
         self.restconf = RestconfWrapper(max_retries=4)
         self.initialized = True
 
+    def commit_changes(self) -> bool:
+        # Pushes what the running workflow staged so far, used where later steps depend on it
+        return ConfigCompiler.commit()
+
+    def finish_workflow(self, transaction):
+        # Earlier phases may have been applied to a device whose later changes were rejected, so it is rediscovered in full
+        for router in Router.objects.filter(management_ip_address__in=transaction.failed_devices):
+            self.logger.warning(f"Configuration changes to {router} were not applied, invalidating its discovery state")
+            NetworkDiscoverer.invalidate_fingerprints(router)
+
+        # Persist everything the workflow changed to startup
+        for ip_address in transaction.devices:
+            self.restconf.flush(ip_address)
+
     def set_router_hostname(self, router: Router, hostname: str) -> bool:
 
         self.logger.debug(f"Attempting hostname change to {hostname} on {router.management_ip_address}")
@@ -41,7 +60,7 @@ class _NetworkController:
 
         if result is not None:
             router.hostname = hostname
-            router.save()
+            ConfigCompiler.on_commit(router.management_ip_address, router.save)
             self.logger.info(f"Successfully changed hostname to {hostname} on {router.management_ip_address}")
             return True
 
@@ -69,7 +88,7 @@ class _NetworkController:
             
             if result is not None:
                 interface.enabled = True
-                interface.save()
+                ConfigCompiler.on_commit(interface.router.management_ip_address, interface.save)
                 self.logger.info(f"Successfully enabled interface {interface.name} on {interface.router}")
                 return True
             else:
@@ -93,7 +112,7 @@ class _NetworkController:
             
             if result is not None:
                 interface.enabled = False
-                interface.save()
+                ConfigCompiler.on_commit(interface.router.management_ip_address, interface.save)
                 self.logger.info(f"Successfully disabled interface {interface.name} on {interface.router}")
                 return True
             else:
@@ -104,6 +123,7 @@ class _NetworkController:
             self.logger.error(f"Error disabling interface {interface.name}: {str(exception)}")
             return False
 
+    @config_workflow('update_interface', phase=False)
     def create_or_update_interface(self, interface: Interface) -> bool:
         try:
             self.logger.debug(f"Updating interface {interface.name} on router {interface.router}")
@@ -174,8 +194,8 @@ class _NetworkController:
                     self.disable_interface(interface)
                 if not interface.vrf:
                     self.unassign_vrf(interface)
-                # Update the database
-                interface.save()
+                # Update the database once the router applied the change
+                ConfigCompiler.on_commit(interface.router.management_ip_address, interface.save)
                 self.logger.info(f"Successfully updated interface {interface.name} on {interface.router}")
                 return True
             else:
@@ -227,8 +247,8 @@ class _NetworkController:
             )
             
             if result:
-                # Delete the interface from the database
-                interface.delete()
+                # Delete the interface from the database once the router applied the change
+                ConfigCompiler.on_commit(interface.router.management_ip_address, interface.delete)
                 self.logger.info(f"Successfully deleted interface {interface.name} from {interface.router}")
                 return True
             else:
@@ -256,7 +276,7 @@ class _NetworkController:
             
             if result:
                 interface.vrf = None
-                interface.save()
+                ConfigCompiler.on_commit(interface.router.management_ip_address, interface.save)
                 self.logger.info(f"Successfully unassigned VRF {interface.name} on {interface.router}")
                 return True
             else:
@@ -310,7 +330,7 @@ class _NetworkController:
                 )
             
             if result is not None:
-                vrf.save()
+                ConfigCompiler.on_commit(vrf.router.management_ip_address, vrf.save)
                 self.logger.info(f"Successfully configured VRF {vrf.name} on {vrf.router}")
                 return True
             else:
@@ -321,6 +341,7 @@ class _NetworkController:
             self.logger.error(f"Error configuring VRF {vrf.name}: {str(exception)}")
             return False
 
+    @config_workflow('delete_vrf', phase=False)
     def delete_vrf(self, vrf: VRF) -> bool:
         # Check if the VRF exists in the database
         if not vrf.pk:
@@ -342,7 +363,8 @@ class _NetworkController:
             )
             
             if result:
-                vrf.delete()
+                # Its route targets go with it
+                ConfigCompiler.on_commit(vrf.router.management_ip_address, vrf.delete)
                 self.logger.info(f"Successfully deleted VRF {vrf.name} from {vrf.router}")
                 return True
             else:
@@ -353,6 +375,7 @@ class _NetworkController:
             self.logger.error(f"Error deleting VRF {vrf.name}: {str(exception)}")
             return False
 
+    @config_workflow('assign_interface')
     def assign_interface(self, interface: Interface, site: Site) -> bool:
         # Validate inputs
         if not interface.pk or not site.pk:
@@ -381,10 +404,6 @@ class _NetworkController:
                 self.logger.error(f"Cannot assign interface: Failed to add route for DHCP scope {dhcp_scope}")
                 return False
 
-            # Activate DHCP scope
-            site.dhcp_scope.is_active = True
-            site.dhcp_scope.save()
-
             # Determine first usable IP in the /30 scope
             first_ip = str(list(dhcp_scope.hosts())[0])
 
@@ -419,6 +438,15 @@ class _NetworkController:
                 self.logger.error(f"Failed creating or updating VRF {site_vrf}")
                 return False
 
+            if not self.commit_changes():
+                HostNetworkManager.delete_route(str(dhcp_scope), settings.host_interface_id)
+                self.logger.error(f"Failed applying configuration for site {site} on {interface.router}")
+                return False
+
+            # Activate DHCP scope
+            site.dhcp_scope.is_active = True
+            site.dhcp_scope.save()
+
             # Update site in database
             site.assigned_interface = interface
             site.vrf = site_vrf
@@ -433,6 +461,7 @@ class _NetworkController:
             self.logger.error(f"Error assigning interface to site: {str(exception)}")
             return False
 
+    @config_workflow('unassign_interface')
     def unassign_interface(self, site: Site) -> bool:
         if not site.assigned_interface:
             self.logger.warning("Site doesn't have an assigned interface")
@@ -470,6 +499,10 @@ class _NetworkController:
                 self.logger.error(f"Failed to clear interface {interface}")
                 return False
 
+            if not self.commit_changes():
+                self.logger.error(f"Failed applying configuration to clear interface {interface}")
+                return False
+
             # Remove route to site's DHCP scope
             HostNetworkManager.delete_route(str(dhcp_scope))
 
@@ -568,6 +601,7 @@ class _NetworkController:
             self.logger.error(f"Error configuring OSPF process {process_id} on {router}: {str(exception)}")
             return False
 
+    @config_workflow('enable_routing')
     def enable_routing(self, site):
         self.logger.info(f"Enabling routing for site {site}")
         
@@ -618,29 +652,14 @@ class _NetworkController:
             self.logger.error(f"Failed creating or updating management VRF on {ce_router}")
             return False
         
-        # Determine IP addressing for the link
-        link_network = None
-
-        # Start with the 192.168.0.0/16 network
-        base_network = ipaddress.ip_network('192.168.0.0/16')
-        
-        # Get all /30 subnets from the base network
-        all_possible_subnets = list(base_network.subnets(new_prefix=30))
-        
-        # Get all currently used link networks for the same customer
-        used_networks = Site.objects.filter(customer=site.customer).exclude(pk=site.pk).values_list('link_network', flat=True)
-        used_networks = [ipaddress.ip_network(f"{ip}/30") for ip in used_networks if ip]
-        
-        # Find the first available subnet
-        for subnet in all_possible_subnets:
-            if subnet not in used_networks:
-                site.link_network = str(subnet.network_address)
-                break
-        
-        # If no subnet is available, raise an exception
+        # Determine IP addressing for the link, a site keeps the link network of an earlier attempt
         if not site.link_network:
-            self.logger.error("No available /30 subnet in 192.168.0.0/16 range for this customer")
-            return False
+            link_network = IPAM.allocate_link_network(site.customer)
+            if not link_network:
+                self.logger.error(f"No available /30 subnet in {LINK_NETWORKS} range for this customer")
+                return False
+            site.link_network = str(link_network.network_address)
+            site.save(update_fields=['link_network'])
         
         link_network = ipaddress.IPv4Network(f'{site.link_network}/30', strict=False)
         pe_ip = str(link_network[1])
@@ -661,6 +680,11 @@ class _NetworkController:
             self.logger.error(f"Failed updating CE subinterface {ce_subinterface}")
             return False
 
+        # First phase: the CE management subinterface has to exist before the PE moves its side
+        if not self.commit_changes():
+            self.logger.error(f"Failed configuring management subinterface on CE router {ce_router}")
+            return False
+
         # Configure PE interface with the correct routing configuration
         pe_interface.addressing = "static"
         pe_interface.ip_address = pe_ip
@@ -691,6 +715,11 @@ class _NetworkController:
             self.logger.error(f"Failed updating PE subinterface {pe_subinterface}")
             return False
 
+        # Second phase: the PE link and management subinterface, after which the CE is reachable again
+        if not self.commit_changes():
+            self.logger.error(f"Failed configuring site link on PE router {pe_router}")
+            return False
+
         # Finally configure the CE interface with the correct routing configuration
         ce_interface.addressing = "static"
         ce_interface.ip_address = ce_ip
@@ -743,6 +772,11 @@ class _NetworkController:
             self.logger.error(f"Failed enabling route distribution on {pe_router}")
             return False
 
+        # Last phase: CE addressing, OSPF on both routers and redistribution on the PE
+        if not self.commit_changes():
+            self.logger.error(f"Failed configuring routing for site {site}")
+            return False
+
         self.logger.info(f"Successfully configured routing for site {site}")
         
         # Only set has_routing to True if all configuration succeeded
@@ -754,6 +788,7 @@ class _NetworkController:
 
         return True
 
+    @config_workflow('disable_routing')
     def disable_routing(self, site):
         self.logger.info(f"Disabling routing for site {site}")
         
@@ -782,10 +817,6 @@ class _NetworkController:
                 self.logger.error(f"Failed to remove OSPF process from PE router")
                 return False
 
-            # Reset site routing fields
-            site.ospf_process_id = None
-            site.save()
-
             # Remove OSPF process from CE router
             result = self.restconf.delete(
                 site.router.management_ip_address,
@@ -796,7 +827,13 @@ class _NetworkController:
                 self.logger.error(f"Failed to remove OSPF process from CE router")
                 return False
 
-            # Only set has_routing to False if all removal succeeded
+            if not self.commit_changes():
+                self.logger.error(f"Failed removing OSPF processes for site {site}")
+                return False
+
+            # Only reset the site routing fields if all removal succeeded
+            IPAM.release_link_network(site.customer_id, site.link_network)
+            site.ospf_process_id = None
             site.link_network = None
             site.has_routing = False
             site.save()
@@ -807,6 +844,7 @@ class _NetworkController:
             self.logger.error(f"Error disabling routing for site {site}: {str(exception)}")
             return False
 
+    @config_workflow('disable_route_redistribution')
     def disable_route_redistribution(self, site) -> bool:
         try:
             self.logger.info(f"Disabling route redistribution for site {site}")
@@ -849,6 +887,7 @@ class _NetworkController:
             self.logger.error(f"Error disabling route redistribution for site {site}: {str(exception)}")
             return False
 
+    @config_workflow('enable_route_redistribution')
     def enable_route_redistribution(self, site) -> bool:
         try:
             self.logger.info(f"Enabling route redistribution for site {site}")
@@ -937,7 +976,9 @@ class _NetworkController:
             self.logger.error(f"Error enabling route redistribution for site {site}: {str(exception)}")
             return False
 
+    @config_workflow('add_site_to_vpn')
     def add_site_to_vpn(self, site, vpn) -> bool:
+        created_targets = []
         try:
             if vpn in site.vpns.all():
                 self.logger.info(f"Site {site} is already apart of {vpn}")
@@ -959,26 +1000,22 @@ class _NetworkController:
             # Generate the VPN route target
             vpn_route_target = f"{settings.bgp_as}:{vpn.id}"
             
-            # Configure export route target for the VPN
-            export_rt, created = RouteTarget.objects.update_or_create(
-                vrf=site.vrf,
-                value=vpn_route_target,
-                target_type='export'
-            )
-            export_rt.save()
-            
-            # Configure import route target for the VPN
-            import_rt, created = RouteTarget.objects.update_or_create(
-                vrf=site.vrf,
-                value=vpn_route_target,
-                target_type='import'
-            )
-            import_rt.save()
+            # Configure export and import route targets for the VPN, the VRF payload is built from them
+            for target_type in ('export', 'import'):
+                route_target, created = RouteTarget.objects.get_or_create(
+                    vrf=site.vrf,
+                    value=vpn_route_target,
+                    target_type=target_type
+                )
+                if created:
+                    created_targets.append(route_target.pk)
 
-            # Update VRF configuration on router
-            if not self.create_or_update_vrf(site.vrf):
+            # Update VRF configuration on router, and take the route targets back if it was not applied
+            if not self.create_or_update_vrf(site.vrf) or not self.commit_changes():
+                RouteTarget.objects.filter(pk__in=created_targets).delete()
                 self.logger.error(f"Failed to update VRF configuration for site {site}")
                 return False
+            created_targets = []
 
             # Update database
             vpn.sites.add(site)
@@ -988,10 +1025,13 @@ class _NetworkController:
             return True
             
         except Exception as exception:
+            RouteTarget.objects.filter(pk__in=created_targets).delete()
             self.logger.error(f"Error adding site {site} to VPN {vpn}: {str(exception)}")
             return False
 
+    @config_workflow('remove_site_from_vpn')
     def remove_site_from_vpn(self, site, vpn) -> bool:
+        removed_targets = []
         try:
             self.logger.info(f"Removing site {site} from VPN {vpn}")
             
@@ -1010,15 +1050,19 @@ class _NetworkController:
             vpn_route_target = f"{settings.bgp_as}:{vpn.id}"
             
             # Remove export and import route targets for the VPN
-            RouteTarget.objects.filter(
+            route_targets = RouteTarget.objects.filter(
                 vrf=site.vrf,
                 value=vpn_route_target
-            ).delete()
+            )
+            removed_targets = list(route_targets)
+            route_targets.delete()
             
-            # Update VRF configuration on router
-            if not self.create_or_update_vrf(site.vrf):
+            # Update VRF configuration on router, and put the route targets back if it was not applied
+            if not self.create_or_update_vrf(site.vrf) or not self.commit_changes():
+                RouteTarget.objects.bulk_create(removed_targets, ignore_conflicts=True)
                 self.logger.error(f"Failed to update VRF configuration for site {site}")
                 return False
+            removed_targets = []
             
             # Update database
             vpn.sites.remove(site)
@@ -1028,22 +1072,140 @@ class _NetworkController:
             return True
             
         except Exception as exception:
+            RouteTarget.objects.bulk_create(removed_targets, ignore_conflicts=True)
             self.logger.error(f"Error removing site {site} from VPN {vpn}: {str(exception)}")
             return False
 
+    @config_workflow('update_vpn_vrfs')
+    def update_router_vrfs(self, router, vrfs) -> bool:
+        # Every VRF of the router goes out in the same workflow, so in a single request
+        success = True
+        for vrf in vrfs:
+            success = self.create_or_update_vrf(vrf) and success
+        return success
+
+    def restore_route_targets(self, vpn_route_target, changes, sites):
+        # Puts back the route targets of sites whose router was not updated
+        sites = [site for site in sites if site.vrf]
+        with transaction.atomic():
+            RouteTarget.objects.filter(vrf__in=[site.vrf for site in sites if changes[site]], value=vpn_route_target).delete()
+            RouteTarget.objects.bulk_create([
+                RouteTarget(vrf=site.vrf, value=vpn_route_target, target_type=target_type)
+                for site in sites if not changes[site] for target_type in ('export', 'import')
+            ], ignore_conflicts=True)
+
+    def update_vpn_sites(self, vpn, add_sites=(), remove_sites=()) -> dict:
+        # Returns whether each site was added or removed, keyed by site ID
+        results = {}
+        changes = {}  # Sites to update and whether they are being added
+        applied_sites = set()  # Sites whose router took the change
+        targets_written = False
+        vpn_route_target = None
+        try:
+            self.logger.info(f"Updating VPN {vpn}: adding {len(add_sites)} sites and removing {len(remove_sites)} sites")
+
+            # Get system settings
+            settings = get_settings()
+            if not settings:
+                self.logger.error("Cannot update VPN sites: No system settings found")
+                return {site.id: {'success': False, 'message': 'No system settings found'} for site in [*add_sites, *remove_sites]}
+
+            # Generate the VPN route target
+            vpn_route_target = f"{settings.bgp_as}:{vpn.id}"
+            current_site_ids = set(vpn.sites.values_list('id', flat=True))
+
+            for site in add_sites:
+                if site.id in current_site_ids:
+                    results[site.id] = {'success': True, 'message': f"Site {site.name} is already part of the VPN"}
+                elif not site.assigned_interface or not site.vrf or not site.ospf_process_id:
+                    results[site.id] = {'success': False, 'message': f"Site {site.name} routing must be enabled before adding to VPN"}
+                else:
+                    changes[site] = True
+            for site in remove_sites:
+                if site.id not in current_site_ids:
+                    results[site.id] = {'success': False, 'message': f"Site {site.name} is not part of the VPN"}
+                else:
+                    # Sites without a VRF have nothing configured on their router
+                    changes[site] = False
+
+            added_vrfs = [site.vrf for site, adding in changes.items() if adding]
+            removed_vrfs = [site.vrf for site, adding in changes.items() if not adding and site.vrf]
+
+            # Write every route target change at once
+            with transaction.atomic():
+                RouteTarget.objects.bulk_create([
+                    RouteTarget(vrf=vrf, value=vpn_route_target, target_type=target_type)
+                    for vrf in added_vrfs for target_type in ('export', 'import')
+                ], ignore_conflicts=True)
+                RouteTarget.objects.filter(vrf__in=removed_vrfs, value=vpn_route_target).delete()
+            targets_written = True
+
+            # Group the VRF updates by PE router and push them concurrently across routers
+            routers = {}
+            sites_by_router = defaultdict(list)
+            for site in changes:
+                if site.vrf:
+                    routers[site.vrf.router_id] = site.vrf.router
+                    sites_by_router[site.vrf.router_id].append(site)
+            futures = {
+                router_id: IOExecutor.submit('provisioning', self.update_router_vrfs, routers[router_id], [site.vrf for site in sites])
+                for router_id, sites in sites_by_router.items()
+            }
+
+            failed_sites = []
+            for router_id, future in futures.items():
+                try:
+                    success = future.result()
+                except Exception as exception:
+                    self.logger.error(f"Error updating VRFs on {routers[router_id]}: {str(exception)}")
+                    success = False
+                if success:
+                    applied_sites.update(sites_by_router[router_id])
+                else:
+                    self.logger.error(f"Failed to update VRF configuration on {routers[router_id]}")
+                    failed_sites.extend(sites_by_router[router_id])
+            # Sites without a VRF had nothing to push
+            applied_sites.update(site for site in changes if not site.vrf)
+
+            if failed_sites:
+                self.restore_route_targets(vpn_route_target, changes, failed_sites)
+                targets_written = False
+
+            # Update database
+            added_sites = [site for site, adding in changes.items() if adding and site not in failed_sites]
+            removed_sites = [site for site, adding in changes.items() if not adding and site not in failed_sites]
+            vpn.sites.add(*added_sites)
+            vpn.sites.remove(*removed_sites)
+
+            for site, adding in changes.items():
+                if site in failed_sites:
+                    results[site.id] = {'success': False, 'message': f"Failed to update VRF configuration for site {site.name}"}
+                else:
+                    results[site.id] = {'success': True, 'message': f"Site {site.name} {'added to' if adding else 'removed from'} the VPN"}
+
+            self.logger.info(f"Updated VPN {vpn}: added {len(added_sites)} sites, removed {len(removed_sites)} sites, {len(failed_sites)} failed")
+            return results
+
+        except Exception as exception:
+            self.logger.error(f"Error updating sites of VPN {vpn}: {str(exception)}")
+            if targets_written:
+                try:
+                    self.restore_route_targets(vpn_route_target, changes, [site for site in changes if site not in applied_sites])
+                except Exception as restore_exception:
+                    self.logger.error(f"Failed to restore route targets of VPN {vpn}: {str(restore_exception)}")
+            for site in [*add_sites, *remove_sites]:
+                results.setdefault(site.id, {'success': False, 'message': str(exception)})
+            return results
+
     def delete_vpn(self, vpn) -> bool:
         try:
             self.logger.info(f"Deleting VPN {vpn}")
             
-            # Get sites in the VPN
-            sites = list(vpn.sites.all())
-            
-            # Remove all sites from the VPN
-            for site in sites:
-                result = self.remove_site_from_vpn(site, vpn)
-                if not result:
-                    self.logger.error(f"Failed to remove site {site} from VPN {vpn}")
-                    return False
+            # Remove all sites from the VPN, routers are updated concurrently
+            results = self.update_vpn_sites(vpn, remove_sites=list(vpn.sites.all()))
+            if not all(result['success'] for result in results.values()):
+                self.logger.error(f"Failed to remove every site from VPN {vpn}")
+                return False
             
             # Delete the VPN from the database
             vpn.delete()
@@ -1055,6 +1217,7 @@ class _NetworkController:
             self.logger.error(f"Error deleting VPN {vpn}: {str(exception)}")
             return False
 
+    @config_workflow('delete_site')
     def delete_site(self, site) -> bool:
         try:
             self.logger.info(f"Deleting site {site}")
@@ -1076,6 +1239,8 @@ class _NetworkController:
                     ce_interface = site.assigned_interface.connected_interfaces.first()
                     ce_interface.addressing = 'dhcp'
                     self.create_or_update_interface(ce_interface)
+                    # Push it while the CE is still reachable through the PE subinterface
+                    self.commit_changes()
                 except:
                     pass
 
@@ -1087,16 +1252,20 @@ class _NetworkController:
 
             # Delete the site's VRF and its route targets if it exists
             if site.vrf:
-                RouteTarget.objects.filter(vrf=site.vrf).delete()
                 if not self.delete_vrf(site.vrf):
                     self.logger.error(f"Failed to delete site VRF")
                     return False
 
+            # The site only leaves the database once its routers dropped its configuration
+            if not self.commit_changes():
+                self.logger.error(f"Failed removing configuration of site {site}")
+                return False
+
             if site.router:
                 # Delete the CE router
                 site.router.delete()
 
-            # Delete the DHCP scope if it exists
+            # Delete the DHCP scope if it exists, its network and the site link network are released on delete
             if site.dhcp_scope:
                 site.dhcp_scope.delete()
 
@@ -1114,49 +1283,34 @@ class _NetworkController:
         try:
             self.logger.info(f"Creating new site {name}")
 
-            # Get settings
-            settings = get_settings()
-            if not settings:
-                raise Exception("No system settings found")
-
-            # Parse the DHCP sites network from settings
-            dhcp_sites_network = ipaddress.IPv4Network(
-                f"{settings.dhcp_sites_network_address}/{settings.dhcp_sites_network_subnet_mask}", 
-                strict=False
-            )
-
-            # Get all existing site DHCP scopes
-            existing_scopes = DHCPScope.objects.all()
-            used_scopes = {
-                ipaddress.IPv4Network(f"{scope.network}/30", strict=False) 
-                for scope in existing_scopes
-            }
-
-            # Find first available /30 subnet
-            dhcp_scope_network = None
-            for network in dhcp_sites_network.subnets(new_prefix=30):
-                if not any(network.overlaps(used_scope) for used_scope in used_scopes):
-                    dhcp_scope_network = str(network[0])
-                    break
-
+            # Allocate the first available /30 of the DHCP sites network
+            dhcp_scope_network = IPAM.allocate_site_scope()
             if not dhcp_scope_network:
                 raise Exception('No available DHCP scope found')
 
             # Create DHCP Scope
-            dhcp_scope = DHCPScope.objects.create(
-                is_active=False,
-                network=dhcp_scope_network,
-                subnet_mask='255.255.255.252'
-            )
+            try:
+                dhcp_scope = DHCPScope.objects.create(
+                    is_active=False,
+                    network=str(dhcp_scope_network.network_address),
+                    subnet_mask=str(dhcp_scope_network.netmask)
+                )
+            except Exception:
+                IPAM.release_site_scope(dhcp_scope_network.network_address)
+                raise
 
-            # Create site
-            site = Site.objects.create(
-                name=name,
-                customer=customer,
-                description=description,
-                location=location,
-                dhcp_scope=dhcp_scope,
-            )
+            # Create site, its scope goes away with it if no site ID could be taken
+            try:
+                site = Site.objects.create(
+                    name=name,
+                    customer=customer,
+                    description=description,
+                    location=location,
+                    dhcp_scope=dhcp_scope,
+                )
+            except Exception:
+                dhcp_scope.delete()
+                raise
 
             # Assign interface
             if not self.assign_interface(interface, site):
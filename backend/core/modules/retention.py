@@ -0,0 +1,103 @@
+import time
+import logging
+import threading
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Min, Max
+from django.utils import timezone
+from core.models import RouterMetric, InterfaceMetric, RouterMetricRollup, InterfaceMetricRollup, Notification
+from core.settings import get_settings
+
+# Table name, model, time field, retention setting, default days and extra filters
+RETENTION_TABLES = [
+    ('router_metrics', RouterMetric, 'timestamp', 'raw_metrics_retention_days', 30, {}),
+    ('interface_metrics', InterfaceMetric, 'timestamp', 'raw_metrics_retention_days', 30, {}),
+    ('router_metric_rollups_1m', RouterMetricRollup, 'bucket', 'rollup_1m_retention_days', 30, {'resolution': 60}),
+    ('interface_metric_rollups_1m', InterfaceMetricRollup, 'bucket', 'rollup_1m_retention_days', 30, {'resolution': 60}),
+    ('router_metric_rollups_5m', RouterMetricRollup, 'bucket', 'rollup_5m_retention_days', 90, {'resolution': 300}),
+    ('interface_metric_rollups_5m', InterfaceMetricRollup, 'bucket', 'rollup_5m_retention_days', 90, {'resolution': 300}),
+    ('router_metric_rollups_1h', RouterMetricRollup, 'bucket', 'rollup_1h_retention_days', 365, {'resolution': 3600}),
+    ('interface_metric_rollups_1h', InterfaceMetricRollup, 'bucket', 'rollup_1h_retention_days', 365, {'resolution': 3600}),
+    ('notifications', Notification, 'created_at', 'notification_retention_days', 30, {'acknowledged': True}),
+]
+
+class _RetentionManager:
+    def __init__(self):
+        self.logger = logging.getLogger('retention')
+        self.lock = threading.Lock()
+        self.chunk_size = 5000  # Rows per delete, bounds how long the write lock is held
+        self.chunk_pause = 0.2  # Seconds between chunks so other writers can get the lock
+        self.last_run = None
+
+    def get_retention_days(self):
+        settings = get_settings()
+        return {
+            name: getattr(settings, setting, default) if settings else default
+            for name, _, _, setting, default, _ in RETENTION_TABLES
+        }
+
+    def run(self, retention_days=None):
+        # Overrides map table names to days, other tables use their settings
+        if not self.lock.acquire(blocking=False):
+            self.logger.warning("Retention run already in progress, skipping")
+            return None
+
+        try:
+            days = self.get_retention_days()
+            days.update(retention_days or {})
+
+            start = time.perf_counter()
+            now = timezone.now()
+            report = {"tables": {}, "purged": 0, "lock_time": 0.0}
+
+            for name, model, time_field, _, _, filters in RETENTION_TABLES:
+                try:
+                    result = self.purge_table(model, time_field, now - timedelta(days=days[name]), filters)
+                except Exception as exception:
+                    self.logger.error(f"Error purging {name}: {str(exception)}")
+                    continue
+
+                report["tables"][name] = result
+                report["purged"] += result["purged"]
+                report["lock_time"] += result["lock_time"]
+                if result["purged"]:
+                    self.logger.info(f"Purged {result['purged']} rows from {name} in {result['chunks']} chunks ({result['lock_time'] * 1000:.1f} ms locked)")
+
+            report["duration"] = time.perf_counter() - start
+            report["finished_at"] = timezone.now().isoformat()
+            self.last_run = report
+
+            self.logger.info(f"Retention run purged {report['purged']} rows in {report['duration']:.1f}s ({report['lock_time'] * 1000:.1f} ms locked)")
+            return report
+        finally:
+            self.lock.release()
+
+    def purge_table(self, model, time_field, cutoff, filters=None):
+        expired = model.objects.filter(**{f"{time_field}__lt": cutoff}, **(filters or {}))
+        result = {"purged": 0, "chunks": 0, "lock_time": 0.0}
+
+        # Find the primary key range of expired rows once, then walk it in bounded chunks
+        bounds = expired.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return result
+
+        low = bounds['low']
+        while low <= bounds['high']:
+            start = time.perf_counter()
+            with transaction.atomic():
+                deleted, _ = expired.filter(pk__gte=low, pk__lt=low + self.chunk_size).delete()
+            result["lock_time"] += time.perf_counter() - start
+            result["purged"] += deleted
+            result["chunks"] += 1
+
+            # Empty chunks held no lock worth yielding, only pause after one that deleted rows
+            low += self.chunk_size
+            if deleted and low <= bounds['high']:
+                time.sleep(self.chunk_pause)
+
+        return result
+
+    def get_stats(self):
+        return self.last_run
+
+RetentionManager = _RetentionManager()
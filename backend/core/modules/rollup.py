@@ -0,0 +1,201 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from django.utils import timezone
+from core.models import RouterMetric, InterfaceMetric, RouterMetricRollup, InterfaceMetricRollup
+
+# Bucket widths in seconds, 0 means raw samples
+RESOLUTIONS = {'raw': 0, '1m': 60, '5m': 300, '1h': 3600}
+ROLLUP_RESOLUTIONS = [60, 300, 3600]
+
+ROUTER_FIELDS = [
+    'cpu_usage_5s', 'cpu_usage_1m', 'cpu_usage_5m',
+    'mem_used_percent', 'mem_total', 'mem_used', 'mem_free',
+    'storage_used_percent', 'storage_total', 'storage_used', 'storage_free'
+]
+INTERFACE_FIELDS = [
+    'in_octets', 'out_octets', 'in_errors', 'out_errors',
+    'in_discards', 'out_discards', 'bps_in', 'bps_out'
+]
+
+def bucket_start(timestamp, resolution):
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % resolution, tz=timestamp.tzinfo or timezone.utc)
+
+class MetricRollup:
+    def __init__(self, max_points=500):
+        self.logger = logging.getLogger('network-monitor')
+        self.lock = threading.Lock()
+        self.max_points = max_points  # Default point budget of a metrics series
+        self.sources = {
+            RouterMetricRollup: ('router_id', ROUTER_FIELDS),
+            InterfaceMetricRollup: ('interface_id', INTERFACE_FIELDS)
+        }
+        self.raw_models = {
+            RouterMetricRollup: RouterMetric,
+            InterfaceMetricRollup: InterfaceMetric
+        }
+        # Buckets still receiving samples, keyed by (model, resolution, owner id)
+        self.open_buckets = {}
+        self.backfill_thread = None
+        self.stats = {
+            "buckets_written": 0,
+            "buckets_backfilled": 0,
+            "open_buckets": 0
+        }
+
+    def add(self, router_metrics, interface_metrics, now=None):
+        # Fold new samples into the open buckets and persist the ones that closed
+        now = now or timezone.now()
+        closed = {RouterMetricRollup: [], InterfaceMetricRollup: []}
+
+        with self.lock:
+            for metric in router_metrics:
+                self._add_sample(RouterMetricRollup, metric.router_id, metric, closed, self.open_buckets)
+            for metric in interface_metrics:
+                self._add_sample(InterfaceMetricRollup, metric.interface_id, metric, closed, self.open_buckets)
+
+            for key, rollup in list(self.open_buckets.items()):
+                if rollup.bucket + timedelta(seconds=rollup.resolution) <= now:
+                    closed[key[0]].append(self.open_buckets.pop(key))
+            self.stats["open_buckets"] = len(self.open_buckets)
+
+        written = 0
+        for model, rollups in closed.items():
+            if not rollups:
+                continue
+            owner_field = self.sources[model][0].replace('_id', '')
+            update_fields = ['count', 'values', 'last_timestamp']
+            if model is InterfaceMetricRollup:
+                update_fields.append('operational_status')
+            model.objects.bulk_create(
+                rollups,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=[owner_field, 'resolution', 'bucket'],
+                update_fields=update_fields
+            )
+            written += len(rollups)
+
+        if written:
+            with self.lock:
+                self.stats["buckets_written"] += written
+            self.logger.info(f"Wrote {written} metric rollup buckets")
+        return written
+
+    def _add_sample(self, model, owner_id, metric, closed, open_buckets, cutoffs=None):
+        owner_key, fields = self.sources[model]
+        for resolution in ROLLUP_RESOLUTIONS:
+            if cutoffs is not None and metric.timestamp >= cutoffs[resolution]:
+                continue
+            bucket = bucket_start(metric.timestamp, resolution)
+            key = (model, resolution, owner_id)
+            rollup = open_buckets.get(key)
+
+            if rollup is not None and rollup.bucket != bucket:
+                if bucket < rollup.bucket:
+                    continue  # Late sample for a bucket that was already closed
+                closed[model].append(rollup)
+                rollup = None
+
+            if rollup is None:
+                rollup = model(resolution=resolution, bucket=bucket, count=0, values={}, last_timestamp=metric.timestamp)
+                setattr(rollup, owner_key, owner_id)
+                open_buckets[key] = rollup
+
+            rollup.count += 1
+            rollup.last_timestamp = metric.timestamp
+            if model is InterfaceMetricRollup:
+                rollup.operational_status = metric.operational_status
+            for field in fields:
+                value = getattr(metric, field)
+                if value is None:
+                    continue
+                current = rollup.values.get(field)
+                if current is None:
+                    rollup.values[field] = [value, value, value, value]
+                else:
+                    rollup.values[field] = [min(current[0], value), max(current[1], value), current[2] + value, value]
+
+    def start_backfill(self):
+        # Runs the backfill once per process, in the background as it reads every raw sample it covers
+        with self.lock:
+            if self.backfill_thread is not None:
+                return
+            self.backfill_thread = threading.Thread(target=self._backfill_all, name='metric-rollup-backfill', daemon=True)
+        self.backfill_thread.start()
+
+    def _backfill_all(self):
+        for model in self.sources:
+            try:
+                self.backfill(model)
+            except Exception as e:
+                self.logger.error(f"Error backfilling {model.__name__} rows: {str(e)}")
+
+    def backfill(self, model, chunk_size=2000):
+        # Builds rollups from the raw samples recorded before rollups of each resolution were first written,
+        # buckets that already exist are left untouched so running it again does nothing
+        owner_key = self.sources[model][0]
+        cutoffs = {}
+        for resolution in ROLLUP_RESOLUTIONS:
+            first_bucket = model.objects.filter(resolution=resolution).order_by('bucket').values_list('bucket', flat=True).first()
+            cutoffs[resolution] = first_bucket or bucket_start(timezone.now(), resolution)
+
+        open_buckets = {}
+        closed = {model: []}
+        written = 0
+        samples = self.raw_models[model].objects.filter(timestamp__lt=max(cutoffs.values())).order_by(owner_key, 'timestamp')
+        for metric in samples.iterator(chunk_size=chunk_size):
+            self._add_sample(model, getattr(metric, owner_key), metric, closed, open_buckets, cutoffs)
+            if len(closed[model]) >= chunk_size:
+                written += self._write_backfill(model, closed[model])
+                closed[model] = []
+        written += self._write_backfill(model, closed[model] + list(open_buckets.values()))
+
+        if written:
+            with self.lock:
+                self.stats["buckets_backfilled"] += written
+            self.logger.info(f"Backfilled {written} {model.__name__} buckets from raw samples")
+        return written
+
+    def _write_backfill(self, model, rollups):
+        if rollups:
+            model.objects.bulk_create(rollups, batch_size=500, ignore_conflicts=True)
+        return len(rollups)
+
+    def get_open_bucket(self, model, resolution, owner_id):
+        with self.lock:
+            return self.open_buckets.get((model, resolution, owner_id))
+
+    def select_resolution(self, window_seconds, count_raw, requested='auto', max_points=None):
+        # Explicit resolutions win, otherwise pick the finest one that fits the point budget
+        if requested in RESOLUTIONS:
+            return RESOLUTIONS[requested]
+        if requested != 'auto':
+            raise ValueError(f"Unknown resolution '{requested}', expected one of auto, {', '.join(RESOLUTIONS)}")
+
+        max_points = max_points or self.max_points
+        if count_raw() <= max_points:
+            return 0
+        for resolution in ROLLUP_RESOLUTIONS:
+            if window_seconds / resolution <= max_points:
+                return resolution
+        return ROLLUP_RESOLUTIONS[-1]
+
+    def get_series(self, model, owner_id, since, resolution):
+        owner_key = self.sources[model][0]
+        rollups = list(model.objects.filter(
+            resolution=resolution,
+            bucket__gte=bucket_start(since, resolution),
+            **{owner_key: owner_id}
+        ).order_by('bucket'))
+
+        # Include the bucket that is still being filled
+        open_bucket = self.get_open_bucket(model, resolution, owner_id)
+        if open_bucket is not None and (not rollups or rollups[-1].bucket < open_bucket.bucket):
+            rollups.append(open_bucket)
+        return rollups
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
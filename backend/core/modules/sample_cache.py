@@ -0,0 +1,86 @@
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from django.db.models import Max
+from core.models import InterfaceMetric
+
+InterfaceSample = namedtuple('InterfaceSample', [
+    'timestamp', 'in_octets', 'out_octets', 'in_errors', 'out_errors', 'in_discards', 'out_discards'
+])
+
+class InterfaceSampleCache:
+    def __init__(self, max_size=50000):
+        self.logger = logging.getLogger('network-monitor')
+        self.max_size = max_size  # Oldest interfaces are evicted past this size
+        self.samples = OrderedDict()
+        self.lock = threading.Lock()
+        self.warmed = False
+
+    def warm(self):
+        # Load the latest stored sample of every interface in two queries
+        latest_ids = InterfaceMetric.objects.order_by().values('interface').annotate(latest_id=Max('id')).values_list('latest_id', flat=True)
+        latest_metrics = InterfaceMetric.objects.filter(id__in=latest_ids).order_by('timestamp')
+
+        with self.lock:
+            for metric in latest_metrics:
+                self._store(metric.interface_id, self.sample_from_metric(metric))
+            self.warmed = True
+
+        self.logger.info(f"Warmed interface sample cache with {len(self.samples)} interfaces")
+
+    def update(self, interface_id, sample):
+        # Store the new sample and return its deltas against the previous one
+        with self.lock:
+            previous = self.samples.get(interface_id)
+            self._store(interface_id, sample)
+
+        if previous is None:
+            return None
+
+        elapsed = (sample.timestamp - previous.timestamp).total_seconds()
+
+        return {
+            'elapsed': elapsed,
+            'previous': previous,
+            'in_errors': self._counter_delta(previous.in_errors, sample.in_errors),
+            'out_errors': self._counter_delta(previous.out_errors, sample.out_errors),
+            'in_discards': self._counter_delta(previous.in_discards, sample.in_discards),
+            'out_discards': self._counter_delta(previous.out_discards, sample.out_discards),
+            'in_bps': self._counter_rate(previous.in_octets, sample.in_octets, elapsed, 8),
+            'out_bps': self._counter_rate(previous.out_octets, sample.out_octets, elapsed, 8)
+        }
+
+    def get(self, interface_id):
+        with self.lock:
+            return self.samples.get(interface_id)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.warmed = False
+
+    def sample_from_metric(self, metric):
+        return InterfaceSample(
+            timestamp=metric.timestamp,
+            in_octets=metric.in_octets,
+            out_octets=metric.out_octets,
+            in_errors=metric.in_errors,
+            out_errors=metric.out_errors,
+            in_discards=metric.in_discards,
+            out_discards=metric.out_discards
+        )
+
+    def _store(self, interface_id, sample):
+        self.samples[interface_id] = sample
+        self.samples.move_to_end(interface_id)
+        while len(self.samples) > self.max_size:
+            self.samples.popitem(last=False)
+
+    def _counter_delta(self, previous, current):
+        # A lower value means the counter was cleared or wrapped
+        return current - previous if current >= previous else 0
+
+    def _counter_rate(self, previous, current, elapsed, scale=1):
+        if elapsed <= 0 or current < previous:
+            return None
+        return (current - previous) * scale / elapsed
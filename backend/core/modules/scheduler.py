@@ -3,6 +3,7 @@ import threading
 from typing import Dict
 from core.modules.discovery import NetworkDiscoverer
 from core.modules.monitor import NetworkMonitor
+from core.modules.retention import RetentionManager
 from core.settings import get_settings
 
 class _Scheduler:
@@ -14,11 +15,13 @@ class _Scheduler:
         # Timers for periodic tasks
         self.network_discovery_timer = None
         self.network_monitor_timer = None
+        self.retention_timer = None
 
         # Get intervals from settings at init (will be refreshed before each schedule)
         settings = get_settings()
         self.network_discovery_interval = getattr(settings, 'discovery_interval', 300) if settings else 300
         self.network_monitor_interval = getattr(settings, 'monitoring_interval', 60) if settings else 60
+        self.retention_interval = getattr(settings, 'retention_interval', 3600) if settings else 3600
 
     def schedule_discovery(self, ip_address: str, is_first_time: bool = True):
         with self.lock:
@@ -63,6 +66,7 @@ class _Scheduler:
             settings = get_settings()
             self.network_discovery_interval = getattr(settings, 'discovery_interval', 300) if settings else 300
             self.network_monitor_interval = getattr(settings, 'monitoring_interval', 60) if settings else 60
+            self.retention_interval = getattr(settings, 'retention_interval', 3600) if settings else 3600
 
             # Start network discovery
             if self.network_discovery_timer:
@@ -74,7 +78,15 @@ class _Scheduler:
                 self.network_monitor_timer.cancel()
             self._schedule_next_monitoring()
             
-            self.logger.info(f"Started periodic tasks (Discovery: {self.network_discovery_interval}s, Monitoring: {self.network_monitor_interval}s)")
+            # Start retention enforcement
+            if self.retention_timer:
+                self.retention_timer.cancel()
+            self._schedule_next_retention()
+
+            # Rollups only start with the monitor, older raw samples are folded in once
+            NetworkMonitor.metric_rollup.start_backfill()
+            
+            self.logger.info(f"Started periodic tasks (Discovery: {self.network_discovery_interval}s, Monitoring: {self.network_monitor_interval}s, Retention: {self.retention_interval}s)")
 
     def stop_periodic_tasks(self):
         with self.lock:
@@ -86,6 +98,10 @@ class _Scheduler:
                 self.network_monitor_timer.cancel()
                 self.network_monitor_timer = None
                 
+            if self.retention_timer:
+                self.retention_timer.cancel()
+                self.retention_timer = None
+                
             self.logger.info("Stopped all periodic tasks")
 
     def _schedule_next_discovery(self):
@@ -110,6 +126,17 @@ class _Scheduler:
         self.network_monitor_timer.daemon = True
         self.network_monitor_timer.start()
 
+    def _schedule_next_retention(self):
+        # Refresh interval from settings before each schedule
+        settings = get_settings()
+        self.retention_interval = getattr(settings, 'retention_interval', 3600) if settings else 3600
+        self.retention_timer = threading.Timer(
+            self.retention_interval, 
+            self._execute_retention
+        )
+        self.retention_timer.daemon = True
+        self.retention_timer.start()
+
     def _execute_network_discovery(self):
         try:
             self.logger.info("Starting network-wide discovery")
@@ -128,5 +155,14 @@ class _Scheduler:
         finally:
             self._schedule_next_monitoring()
 
+    def _execute_retention(self):
+        try:
+            self.logger.info("Starting retention run")
+            RetentionManager.run()
+        except Exception as e:
+            self.logger.error(f"Error during retention run: {str(e)}")
+        finally:
+            self._schedule_next_retention()
+
 Scheduler = _Scheduler()
 Scheduler.start_periodic_tasks()
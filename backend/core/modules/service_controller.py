@@ -1,9 +1,9 @@
 import logging
-import ipaddress
 from typing import List, Optional, Tuple
 from backend.core.modules.network_controller import NetworkController
 from core.models import Site, VPN, Customer, Interface, Router, VRF, RouteTarget, DHCPScope
 from core.settings import get_settings
+from core.modules.ipam import IPAM
 
 class _ServiceController:
     def __init__(self):
@@ -26,44 +26,34 @@ class _ServiceController:
         try:
             self.logger.info(f"Creating new site {name}")
 
-            # Parse the DHCP sites network from settings
-            dhcp_sites_network = ipaddress.IPv4Network(
-                f"{self.settings.dhcp_sites_network_address}/{self.settings.dhcp_sites_network_subnet_mask}", 
-                strict=False
-            )
-
-            # Get all existing site DHCP scopes
-            existing_scopes = DHCPScope.objects.all()
-            used_scopes = {
-                ipaddress.IPv4Network(f"{scope.network}/30", strict=False) 
-                for scope in existing_scopes
-            }
-
-            # Find first available /30 subnet
-            dhcp_scope_network = None
-            for network in dhcp_sites_network.subnets(new_prefix=30):
-                if not any(network.overlaps(used_scope) for used_scope in used_scopes):
-                    dhcp_scope_network = str(network[0])
-                    break
-
+            # Allocate the first available /30 of the DHCP sites network
+            dhcp_scope_network = IPAM.allocate_site_scope()
             if not dhcp_scope_network:
                 raise Exception('No available DHCP scope found')
 
             # Create DHCP Scope
-            dhcp_scope = DHCPScope.objects.create(
-                is_active=False,
-                network=dhcp_scope_network,
-                subnet_mask='255.255.255.252'
-            )
-
-            # Create site
-            site = Site.objects.create(
-                name=name,
-                customer=customer,
-                description=description,
-                location=location,
-                dhcp_scope=dhcp_scope,
-            )
+            try:
+                dhcp_scope = DHCPScope.objects.create(
+                    is_active=False,
+                    network=str(dhcp_scope_network.network_address),
+                    subnet_mask=str(dhcp_scope_network.netmask)
+                )
+            except Exception:
+                IPAM.release_site_scope(dhcp_scope_network.network_address)
+                raise
+
+            # Create site, its scope goes away with it if no site ID could be taken
+            try:
+                site = Site.objects.create(
+                    name=name,
+                    customer=customer,
+                    description=description,
+                    location=location,
+                    dhcp_scope=dhcp_scope,
+                )
+            except Exception:
+                dhcp_scope.delete()
+                raise
 
             # Assign interface using NetworkController
             if not NetworkController.assign_interface(interface, site):
@@ -121,7 +111,7 @@ class _ServiceController:
                 # Delete the CE router
                 site.router.delete()
 
-            # Delete the DHCP scope if it exists
+            # Delete the DHCP scope if it exists, its network and the site link network are released on delete
             if site.dhcp_scope:
                 site.dhcp_scope.delete()
 
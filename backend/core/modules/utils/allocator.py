@@ -0,0 +1,104 @@
+import bisect
+import threading
+
+class IntervalAllocator:
+    # Hands out the lowest free integer of [start, end), free space is kept as sorted disjoint intervals
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.lock = threading.Lock()
+        self.starts = [start] if start < end else []  # Start of every free interval
+        self.ends = [end] if start < end else []  # Matching exclusive end of every free interval
+        self.free = end - start
+
+    def load(self, used):
+        # Rebuilds the free intervals around the given used values, which must be sorted
+        with self.lock:
+            self.starts, self.ends = [], []
+            cursor = self.start
+            for value in used:
+                if value < cursor or value >= self.end:
+                    continue
+                if value > cursor:
+                    self.starts.append(cursor)
+                    self.ends.append(value)
+                cursor = value + 1
+            if cursor < self.end:
+                self.starts.append(cursor)
+                self.ends.append(self.end)
+            self.free = sum(end - start for start, end in zip(self.starts, self.ends))
+
+    def _find(self, value):
+        # Index of the free interval holding the value, or None
+        index = bisect.bisect_right(self.starts, value) - 1
+        if index >= 0 and value < self.ends[index]:
+            return index
+        return None
+
+    def allocate(self):
+        with self.lock:
+            if not self.starts:
+                return None
+            value = self.starts[0]
+            if value + 1 == self.ends[0]:
+                del self.starts[0]
+                del self.ends[0]
+            else:
+                self.starts[0] = value + 1
+            self.free -= 1
+            return value
+
+    def reserve(self, value):
+        # Marks a value as used, returns whether it was free
+        with self.lock:
+            index = self._find(value)
+            if index is None:
+                return False
+            start, end = self.starts[index], self.ends[index]
+            if start == value and end == value + 1:
+                del self.starts[index]
+                del self.ends[index]
+            elif start == value:
+                self.starts[index] = value + 1
+            elif end == value + 1:
+                self.ends[index] = value
+            else:
+                self.ends[index] = value
+                self.starts.insert(index + 1, value + 1)
+                self.ends.insert(index + 1, end)
+            self.free -= 1
+            return True
+
+    def release(self, value):
+        # Gives a value back, returns whether it was in use
+        with self.lock:
+            if not self.start <= value < self.end or self._find(value) is not None:
+                return False
+            index = bisect.bisect_right(self.starts, value)
+            merges_left = index > 0 and self.ends[index - 1] == value
+            merges_right = index < len(self.starts) and self.starts[index] == value + 1
+            if merges_left and merges_right:
+                self.ends[index - 1] = self.ends[index]
+                del self.starts[index]
+                del self.ends[index]
+            elif merges_left:
+                self.ends[index - 1] = value + 1
+            elif merges_right:
+                self.starts[index] = value
+            else:
+                self.starts.insert(index, value)
+                self.ends.insert(index, value + 1)
+            self.free += 1
+            return True
+
+    def is_free(self, value):
+        with self.lock:
+            return self._find(value) is not None
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "size": self.end - self.start,
+                "free": self.free,
+                "fragments": len(self.starts)
+            }
@@ -0,0 +1,186 @@
+import logging
+import threading
+from functools import wraps
+from core.modules.utils.executor import IOExecutor
+
+# Nodes that modules other than their parent's augment into the native tree
+AUGMENTING_MODULES = {
+    'router-ospf': 'Cisco-IOS-XE-ospf',
+    'bgp': 'Cisco-IOS-XE-bgp'
+}
+
+def compile_target(path):
+    # Turns a RESTCONF data path into a YANG-Patch target and the qualified name of its last node
+    segments = [segment for segment in path.strip('/').split('/') if segment]
+    module = None
+    target = []
+    for segment in segments:
+        name, separator, keys = segment.partition('=')
+        if ':' in name:
+            node_module, name = name.split(':', 1)
+        else:
+            node_module = AUGMENTING_MODULES.get(name, module)
+        # Only nodes that change module carry a prefix
+        prefix = f"{node_module}:" if node_module != module else ""
+        target.append(f"{prefix}{name}{separator}{keys}")
+        module = node_module
+    return '/' + '/'.join(target), name, f"{module}:{name}"
+
+class ConfigTransaction:
+    def __init__(self, name, restconf):
+        self.name = name
+        self.restconf = restconf  # Only writes made through this wrapper are staged
+        self.edits = {}  # Staged YANG-Patch edits of every device, in the order they were made
+        self.devices = set()  # Every device the transaction staged changes for
+        self.failed_devices = set()  # Devices whose changes were rejected or discarded
+        self.callbacks = []  # Database writes waiting for the staged changes of their device to be applied
+        self.changes = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def stage(self, ip_address, operation, path, data=None):
+        target, name, qualified_name = compile_target(path)
+        edit = {"operation": operation, "target": target}
+
+        if operation != 'remove':
+            # Payloads either hold the target node itself or, for POST, its children
+            if isinstance(data, dict) and len(data) == 1 and next(iter(data)).split(':')[-1] == name:
+                value = next(iter(data.values()))
+            else:
+                value = data
+            # A keyed list entry is still encoded as a list
+            if '=' in target.rsplit('/', 1)[-1] and isinstance(value, dict):
+                value = [value]
+            edit["value"] = {qualified_name: value}
+
+        with self.lock:
+            device_edits = self.edits.setdefault(ip_address, [])
+            edit["edit-id"] = str(len(device_edits) + 1)
+            device_edits.append(edit)
+            self.devices.add(ip_address)
+            self.changes += 1
+
+        # Mirror what the wrapper returns for a successful write
+        return True if operation == 'remove' else {}
+
+    def on_commit(self, ip_address, function):
+        with self.lock:
+            self.callbacks.append((ip_address, function))
+
+    def commit(self):
+        # Sends everything staged so far, one YANG-Patch per device and devices in parallel
+        with self.lock:
+            edits, self.edits = self.edits, {}
+            callbacks, self.callbacks = self.callbacks, []
+        if not edits:
+            self._run_callbacks(callbacks, set())
+            return True
+
+        futures = {
+            ip_address: IOExecutor.submit('provisioning', self.restconf.yang_patch, ip_address, device_edits, f"{self.name}-{self.requests + index + 1}")
+            for index, (ip_address, device_edits) in enumerate(edits.items())
+        }
+
+        success = True
+        failed = set()
+        for ip_address, future in futures.items():
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+            with self.lock:
+                self.requests += 1
+                if result is None:
+                    self.failed_devices.add(ip_address)
+                    failed.add(ip_address)
+            success = success and result is not None
+
+        # The database only follows the devices that applied their changes
+        self._run_callbacks(callbacks, failed)
+        return success
+
+    def _run_callbacks(self, callbacks, failed):
+        for ip_address, function in callbacks:
+            if ip_address not in failed:
+                function()
+
+    def discard(self):
+        with self.lock:
+            self.failed_devices.update(self.edits)
+            self.edits = {}
+            self.callbacks = []
+
+class _ConfigCompiler:
+    def __init__(self):
+        self.logger = logging.getLogger('network-controller')
+        self.local = threading.local()  # Transaction of the workflow running on each thread
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def current(self, restconf=None):
+        transaction = getattr(self.local, 'transaction', None)
+        if transaction is None or (restconf is not None and transaction.restconf is not restconf):
+            return None
+        return transaction
+
+    def begin(self, name, restconf):
+        # Nested workflows join the transaction that is already running on this thread
+        transaction = self.current()
+        if transaction is not None:
+            return transaction, False
+        transaction = ConfigTransaction(name, restconf)
+        self.local.transaction = transaction
+        return transaction, True
+
+    def commit(self):
+        # Pushes the changes staged so far by the workflow running on this thread
+        transaction = self.current()
+        return transaction.commit() if transaction else True
+
+    def on_commit(self, ip_address, function):
+        # Runs a database write once the device applied what the running workflow staged for it, right away outside workflows
+        transaction = self.current()
+        if transaction is None:
+            function()
+        else:
+            transaction.on_commit(ip_address, function)
+
+    def end(self, transaction):
+        self.local.transaction = None
+        transaction.discard()
+
+        with self.lock:
+            stats = self.stats.setdefault(transaction.name, {"runs": 0, "changes": 0, "requests": 0, "failed": 0})
+            stats["runs"] += 1
+            stats["changes"] += transaction.changes
+            stats["requests"] += transaction.requests
+            stats["failed"] += bool(transaction.failed_devices)
+            stats["last"] = {"changes": transaction.changes, "requests": transaction.requests}
+
+        self.logger.info(f"Workflow {transaction.name} pushed {transaction.changes} changes in {transaction.requests} requests")
+
+    def get_stats(self):
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.stats.items()}
+
+ConfigCompiler = _ConfigCompiler()
+
+def config_workflow(name, phase=True):
+    # Stages every write a controller method makes and pushes them once it succeeds.
+    # Nested workflows commit when they return, acting as phases of the outer one,
+    # while nested non-phase methods leave their changes to whoever called them.
+    def decorator(method):
+        @wraps(method)
+        def wrapper(controller, *args, **kwargs):
+            transaction, owner = ConfigCompiler.begin(name, controller.restconf)
+            try:
+                result = method(controller, *args, **kwargs)
+                if result and (owner or phase) and not transaction.commit():
+                    return False
+                return result
+            finally:
+                if owner:
+                    ConfigCompiler.end(transaction)
+                    controller.finish_workflow(transaction)
+        return wrapper
+    return decorator
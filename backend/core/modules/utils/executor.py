@@ -0,0 +1,132 @@
+import time
+import logging
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+# Maximum concurrent tasks of every lane
+LANE_LIMITS = {
+    'discovery': 8,
+    'monitoring': 50,
+    'provisioning': 4
+}
+
+class IOLane(Executor):
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.pool = None
+        self.queued = 0
+        self.active = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "inline": 0,
+            "wait_time": 0.0,
+            "run_time": 0.0,
+            "max_wait_time": 0.0
+        }
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self.lock:
+            self.stats["submitted"] += 1
+            # A worker of this lane only queues more work while a worker is free to take it,
+            # otherwise it runs the task itself so nested fan-out can never deadlock the lane
+            inline = _worker.lane is self and self.queued + self.active >= self.max_workers
+            if inline:
+                self.stats["inline"] += 1
+            else:
+                self.queued += 1
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f'io-{self.name}')
+                pool = self.pool
+
+        if inline:
+            future = Future()
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(self._run(fn, args, kwargs, None))
+            except BaseException as exception:
+                future.set_exception(exception)
+            return future
+
+        return pool.submit(self._run, fn, args, kwargs, time.perf_counter())
+
+    def _run(self, fn, args, kwargs, submitted_at):
+        started_at = time.perf_counter()
+        previous_lane = _worker.lane
+        _worker.lane = self
+
+        with self.lock:
+            if submitted_at is not None:
+                wait_time = started_at - submitted_at
+                self.queued -= 1
+                self.active += 1
+                self.stats["wait_time"] += wait_time
+                self.stats["max_wait_time"] = max(self.stats["max_wait_time"], wait_time)
+
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _worker.lane = previous_lane
+            with self.lock:
+                if submitted_at is not None:
+                    self.active -= 1
+                self.stats["completed"] += 1
+                self.stats["failed"] += failed
+                self.stats["run_time"] += time.perf_counter() - started_at
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool:
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def get_stats(self):
+        with self.lock:
+            completed = self.stats["completed"]
+            queued_completed = completed - self.stats["inline"]
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self.queued,
+                "active": self.active,
+                "submitted": self.stats["submitted"],
+                "completed": completed,
+                "failed": self.stats["failed"],
+                "inline": self.stats["inline"],
+                "avg_wait_ms": self.stats["wait_time"] * 1000 / queued_completed if queued_completed > 0 else 0.0,
+                "max_wait_ms": self.stats["max_wait_time"] * 1000,
+                "avg_run_ms": self.stats["run_time"] * 1000 / completed if completed else 0.0
+            }
+
+class _WorkerState(threading.local):
+    lane = None  # Lane whose task the current thread is running
+
+_worker = _WorkerState()
+
+class _IOExecutor:
+    def __init__(self):
+        self.logger = logging.getLogger('io-executor')
+        self.lanes = {name: IOLane(name, max_workers) for name, max_workers in LANE_LIMITS.items()}
+
+    def get_lane(self, name):
+        if name not in self.lanes:
+            raise ValueError(f"Unknown executor lane '{name}', expected one of {', '.join(self.lanes)}")
+        return self.lanes[name]
+
+    def submit(self, lane, fn, *args, **kwargs):
+        return self.get_lane(lane).submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        for lane in self.lanes.values():
+            lane.shutdown(wait=wait)
+        self.logger.info("Shut down I/O executor lanes")
+
+    def get_stats(self):
+        return {name: lane.get_stats() for name, lane in self.lanes.items()}
+
+IOExecutor = _IOExecutor()
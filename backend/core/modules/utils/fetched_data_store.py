@@ -0,0 +1,37 @@
+import json
+import threading
+
+class FetchedDataStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}  # Raw payloads keyed by (ip address, path)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, ip_address, path):
+        # Returns whether the payload was stored and the payload itself
+        with self.lock:
+            key = (ip_address, path)
+            if key in self.data:
+                self.hits += 1
+                return True, self.data[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, ip_address, path, payload):
+        size = len(json.dumps(payload))
+        with self.lock:
+            self.data[(ip_address, path)] = payload
+            self.size += size
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.data),
+                "size_bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
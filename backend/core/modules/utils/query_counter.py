@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+from django.db import connection
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+@contextmanager
+def count_queries():
+    # Counts queries run on the current thread's connection while the block runs
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
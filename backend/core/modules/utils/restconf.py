@@ -1,20 +1,338 @@
+import asyncio
 import requests
 import logging
+import threading
 import time
+import random
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from core.settings import get_settings
+from core.modules.utils.executor import IOExecutor
+from core.modules.utils.config_compiler import ConfigCompiler
 
 requests.packages.urllib3.disable_warnings()
 
+class DeviceUnavailableError(Exception):
+    pass
+
+class _DeviceHealthTracker:
+    def __init__(self, failure_threshold=3, probe_interval=15, max_probe_interval=300):
+        self.logger = logging.getLogger('restconf')
+        self.failure_threshold = failure_threshold  # Consecutive failed requests that open the breaker
+        self.probe_interval = probe_interval  # Seconds before the first probe of an open device
+        self.max_probe_interval = max_probe_interval  # Probes back off up to this many seconds
+        self.devices = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "opened": 0,
+            "closed": 0,
+            "rejected": 0
+        }
+
+    def allow_request(self, ip_address):
+        # Closed devices always pass, open ones let a single probe through once it is due
+        now = time.monotonic()
+        with self.lock:
+            device = self.devices.get(ip_address)
+            if device is None or device['state'] == 'closed':
+                return True
+            if device['state'] == 'open' and now >= device['next_probe']:
+                device['state'] = 'half-open'
+                self.logger.info(f"Probing RESTCONF on {ip_address} after {device['probe_interval']}s")
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self, ip_address):
+        with self.lock:
+            device = self.devices.get(ip_address)
+            if device is None:
+                return
+            if device['state'] != 'closed':
+                self.stats["closed"] += 1
+                self.logger.info(f"RESTCONF on {ip_address} recovered, closing circuit breaker")
+            del self.devices[ip_address]
+
+    def record_failure(self, ip_address):
+        now = time.monotonic()
+        with self.lock:
+            device = self.devices.setdefault(ip_address, {
+                'state': 'closed',
+                'failures': 0,
+                'probe_interval': 0,
+                'next_probe': 0
+            })
+            device['failures'] += 1
+
+            if device['state'] == 'half-open':
+                # Failed probe, wait longer before the next one
+                device['probe_interval'] = min(device['probe_interval'] * 2, self.max_probe_interval)
+            elif device['state'] == 'closed' and device['failures'] >= self.failure_threshold:
+                device['probe_interval'] = self.probe_interval
+                self.stats["opened"] += 1
+                self.logger.warning(f"RESTCONF on {ip_address} failed {device['failures']} times, opening circuit breaker")
+            else:
+                return
+
+            device['state'] = 'open'
+            device['next_probe'] = now + device['probe_interval']
+
+    def is_open(self, ip_address):
+        # True while requests to the device would be rejected without being sent
+        now = time.monotonic()
+        with self.lock:
+            device = self.devices.get(ip_address)
+            if device is None or device['state'] == 'closed':
+                return False
+            return device['state'] == 'half-open' or now < device['next_probe']
+
+    def get_state(self, ip_address):
+        with self.lock:
+            device = self.devices.get(ip_address)
+            return device['state'] if device else 'closed'
+
+    def reset(self, ip_address=None):
+        with self.lock:
+            if ip_address is None:
+                self.devices.clear()
+            else:
+                self.devices.pop(ip_address, None)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "devices": {ip: dict(device) for ip, device in self.devices.items()},
+                "open": sum(1 for device in self.devices.values() if device['state'] != 'closed'),
+                "opened": self.stats["opened"],
+                "closed": self.stats["closed"],
+                "rejected": self.stats["rejected"]
+            }
+
+DeviceHealth = _DeviceHealthTracker()
+
+class _SaveCoalescer:
+    def __init__(self, quiet_period=5, max_save_attempts=5):
+        self.logger = logging.getLogger('restconf')
+        self.quiet_period = quiet_period  # Seconds without writes before a dirty device is saved
+        self.max_save_attempts = max_save_attempts  # Failed saves in a row before a device is given up on
+        self.dirty = {}  # Wrapper that last wrote to each unsaved device
+        self.saving = {}  # Save running on each device, with an event set once it is done
+        self.failed_attempts = {}
+        self.timers = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "writes": 0,
+            "saves": 0,
+            "failed_saves": 0
+        }
+
+    def mark_dirty(self, wrapper, ip_address):
+        # Every write restarts the device's quiet period
+        with self.lock:
+            self.stats["writes"] += 1
+            self.failed_attempts.pop(ip_address, None)
+            self._schedule(wrapper, ip_address)
+
+    def _schedule(self, wrapper, ip_address):
+        self.dirty[ip_address] = wrapper
+        timer = self.timers.pop(ip_address, None)
+        if timer:
+            timer.cancel()
+        timer = threading.Timer(self.quiet_period, self._save_device, args=(ip_address,))
+        timer.daemon = True
+        self.timers[ip_address] = timer
+        timer.start()
+
+    def flush(self, ip_address=None):
+        # Save dirty devices now, all of them when no address is given
+        with self.lock:
+            ip_addresses = list(self.dirty) if ip_address is None else [ip_address]
+        return all([self._save_device(ip) for ip in ip_addresses])
+
+    def is_dirty(self, ip_address):
+        with self.lock:
+            return ip_address in self.dirty
+
+    def _save_device(self, ip_address):
+        while True:
+            with self.lock:
+                in_flight = self.saving.get(ip_address)
+                if in_flight is None:
+                    timer = self.timers.pop(ip_address, None)
+                    if timer:
+                        timer.cancel()
+                    wrapper = self.dirty.pop(ip_address, None)
+                    if wrapper is None:
+                        return True
+                    in_flight = self.saving[ip_address] = {'done': threading.Event(), 'saved': False}
+                    break
+
+            # Another thread is saving the device, its result holds unless the device was written to since it started
+            in_flight['done'].wait()
+            if not in_flight['saved']:
+                return False
+            with self.lock:
+                if ip_address not in self.dirty:
+                    return True
+
+        saved = False
+        try:
+            saved = wrapper.save(ip_address)
+        finally:
+            with self.lock:
+                in_flight['saved'] = saved
+                self.saving.pop(ip_address, None)
+            in_flight['done'].set()
+
+        with self.lock:
+            if saved:
+                self.stats["saves"] += 1
+                self.failed_attempts.pop(ip_address, None)
+                return True
+
+            # Try again after another quiet period unless a newer write already rescheduled it
+            self.stats["failed_saves"] += 1
+            attempts = self.failed_attempts.get(ip_address, 0) + 1
+            retry = attempts < self.max_save_attempts
+            if retry:
+                self.failed_attempts[ip_address] = attempts
+            else:
+                self.failed_attempts.pop(ip_address, None)
+            if retry and ip_address not in self.dirty:
+                self._schedule(wrapper, ip_address)
+
+        if retry:
+            self.logger.warning(f"Failed to save configuration on {ip_address}, retrying in {self.quiet_period}s")
+        else:
+            self.logger.error(f"Giving up saving configuration on {ip_address} after {attempts} attempts")
+        return False
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "dirty": len(self.dirty),
+                "saving": len(self.saving),
+                "writes": self.stats["writes"],
+                "saves": self.stats["saves"],
+                "failed_saves": self.stats["failed_saves"]
+            }
+
+SaveCoalescer = _SaveCoalescer()
+
+class _RestconfSessionPool:
+    def __init__(self, pool_size=4, idle_timeout=300, eviction_interval=60):
+        self.logger = logging.getLogger('restconf')
+        self.pool_size = pool_size  # Keep-alive connections kept per device
+        self.idle_timeout = idle_timeout  # Seconds before an unused device session is closed
+        self.eviction_interval = eviction_interval  # Seconds between idle eviction sweeps
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.last_eviction = time.monotonic()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "evicted_handshakes": 0
+        }
+
+    def configure(self, pool_size=None, idle_timeout=None):
+        with self.lock:
+            if pool_size is not None:
+                self.pool_size = pool_size
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout
+
+    def get_session(self, ip_address):
+        now = time.monotonic()
+
+        with self.lock:
+            if now - self.last_eviction >= self.eviction_interval:
+                self._evict_idle_sessions(now)
+
+            entry = self.sessions.get(ip_address)
+            if entry:
+                entry['last_used'] = now
+                self.stats["hits"] += 1
+                return entry['session']
+
+            # No session for this device yet, open one with its own connection pool
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            self.sessions[ip_address] = {
+                'session': session,
+                'adapter': adapter,
+                'last_used': now
+            }
+            self.stats["misses"] += 1
+            self.logger.debug(f"Opened RESTCONF session for {ip_address}")
+            return session
+
+    def close_session(self, ip_address):
+        with self.lock:
+            entry = self.sessions.pop(ip_address, None)
+            if entry:
+                self._close_entry(entry)
+
+    def close_all(self):
+        with self.lock:
+            for entry in self.sessions.values():
+                self._close_entry(entry)
+            self.sessions.clear()
+
+    def get_stats(self):
+        with self.lock:
+            handshakes = self.stats["evicted_handshakes"] + sum(
+                self._count_connections(entry['adapter']) for entry in self.sessions.values()
+            )
+            return {
+                "sessions": len(self.sessions),
+                "pool_size": self.pool_size,
+                "idle_timeout": self.idle_timeout,
+                "hits": self.stats["hits"],
+                "misses": self.stats["misses"],
+                "evictions": self.stats["evictions"],
+                "handshakes": handshakes
+            }
+
+    def _evict_idle_sessions(self, now):
+        self.last_eviction = now
+        idle = [ip for ip, entry in self.sessions.items() if now - entry['last_used'] > self.idle_timeout]
+        for ip_address in idle:
+            self._close_entry(self.sessions.pop(ip_address))
+            self.stats["evictions"] += 1
+            self.logger.debug(f"Evicted idle RESTCONF session for {ip_address}")
+
+    def _close_entry(self, entry):
+        # Keep the handshake count of closed sessions so the counter stays monotonic
+        self.stats["evicted_handshakes"] += self._count_connections(entry['adapter'])
+        entry['session'].close()
+
+    def _count_connections(self, adapter):
+        # Each new connection in the urllib3 pools means a fresh TCP and TLS handshake
+        pools = adapter.poolmanager.pools
+        count = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                count += pool.num_connections
+        return count
+
+RestconfSessionPool = _RestconfSessionPool()
+
 class RestconfWrapper:
-    def __init__(self, username=None, password=None, max_retries=3, timeout=5, verify_ssl=False, auto_save=True):
+    def __init__(self, username=None, password=None, max_retries=3, timeout=5, verify_ssl=False, auto_save=True, backoff_base=0.5, backoff_max=8):
         settings = get_settings()
         self.username = username or settings.restconf_username
         self.password = password or settings.restconf_password
         self.max_retries = max_retries
         self.timeout = timeout
         self.verify_ssl = verify_ssl
-        self.auto_save = auto_save  # Auto-save enabled by default
+        self.auto_save = auto_save  # Auto-save enabled by default, coalesced per device
+        self.backoff_base = backoff_base  # Seconds before the first retry
+        self.backoff_max = backoff_max  # Upper bound of a single retry delay
+        self.pool = RestconfSessionPool  # Shared keep-alive sessions, one per device
+        self.health = DeviceHealth  # Shared circuit breakers, one per device
         self.logger = logging.getLogger('restconf')
         self.auth = HTTPBasicAuth(self.username, self.password)
         self.headers = {
@@ -29,13 +347,7 @@ class RestconfWrapper:
             try:
                 self.logger.debug(f"GET {url} (attempt {attempt + 1}/{self.max_retries})")
                 
-                response = requests.get(
-                    url,
-                    headers=self.headers,
-                    auth=self.auth,
-                    verify=self.verify_ssl,
-                    timeout=self.timeout
-                )
+                response = self._send('get', ip_address, url)
                 
                 if response.status_code == 200:
                     return response.json()
@@ -51,6 +363,9 @@ class RestconfWrapper:
                     self.logger.warning(f"Failed to get data from {url}: HTTP {response.status_code}")
                     if attempt == self.max_retries - 1:
                         return None
+            except DeviceUnavailableError:
+                self.logger.debug(f"Skipping {url}, circuit breaker is open")
+                return None
             except requests.exceptions.Timeout:
                 self.logger.warning(f"Timeout connecting to {url}")
                 if attempt == self.max_retries - 1:
@@ -64,27 +379,23 @@ class RestconfWrapper:
                 if attempt == self.max_retries - 1:
                     return None
             
-            # Constant backoff instead of exponential
-            self.logger.debug("Retrying in 1 second")
-            time.sleep(1)
+            self.wait_before_retry(attempt, url)
         
         return None
     
     def post(self, ip_address, path, data):
+        # Workflows running a config transaction stage the write instead of sending it
+        transaction = ConfigCompiler.current(self)
+        if transaction:
+            return transaction.stage(ip_address, 'merge', path, data)
+        
         url = f"https://{ip_address}/restconf/data/{path}"
         
         for attempt in range(self.max_retries):
             try:
                 self.logger.debug(f"POST {url} (attempt {attempt + 1}/{self.max_retries})")
                 
-                response = requests.post(
-                    url,
-                    headers=self.headers,
-                    auth=self.auth,
-                    verify=self.verify_ssl,
-                    timeout=self.timeout,
-                    json=data
-                )
+                response = self._send('post', ip_address, url, json=data)
                 
                 if response.status_code in [200, 201, 204]:
                     # Success - return response content if any, otherwise empty dict
@@ -94,15 +405,18 @@ class RestconfWrapper:
                     except ValueError:
                         pass
                     
-                    # Auto-save if enabled
+                    # Auto-save if enabled, once the device has been quiet for a while
                     if self.auto_save:
-                        self.save(ip_address)
+                        SaveCoalescer.mark_dirty(self, ip_address)
                         
                     return result
                 else:
                     self.logger.warning(f"Failed to POST data to {url}: HTTP {response.status_code}")
                     if attempt == self.max_retries - 1:
                         return None
+            except DeviceUnavailableError:
+                self.logger.debug(f"Skipping {url}, circuit breaker is open")
+                return None
             except requests.exceptions.Timeout:
                 self.logger.warning(f"Timeout connecting to {url}")
                 if attempt == self.max_retries - 1:
@@ -116,27 +430,23 @@ class RestconfWrapper:
                 if attempt == self.max_retries - 1:
                     return None
             
-            # Constant backoff
-            self.logger.debug("Retrying in 1 second")
-            time.sleep(1)
+            self.wait_before_retry(attempt, url)
         
         return None
     
     def patch(self, ip_address, path, data):
+        # Workflows running a config transaction stage the write instead of sending it
+        transaction = ConfigCompiler.current(self)
+        if transaction:
+            return transaction.stage(ip_address, 'merge', path, data)
+        
         url = f"https://{ip_address}/restconf/data/{path}"
         
         for attempt in range(self.max_retries):
             try:
                 self.logger.debug(f"PATCH {url} (attempt {attempt + 1}/{self.max_retries})")
 
-                response = requests.patch(
-                    url,
-                    headers=self.headers,
-                    auth=self.auth,
-                    verify=self.verify_ssl,
-                    timeout=self.timeout,
-                    json=data
-                )
+                response = self._send('patch', ip_address, url, json=data)
 
                 if response.status_code in [200, 204]:
                     # Success - return response content if any, otherwise empty dict
@@ -146,15 +456,18 @@ class RestconfWrapper:
                     except ValueError:
                         pass
                     
-                    # Auto-save if enabled
+                    # Auto-save if enabled, once the device has been quiet for a while
                     if self.auto_save:
-                        self.save(ip_address)
+                        SaveCoalescer.mark_dirty(self, ip_address)
                         
                     return result
                 else:
                     self.logger.warning(f"Failed to PATCH data at {url}: HTTP {response.status_code}")
                     if attempt == self.max_retries - 1:
                         return None
+            except DeviceUnavailableError:
+                self.logger.debug(f"Skipping {url}, circuit breaker is open")
+                return None
             except requests.exceptions.Timeout:
                 self.logger.warning(f"Timeout connecting to {url}")
                 if attempt == self.max_retries - 1:
@@ -168,26 +481,22 @@ class RestconfWrapper:
                 if attempt == self.max_retries - 1:
                     return None
             
-            # Constant backoff
-            self.logger.debug("Retrying in 1 second")
-            time.sleep(1)
+            self.wait_before_retry(attempt, url)
         
         return None
     
     def delete(self, ip_address, path):
+        transaction = ConfigCompiler.current(self)
+        if transaction:
+            return transaction.stage(ip_address, 'remove', path)
+        
         url = f"https://{ip_address}/restconf/data/{path}"
         
         for attempt in range(self.max_retries):
             try:
                 self.logger.debug(f"DELETE {url} (attempt {attempt + 1}/{self.max_retries})")
                 
-                response = requests.delete(
-                    url,
-                    headers=self.headers,
-                    auth=self.auth,
-                    verify=self.verify_ssl,
-                    timeout=self.timeout
-                )
+                response = self._send('delete', ip_address, url)
                 
                 if response.status_code in [200, 204, 404]:
                     # Success (no content expected for DELETE)
@@ -195,15 +504,18 @@ class RestconfWrapper:
                     if response.status_code == 404:
                         self.logger.warning("Request to delete a resource that doesn't exist, passing as successful")
 
-                    # Auto-save if enabled
+                    # Auto-save if enabled, once the device has been quiet for a while
                     if self.auto_save:
-                        self.save(ip_address)
+                        SaveCoalescer.mark_dirty(self, ip_address)
                         
                     return True
                 else:
                     self.logger.warning(f"Failed to DELETE resource at {url}: HTTP {response.status_code}")
                     if attempt == self.max_retries - 1:
                         return False
+            except DeviceUnavailableError:
+                self.logger.debug(f"Skipping {url}, circuit breaker is open")
+                return False
             except requests.exceptions.Timeout:
                 self.logger.warning(f"Timeout connecting to {url}")
                 if attempt == self.max_retries - 1:
@@ -217,27 +529,23 @@ class RestconfWrapper:
                 if attempt == self.max_retries - 1:
                     return False
             
-            # Constant backoff
-            self.logger.debug("Retrying in 1 second")
-            time.sleep(1)
+            self.wait_before_retry(attempt, url)
         
         return False
     
     def put(self, ip_address, path, data):
+        # Workflows running a config transaction stage the write instead of sending it
+        transaction = ConfigCompiler.current(self)
+        if transaction:
+            return transaction.stage(ip_address, 'replace', path, data)
+        
         url = f"https://{ip_address}/restconf/data/{path}"
         
         for attempt in range(self.max_retries):
             try:
                 self.logger.debug(f"PUT {url} (attempt {attempt + 1}/{self.max_retries})")
                 
-                response = requests.put(
-                    url,
-                    headers=self.headers,
-                    auth=self.auth,
-                    verify=self.verify_ssl,
-                    timeout=self.timeout,
-                    json=data
-                )
+                response = self._send('put', ip_address, url, json=data)
 
                 if response.status_code in [200, 201, 204]:
                     # Success - return response content if any, otherwise empty dict
@@ -247,15 +555,18 @@ class RestconfWrapper:
                     except ValueError:
                         pass
                     
-                    # Auto-save if enabled
+                    # Auto-save if enabled, once the device has been quiet for a while
                     if self.auto_save:
-                        self.save(ip_address)
+                        SaveCoalescer.mark_dirty(self, ip_address)
                         
                     return result
                 else:
                     self.logger.warning(f"Failed to PUT data to {url}: HTTP {response.status_code}")
                     if attempt == self.max_retries - 1:
                         return None
+            except DeviceUnavailableError:
+                self.logger.debug(f"Skipping {url}, circuit breaker is open")
+                return None
             except requests.exceptions.Timeout:
                 self.logger.warning(f"Timeout connecting to {url}")
                 if attempt == self.max_retries - 1:
@@ -269,25 +580,106 @@ class RestconfWrapper:
                 if attempt == self.max_retries - 1:
                     return None
             
-            # Constant backoff
-            self.logger.debug("Retrying in 1 second")
-            time.sleep(1)
+            self.wait_before_retry(attempt, url)
         
         return None
     
-    def save(self, ip_address):
-        url = f"https://{ip_address}/restconf/operations/cisco-ia:save-config"
+    def yang_patch(self, ip_address, edits, patch_id):
+        # Applies all edits in one atomic request, the device rejects the whole patch if any edit fails
+        url = f"https://{ip_address}/restconf/data"
+        headers = dict(self.headers, **{'Content-Type': 'application/yang-patch+json'})
+        data = {
+            "ietf-yang-patch:yang-patch": {
+                "patch-id": patch_id,
+                "edit": edits
+            }
+        }
         
-        try:
-            self.logger.debug(f"Attempting to save configuration to startup at {ip_address}")
+        for attempt in range(self.max_retries):
+            try:
+                self.logger.debug(f"YANG-Patch {patch_id} with {len(edits)} edits to {url} (attempt {attempt + 1}/{self.max_retries})")
+                
+                response = self._send('patch', ip_address, url, headers=headers, json=data)
+                
+                if response.status_code in [200, 204]:
+                    result = {}
+                    try:
+                        result = response.json()
+                    except ValueError:
+                        pass
+                    
+                    # Auto-save if enabled, once the device has been quiet for a while
+                    if self.auto_save:
+                        SaveCoalescer.mark_dirty(self, ip_address)
+                    
+                    return result
+                elif response.status_code in [400, 409]:
+                    # The patch was rejected as a whole, retrying would not change the outcome
+                    self.logger.error(f"YANG-Patch {patch_id} rejected by {ip_address}: HTTP {response.status_code} {response.text}")
+                    return None
+                else:
+                    self.logger.warning(f"Failed to apply YANG-Patch {patch_id} to {url}: HTTP {response.status_code}")
+                    if attempt == self.max_retries - 1:
+                        return None
+            except DeviceUnavailableError:
+                self.logger.debug(f"Skipping {url}, circuit breaker is open")
+                return None
+            except requests.exceptions.Timeout:
+                self.logger.warning(f"Timeout connecting to {url}")
+                if attempt == self.max_retries - 1:
+                    return None
+            except requests.exceptions.ConnectionError:
+                self.logger.warning(f"Connection error for {url}")
+                if attempt == self.max_retries - 1:
+                    return None
+            except Exception as e:
+                self.logger.error(f"Error applying YANG-Patch {patch_id} to {url}: {str(e)}")
+                if attempt == self.max_retries - 1:
+                    return None
             
-            response = requests.post(
+            self.wait_before_retry(attempt, url)
+        
+        return None
+    
+    def _send(self, method, ip_address, url, headers=None, **kwargs):
+        # Every request goes through the device's circuit breaker
+        if not self.health.allow_request(ip_address):
+            raise DeviceUnavailableError(f"Circuit breaker is open for {ip_address}")
+        
+        try:
+            response = getattr(self.pool.get_session(ip_address), method)(
                 url,
-                headers=self.headers,
+                headers=headers or self.headers,
                 auth=self.auth,
                 verify=self.verify_ssl,
                 timeout=self.timeout,
+                **kwargs
             )
+        except Exception:
+            self.health.record_failure(ip_address)
+            raise
+        
+        # Any HTTP answer means the device is up, even an error status
+        self.health.record_success(ip_address)
+        return response
+    
+    def wait_before_retry(self, attempt, url):
+        # Capped exponential backoff with full jitter so retries to a device do not line up
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        self.logger.debug(f"Retrying {url} in {delay:.2f} seconds")
+        time.sleep(delay)
+    
+    def flush(self, ip_address=None):
+        # Persist pending writes to startup now instead of waiting for the quiet period
+        return SaveCoalescer.flush(ip_address)
+    
+    def save(self, ip_address):
+        url = f"https://{ip_address}/restconf/operations/cisco-ia:save-config"
+        
+        try:
+            self.logger.debug(f"Attempting to save configuration to startup at {ip_address}")
+            
+            response = self._send('post', ip_address, url)
             
             if response.status_code == 200:
                 self.logger.debug("Configuration saved to startup successfully")
@@ -295,6 +687,9 @@ class RestconfWrapper:
             else:
                 self.logger.warning(f"Failed to save configuration to startup: HTTP {response.status_code}")
                 return False
+        except DeviceUnavailableError:
+            self.logger.debug(f"Skipping {url}, circuit breaker is open")
+            return False
         except requests.exceptions.Timeout:
             self.logger.warning(f"Timeout connecting to {url}")
             return False
@@ -309,13 +704,7 @@ class RestconfWrapper:
         url = f"https://{ip_address}/restconf/"
         
         try:
-            response = requests.get(
-                url,
-                headers=self.headers,
-                auth=self.auth,
-                verify=self.verify_ssl,
-                timeout=self.timeout
-            )
+            response = self._send('get', ip_address, url)
             
             if response.status_code == 200:
                 data = response.json()
@@ -325,3 +714,56 @@ class RestconfWrapper:
         except Exception as e:
             self.logger.debug(f"RESTCONF not available at {ip_address}: {str(e)}")
             return False
+
+class AsyncRestconfClient:
+    def __init__(self, wrapper=None, max_concurrency=50, lane='monitoring', **kwargs):
+        # Requests still go through the wrapper so retries and pooled sessions are shared
+        self.wrapper = wrapper or RestconfWrapper(**kwargs)
+        self.max_concurrency = max_concurrency  # Cap on in-flight requests of this client
+        self.executor = IOExecutor.get_lane(lane)  # Blocking calls run on the shared I/O lane
+        self.semaphore = None
+        self.loop = None
+        self.logger = logging.getLogger('restconf')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def close(self):
+        # The lane is shared with the rest of the process, so it is left running
+        self.semaphore = None
+        self.loop = None
+
+    async def get(self, ip_address, path):
+        return await self._call(self.wrapper.get, ip_address, path)
+
+    async def post(self, ip_address, path, data):
+        return await self._call(self.wrapper.post, ip_address, path, data)
+
+    async def patch(self, ip_address, path, data):
+        return await self._call(self.wrapper.patch, ip_address, path, data)
+
+    async def delete(self, ip_address, path):
+        return await self._call(self.wrapper.delete, ip_address, path)
+
+    async def put(self, ip_address, path, data):
+        return await self._call(self.wrapper.put, ip_address, path, data)
+
+    async def save(self, ip_address):
+        return await self._call(self.wrapper.save, ip_address)
+
+    async def is_available(self, ip_address):
+        return await self._call(self.wrapper.is_available, ip_address)
+
+    async def _call(self, method, *args):
+        loop = asyncio.get_running_loop()
+
+        # Semaphores are bound to the loop they are first used in
+        if self.loop is not loop:
+            self.loop = loop
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self.semaphore:
+            return await loop.run_in_executor(self.executor, method, *args)
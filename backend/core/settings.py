@@ -68,6 +68,38 @@ class Settings(models.Model):
         validators=[MinValueValidator(1)],
         help_text='Discovery interval in seconds'
     )
+
+    # Retention of monitoring data (stored in days) and how often it is enforced (stored in seconds)
+    raw_metrics_retention_days = models.PositiveIntegerField(
+        default=30,
+        validators=[MinValueValidator(1)],
+        help_text='Days to keep raw device and interface metrics'
+    )
+    rollup_1m_retention_days = models.PositiveIntegerField(
+        default=30,
+        validators=[MinValueValidator(1)],
+        help_text='Days to keep 1 minute metric rollups'
+    )
+    rollup_5m_retention_days = models.PositiveIntegerField(
+        default=90,
+        validators=[MinValueValidator(1)],
+        help_text='Days to keep 5 minute metric rollups'
+    )
+    rollup_1h_retention_days = models.PositiveIntegerField(
+        default=365,
+        validators=[MinValueValidator(1)],
+        help_text='Days to keep 1 hour metric rollups'
+    )
+    notification_retention_days = models.PositiveIntegerField(
+        default=30,
+        validators=[MinValueValidator(1)],
+        help_text='Days to keep acknowledged notifications'
+    )
+    retention_interval = models.PositiveIntegerField(
+        default=3600,
+        validators=[MinValueValidator(1)],
+        help_text='Retention enforcement interval in seconds'
+    )
     
     class Meta:
         verbose_name = 'Settings'
@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import Customer, Site, DHCPLease, DHCPScope
+from core.modules.ipam import IPAM
+from core.modules.dhcp_leases import Leases
+from core.modules.dhcp_scopes import Scopes
+
+@receiver(post_delete, sender=Site)
+def release_site_id(sender, instance, **kwargs):
+    # The ID is only reusable once the deletion is committed
+    site_id = instance.id
+    transaction.on_commit(lambda: IPAM.release_site_id(site_id))
+
+@receiver(post_delete, sender=Site)
+def release_site_networks(sender, instance, **kwargs):
+    # Also covers sites deleted along with their customer, the scope gives its network back once deleted
+    if instance.dhcp_scope_id:
+        DHCPScope.objects.filter(pk=instance.dhcp_scope_id).delete()
+    if instance.link_network:
+        customer_id, link_network = instance.customer_id, instance.link_network
+        transaction.on_commit(lambda: IPAM.release_link_network(customer_id, link_network))
+
+@receiver(post_delete, sender=Customer)
+def drop_link_networks(sender, instance, **kwargs):
+    customer_id = instance.pk
+    transaction.on_commit(lambda: IPAM.drop_link_networks(customer_id))
+
+@receiver(post_delete, sender=DHCPLease)
+def forget_lease(sender, instance, **kwargs):
+    # Keeps the DHCP server from holding on to addresses of deleted routers
+    mac_address = instance.mac_address
+    transaction.on_commit(lambda: Leases.forget(mac_address))
+
+@receiver(post_save, sender=DHCPScope)
+def index_scope(sender, instance, **kwargs):
+    transaction.on_commit(lambda: Scopes.update(instance))
+
+@receiver(post_delete, sender=DHCPScope)
+def unindex_scope(sender, instance, **kwargs):
+    scope_id = instance.pk
+    transaction.on_commit(lambda: Scopes.remove(scope_id))
+
+@receiver(post_delete, sender=DHCPScope)
+def release_site_scope(sender, instance, **kwargs):
+    # Scopes outside the sites DHCP network are ignored by IPAM
+    network = instance.network
+    transaction.on_commit(lambda: IPAM.release_site_scope(network))
@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase
+from core.modules.utils.allocator import IntervalAllocator
+
+class IntervalAllocatorTests(SimpleTestCase):
+    def test_allocates_lowest_free_value(self):
+        allocator = IntervalAllocator(0, 3)
+        self.assertEqual([allocator.allocate() for _ in range(4)], [0, 1, 2, None])
+        self.assertEqual(allocator.free, 0)
+
+    def test_empty_range(self):
+        allocator = IntervalAllocator(5, 5)
+        self.assertIsNone(allocator.allocate())
+        self.assertEqual(allocator.get_stats(), {"size": 0, "free": 0, "fragments": 0})
+
+    def test_release_makes_value_allocatable_again(self):
+        allocator = IntervalAllocator(0, 10)
+        for _ in range(5):
+            allocator.allocate()
+        self.assertTrue(allocator.release(2))
+        self.assertFalse(allocator.release(2))
+        self.assertEqual(allocator.allocate(), 2)
+        self.assertEqual(allocator.allocate(), 5)
+
+    def test_release_outside_range_or_of_free_value(self):
+        allocator = IntervalAllocator(10, 20)
+        self.assertFalse(allocator.release(9))
+        self.assertFalse(allocator.release(20))
+        self.assertFalse(allocator.release(15))
+        self.assertEqual(allocator.free, 10)
+
+    def test_release_merges_neighbouring_intervals(self):
+        allocator = IntervalAllocator(0, 10)
+        allocator.load([3, 4, 5])
+        self.assertEqual(allocator.get_stats()["fragments"], 2)
+        allocator.release(3)
+        allocator.release(5)
+        self.assertEqual(allocator.get_stats()["fragments"], 2)
+        allocator.release(4)
+        self.assertEqual((allocator.starts, allocator.ends), ([0], [10]))
+        self.assertEqual(allocator.free, 10)
+
+    def test_reserve_splits_intervals(self):
+        allocator = IntervalAllocator(0, 10)
+        self.assertTrue(allocator.reserve(4))
+        self.assertFalse(allocator.reserve(4))
+        self.assertTrue(allocator.reserve(0))
+        self.assertTrue(allocator.reserve(9))
+        self.assertEqual((allocator.starts, allocator.ends), ([1, 5], [4, 9]))
+        self.assertFalse(allocator.is_free(4))
+        self.assertTrue(allocator.is_free(5))
+        self.assertEqual(allocator.free, 7)
+
+    def test_load_skips_values_outside_range(self):
+        allocator = IntervalAllocator(1, 6)
+        allocator.load([0, 1, 2, 4, 6, 7])
+        self.assertEqual((allocator.starts, allocator.ends), ([3, 5], [4, 6]))
+        self.assertEqual(allocator.free, 2)
+        self.assertEqual([allocator.allocate(), allocator.allocate(), allocator.allocate()], [3, 5, None])
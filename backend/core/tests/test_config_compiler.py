@@ -0,0 +1,84 @@
+from django.test import SimpleTestCase
+from core.modules.utils.config_compiler import ConfigTransaction, compile_target
+
+class FakeRestconf:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.patches = []
+
+    def yang_patch(self, ip_address, edits, patch_id):
+        self.patches.append((ip_address, edits, patch_id))
+        return None if ip_address in self.failing else {}
+
+class CompileTargetTests(SimpleTestCase):
+    def test_prefixes_only_nodes_that_change_module(self):
+        self.assertEqual(
+            compile_target('Cisco-IOS-XE-native:native/interface/GigabitEthernet=1'),
+            ('/Cisco-IOS-XE-native:native/interface/GigabitEthernet=1', 'GigabitEthernet', 'Cisco-IOS-XE-native:GigabitEthernet')
+        )
+
+    def test_augmenting_nodes_switch_module(self):
+        target, name, qualified_name = compile_target('Cisco-IOS-XE-native:native/router/router-ospf/ospf/process-id-vrf=1,CUST')
+        self.assertEqual(target, '/Cisco-IOS-XE-native:native/router/Cisco-IOS-XE-ospf:router-ospf/ospf/process-id-vrf=1,CUST')
+        self.assertEqual(name, 'process-id-vrf')
+        self.assertEqual(qualified_name, 'Cisco-IOS-XE-ospf:process-id-vrf')
+
+    def test_ignores_empty_segments(self):
+        self.assertEqual(
+            compile_target('/Cisco-IOS-XE-native:native/router/router-ospf/ospf/')[0],
+            '/Cisco-IOS-XE-native:native/router/Cisco-IOS-XE-ospf:router-ospf/ospf'
+        )
+
+class ConfigTransactionTests(SimpleTestCase):
+    def test_stage_unwraps_payloads_named_after_the_target(self):
+        transaction = ConfigTransaction('test', None)
+        result = transaction.stage('10.0.0.1', 'merge', 'Cisco-IOS-XE-native:native/hostname', {'Cisco-IOS-XE-native:hostname': 'PE1'})
+        self.assertEqual(result, {})
+        self.assertEqual(transaction.edits['10.0.0.1'], [{
+            'operation': 'merge',
+            'target': '/Cisco-IOS-XE-native:native/hostname',
+            'value': {'Cisco-IOS-XE-native:hostname': 'PE1'},
+            'edit-id': '1'
+        }])
+
+    def test_stage_encodes_list_entries_as_lists(self):
+        transaction = ConfigTransaction('test', None)
+        transaction.stage('10.0.0.1', 'merge', 'Cisco-IOS-XE-native:native/vrf/definition=CUST', {'definition': {'name': 'CUST'}})
+        self.assertEqual(transaction.edits['10.0.0.1'][0]['value'], {'Cisco-IOS-XE-native:definition': [{'name': 'CUST'}]})
+
+    def test_stage_remove_has_no_value(self):
+        transaction = ConfigTransaction('test', None)
+        self.assertIs(transaction.stage('10.0.0.1', 'remove', 'Cisco-IOS-XE-native:native/vrf/definition=CUST'), True)
+        self.assertNotIn('value', transaction.edits['10.0.0.1'][0])
+
+    def test_stage_numbers_edits_per_device(self):
+        transaction = ConfigTransaction('test', None)
+        transaction.stage('10.0.0.1', 'merge', 'Cisco-IOS-XE-native:native/hostname', 'PE1')
+        transaction.stage('10.0.0.2', 'merge', 'Cisco-IOS-XE-native:native/hostname', 'PE2')
+        transaction.stage('10.0.0.1', 'remove', 'Cisco-IOS-XE-native:native/banner')
+        self.assertEqual([edit['edit-id'] for edit in transaction.edits['10.0.0.1']], ['1', '2'])
+        self.assertEqual([edit['edit-id'] for edit in transaction.edits['10.0.0.2']], ['1'])
+        self.assertEqual(transaction.devices, {'10.0.0.1', '10.0.0.2'})
+        self.assertEqual(transaction.changes, 3)
+
+    def test_commit_runs_callbacks_of_devices_that_applied_their_changes(self):
+        restconf = FakeRestconf(failing={'10.0.0.2'})
+        transaction = ConfigTransaction('test', restconf)
+        applied = []
+        for ip_address in ('10.0.0.1', '10.0.0.2'):
+            transaction.stage(ip_address, 'merge', 'Cisco-IOS-XE-native:native/hostname', 'R')
+            transaction.on_commit(ip_address, lambda ip_address=ip_address: applied.append(ip_address))
+
+        self.assertFalse(transaction.commit())
+        self.assertEqual(applied, ['10.0.0.1'])
+        self.assertEqual(transaction.failed_devices, {'10.0.0.2'})
+        self.assertEqual(len(restconf.patches), 2)
+        self.assertEqual(transaction.edits, {})
+
+    def test_discard_drops_edits_and_callbacks(self):
+        transaction = ConfigTransaction('test', FakeRestconf())
+        transaction.stage('10.0.0.1', 'merge', 'Cisco-IOS-XE-native:native/hostname', 'R')
+        transaction.on_commit('10.0.0.1', self.fail)
+        transaction.discard()
+        self.assertTrue(transaction.commit())
+        self.assertEqual(transaction.failed_devices, {'10.0.0.1'})
@@ -0,0 +1,74 @@
+import socket
+import struct
+from django.test import SimpleTestCase
+from core.modules.dhcp import (
+    _DHCPServer, MAGIC_COOKIE, DHCP_DISCOVER, DHCP_REQUEST, DHCP_OFFER, DHCP_MESSAGE_TYPE, DHCP_SERVER_ID,
+    DHCP_LEASE_TIME, DHCP_SUBNET_MASK, DHCP_ROUTER, DHCP_TFTP_SERVER_IP, DHCP_BOOTFILE, DHCP_HOSTNAME, DHCP_REQUESTED_IP, DHCP_END
+)
+
+MAC = bytes.fromhex('020000000a0b')
+
+def client_packet(message_type, xid=0x12345678, giaddr='0.0.0.0', hostname=None, requested_ip=None, padding=False):
+    packet = bytearray(240)
+    struct.pack_into('!BBBB', packet, 0, 1, 1, 6, 0)
+    struct.pack_into('!I', packet, 4, xid)
+    packet[24:28] = socket.inet_aton(giaddr)
+    packet[28:34] = MAC
+    packet[236:240] = MAGIC_COOKIE
+    packet += bytes([DHCP_MESSAGE_TYPE, 1, message_type])
+    if padding:
+        packet += b'\x00\x00'
+    if hostname:
+        packet += bytes([DHCP_HOSTNAME, len(hostname)]) + hostname.encode()
+    if requested_ip:
+        packet += bytes([DHCP_REQUESTED_IP, 4]) + socket.inet_aton(requested_ip)
+    packet += bytes([DHCP_END])
+    return bytes(packet)
+
+class DHCPPacketTests(SimpleTestCase):
+    def setUp(self):
+        self.server = _DHCPServer()
+        self.server.server_ip = '10.10.0.1'
+        self.server.tftp_server_ip = '10.10.0.2'
+        self.server.main_scope_subnet_mask = '255.255.0.0'
+        self.server.config_filename = 'router-confg'
+
+    def test_parse_client_packet(self):
+        packet = self.server.parse_packet(client_packet(DHCP_REQUEST, giaddr='100.64.0.1', hostname='CE1', requested_ip='100.64.0.2', padding=True))
+        self.assertEqual(packet.message_type, DHCP_REQUEST)
+        self.assertEqual(packet.xid, struct.pack('!I', 0x12345678))
+        self.assertEqual(packet.client_mac, '02:00:00:00:0a:0b')
+        self.assertEqual(packet.giaddr, '100.64.0.1')
+        self.assertEqual(packet.hostname, 'CE1')
+        self.assertEqual(packet.requested_ip, '100.64.0.2')
+
+    def test_parse_defaults_and_rejects_non_dhcp(self):
+        packet = self.server.parse_packet(client_packet(DHCP_DISCOVER))
+        self.assertEqual((packet.hostname, packet.requested_ip), ('Unknown', None))
+        self.assertIsNone(self.server.parse_packet(b'\x00' * 300))
+        self.assertIsNone(self.server.parse_packet(client_packet(DHCP_DISCOVER)[:239]))
+
+    def test_reply_round_trip(self):
+        request = self.server.parse_packet(client_packet(DHCP_DISCOVER, giaddr='100.64.0.1'))
+        reply = self.server.parse_packet(bytes(self.server.create_dhcp_packet(request, DHCP_OFFER, '100.64.0.2', '255.255.255.252')))
+
+        self.assertEqual(reply.data[0], 2)
+        self.assertEqual(reply.message_type, DHCP_OFFER)
+        self.assertEqual(reply.xid, request.xid)
+        self.assertEqual(reply.chaddr, MAC)
+        self.assertEqual(reply.giaddr, '100.64.0.1')
+        self.assertEqual(socket.inet_ntoa(reply.data[16:20]), '100.64.0.2')
+        self.assertEqual(socket.inet_ntoa(reply.data[20:24]), '10.10.0.1')
+        self.assertEqual(socket.inet_ntoa(reply.options[DHCP_SUBNET_MASK]), '255.255.255.252')
+        self.assertEqual(socket.inet_ntoa(reply.options[DHCP_SERVER_ID]), '10.10.0.1')
+        self.assertEqual(socket.inet_ntoa(reply.options[DHCP_ROUTER]), '10.10.0.1')
+        self.assertEqual(socket.inet_ntoa(reply.options[DHCP_TFTP_SERVER_IP]), '10.10.0.2')
+        self.assertEqual(struct.unpack('!I', reply.options[DHCP_LEASE_TIME])[0], self.server.lease_time)
+        self.assertEqual(bytes(reply.options[DHCP_BOOTFILE]), b'router-confg')
+
+    def test_reply_defaults_to_main_subnet_mask(self):
+        request = self.server.parse_packet(client_packet(DHCP_DISCOVER))
+        first = self.server.parse_packet(bytes(self.server.create_dhcp_packet(request, DHCP_OFFER, '10.10.0.5', '255.255.255.252')))
+        second = self.server.parse_packet(bytes(self.server.create_dhcp_packet(request, DHCP_OFFER, '10.10.0.5')))
+        self.assertEqual(socket.inet_ntoa(first.options[DHCP_SUBNET_MASK]), '255.255.255.252')
+        self.assertEqual(socket.inet_ntoa(second.options[DHCP_SUBNET_MASK]), '255.255.0.0')
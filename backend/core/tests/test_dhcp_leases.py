@@ -0,0 +1,77 @@
+import ipaddress
+from unittest import mock
+from django.test import SimpleTestCase
+from core.models import DHCPLease
+from core.modules.dhcp_leases import LeaseStore
+
+def load_store(offer_ttl=60):
+    store = LeaseStore(offer_ttl=offer_ttl)
+    # The tests sweep themselves and never flush, so no background thread is started
+    store.flusher = store.sweeper = True
+    with mock.patch.object(DHCPLease.objects, 'all', return_value=[]):
+        store.load(ipaddress.IPv4Network('10.10.0.0/29'), reserved=['10.10.0.1'])
+    return store
+
+class LeaseStoreTests(SimpleTestCase):
+    def test_offer_next_free_reserves_distinct_addresses(self):
+        store = load_store()
+        offered = [store.offer_next_free(f'aa:00:00:00:00:0{n}', n, '255.255.255.248') for n in range(6)]
+        self.assertEqual(offered, ['10.10.0.2', '10.10.0.3', '10.10.0.4', '10.10.0.5', '10.10.0.6', None])
+        self.assertEqual(store.holder('10.10.0.3'), 'aa:00:00:00:00:01')
+        self.assertIsNone(store.next_free())
+
+    def test_offer_refuses_addresses_held_by_others(self):
+        store = load_store()
+        self.assertTrue(store.offer('aa:aa', 1, '10.10.0.4', '255.255.255.248'))
+        self.assertFalse(store.offer('bb:bb', 2, '10.10.0.4', '255.255.255.248'))
+        self.assertTrue(store.offer('aa:aa', 3, '10.10.0.4', '255.255.255.248'))
+        self.assertEqual(store.get_offer('aa:aa').xid, 3)
+        self.assertIsNone(store.get_offer('aa:aa', xid=1))
+
+    def test_new_offer_frees_the_previous_one(self):
+        store = load_store()
+        store.offer('aa:aa', 1, '10.10.0.4', '255.255.255.248')
+        store.offer('aa:aa', 2, '10.10.0.5', '255.255.255.248')
+        self.assertIsNone(store.holder('10.10.0.4'))
+        self.assertEqual(store.next_free(), '10.10.0.2')
+
+    def test_commit_fulfils_the_offer(self):
+        store = load_store()
+        ip_address = store.offer_next_free('aa:aa', 1, '255.255.255.248')
+        self.assertEqual(store.commit('aa:aa', ip_address, 'CE1'), (True, None))
+        self.assertIsNone(store.get_offer('aa:aa'))
+        self.assertEqual(store.get('aa:aa').hostname, 'CE1')
+        self.assertEqual(store.holder(ip_address), 'aa:aa')
+        self.assertEqual(store.get_stats()["pending"], 1)
+
+    def test_commit_refuses_addresses_offered_to_others(self):
+        store = load_store()
+        store.offer('aa:aa', 1, '10.10.0.4', '255.255.255.248')
+        self.assertEqual(store.commit('bb:bb', '10.10.0.4'), (False, None))
+        self.assertIsNone(store.get('bb:bb'))
+
+    def test_commit_of_another_address_frees_the_previous_one(self):
+        store = load_store()
+        store.commit('aa:aa', '10.10.0.2')
+        committed, previous = store.commit('aa:aa', '10.10.0.3')
+        self.assertTrue(committed)
+        self.assertEqual(previous.ip_address, '10.10.0.2')
+        self.assertIsNone(store.holder('10.10.0.2'))
+        self.assertEqual(store.next_free(), '10.10.0.2')
+
+    def test_sweep_frees_expired_offers(self):
+        store = load_store(offer_ttl=0)
+        store.offer_next_free('aa:aa', 1, '255.255.255.248')
+        store.commit('bb:bb', '10.10.0.3')
+        self.assertEqual(store.next_free(), '10.10.0.4')
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual(store.sweep(), 0)
+        self.assertIsNone(store.holder('10.10.0.2'))
+        self.assertEqual(store.holder('10.10.0.3'), 'bb:bb')
+        self.assertEqual(store.next_free(), '10.10.0.2')
+
+    def test_sweep_keeps_live_offers(self):
+        store = load_store()
+        store.offer_next_free('aa:aa', 1, '255.255.255.248')
+        self.assertEqual(store.sweep(), 0)
+        self.assertEqual(store.get_offer('aa:aa').ip_address, '10.10.0.2')
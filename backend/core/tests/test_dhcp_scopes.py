@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from core.modules.dhcp_scopes import ScopeIndex
+from core.modules.dhcp_leases import ip_to_int
+
+def scope(pk, network, subnet_mask='255.255.255.252', is_active=True):
+    return SimpleNamespace(pk=pk, network=network, subnet_mask=subnet_mask, is_active=is_active)
+
+class ScopeIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = ScopeIndex()
+        self.index.loaded = True
+        self.index.update(scope(1, '100.64.0.0'))
+        self.index.update(scope(2, '100.64.0.4', is_active=False))
+        self.index.update(scope(3, '100.64.1.0', '255.255.255.0'))
+
+    def test_finds_scope_holding_address(self):
+        found = self.index.find('100.64.0.2')
+        self.assertEqual((found.first, found.last), (ip_to_int('100.64.0.0'), ip_to_int('100.64.0.3')))
+        self.assertEqual(self.index.find('100.64.1.200').subnet_mask, '255.255.255.0')
+
+    def test_scope_bounds_are_inclusive(self):
+        self.assertIsNotNone(self.index.find('100.64.0.0'))
+        self.assertIsNotNone(self.index.find('100.64.0.3'))
+        self.assertIsNotNone(self.index.find('100.64.1.255'))
+
+    def test_addresses_outside_every_scope(self):
+        self.assertIsNone(self.index.find('100.63.255.255'))
+        self.assertIsNone(self.index.find('100.64.0.8'))
+        self.assertIsNone(self.index.find('100.64.2.0'))
+
+    def test_active_only_skips_inactive_scopes(self):
+        self.assertIsNotNone(self.index.find('100.64.0.5'))
+        self.assertIsNone(self.index.find('100.64.0.5', active_only=True))
+
+    def test_update_moves_and_remove_drops_scopes(self):
+        self.index.update(scope(1, '100.64.0.8'))
+        self.assertIsNone(self.index.find('100.64.0.2'))
+        self.assertIsNotNone(self.index.find('100.64.0.10'))
+        self.index.remove(1)
+        self.assertIsNone(self.index.find('100.64.0.10'))
+        self.assertEqual(self.index.get_stats(), {"scopes": 2, "active": 1})
+
+    def test_scopes_starting_at_the_same_address(self):
+        self.index.update(scope(4, '100.64.1.0', '255.255.255.252', is_active=False))
+        self.assertEqual(self.index.find('100.64.1.100').subnet_mask, '255.255.255.0')
+        self.assertEqual(self.index.find('100.64.1.1', active_only=True).subnet_mask, '255.255.255.0')
+
+    def test_last_host(self):
+        self.assertEqual(self.index.last_host(self.index.find('100.64.0.1')), '100.64.0.2')
@@ -12,6 +12,7 @@ from core.views.users import UserProfileView
 from core.views.test import test_view
 from core.views.monitor import RouterMetricsView, InterfaceMetricsView, DashboardStatsView, RouterInfoView
 from core.views.notifications import NotificationView
+from core.views.jobs import JobView, JobEventsView
 
 urlpatterns = [
     # Auth endpoints
@@ -65,6 +66,11 @@ urlpatterns = [
     path('vpns/<int:vpn_id>/sites/', VPNSiteView.as_view(), name='vpn-site-add'),
     path('vpns/<int:vpn_id>/sites/<int:site_id>/', VPNSiteView.as_view(), name='vpn-site-remove'),
 
+    # Provisioning job endpoints
+    path('jobs/', JobView.as_view(), name='job-list'),
+    path('jobs/<int:job_id>/', JobView.as_view(), name='job-detail'),
+    path('jobs/<int:job_id>/events/', JobEventsView.as_view(), name='job-events'),
+
     # DHCP service endpoints
     path('dhcp/start/', dhcp.start_dhcp_server, name='start-dhcp-server'),
     path('dhcp/stop/', dhcp.stop_dhcp_server, name='stop-dhcp-server'),
@@ -0,0 +1,66 @@
+import json
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+from core.models import ProvisioningJob
+from core.modules.jobs import ProvisioningJobs
+
+@method_decorator(csrf_exempt, name='dispatch')
+class JobView(View):
+    def get(self, request, job_id=None):
+        try:
+            # Get specific job
+            if job_id:
+                job = ProvisioningJobs.get(job_id)
+                if job is None:
+                    return JsonResponse({'message': 'Job not found'}, status=404)
+                return JsonResponse(job)
+
+            # List recent jobs
+            jobs = ProvisioningJob.objects.all()
+            status = request.GET.get('status')
+            if status:
+                jobs = jobs.filter(status=status)
+            limit = int(request.GET.get('limit', 50))
+
+            results = []
+            for job in jobs[:limit]:
+                # Only jobs still queued or running in this process have fresher state in memory
+                live = ProvisioningJobs.get_live(job.id) if job.status in ('queued', 'running') else None
+                results.append(live or ProvisioningJobs.serialize(job))
+
+            return JsonResponse(results, safe=False)
+
+        except Exception as e:
+            return JsonResponse({'message': str(e)}, status=500)
+
+class JobEventsView(View):
+    def get(self, request, job_id):
+        job = ProvisioningJobs.get(job_id)
+        if job is None:
+            return JsonResponse({'message': 'Job not found'}, status=404)
+
+        response = StreamingHttpResponse(self.stream(job), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream(self, job):
+        # Sends the job state every time it changes, until it is finished
+        yield f"data: {json.dumps(job)}\n\n"
+        version = job['version']
+        while job['status'] in ('queued', 'running'):
+            state = ProvisioningJobs.wait_for_change(job['id'], version)
+            if state is None:
+                # The job left the live state, its final state is stored
+                job = ProvisioningJobs.get(job['id'])
+                if job is None:
+                    return
+                yield f"data: {json.dumps(job)}\n\n"
+                return
+            if state['version'] == version:
+                yield ": keep-alive\n\n"
+                continue
+            job, version = state, state['version']
+            yield f"data: {json.dumps(job)}\n\n"
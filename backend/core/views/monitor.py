@@ -6,8 +6,34 @@ from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models import Q, F, Count
-from core.models import Router, Interface, RouterMetric, InterfaceMetric, Site, Customer
+from core.models import Router, Interface, RouterMetric, InterfaceMetric, RouterMetricRollup, InterfaceMetricRollup, LatestRouterMetric, LatestInterfaceMetric, Site, Customer
 from core.modules.monitor import NetworkMonitor
+from core.modules.rollup import ROUTER_FIELDS, INTERFACE_FIELDS
+from core.modules.metrics_writer import INTERFACE_VALUE_FIELDS
+
+# Interface counters are cumulative, so rollups report their last value instead of an average
+INTERFACE_COUNTER_FIELDS = ['in_octets', 'out_octets', 'in_errors', 'out_errors', 'in_discards', 'out_discards']
+
+def get_resolution(request, hours, count_raw):
+    max_points = request.GET.get('max_points')
+    return NetworkMonitor.metric_rollup.select_resolution(
+        hours * 3600,
+        count_raw,
+        request.GET.get('resolution', 'auto'),
+        int(max_points) if max_points else None
+    )
+
+def rollup_values(rollup, fields, counter_fields=()):
+    data = {}
+    for field in fields:
+        minimum, maximum, total, last = rollup.values.get(field, [0, 0, 0, 0])
+        if field in counter_fields:
+            data[field] = last
+        else:
+            data[field] = total / rollup.count if rollup.count else 0
+            data[f'{field}_min'] = minimum
+            data[f'{field}_max'] = maximum
+    return data
 
 @method_decorator(csrf_exempt, name='dispatch')
 class RouterMetricsView(View):
@@ -25,6 +51,20 @@ class RouterMetricsView(View):
                     timestamp__gte=since
                 ).order_by('timestamp')
 
+                # Long ranges are served from rollups to stay within the point budget
+                resolution = get_resolution(request, hours, metrics.count)
+                if resolution:
+                    rollups = NetworkMonitor.metric_rollup.get_series(RouterMetricRollup, router.id, since, resolution)
+                    return JsonResponse([{
+                        'id': rollup.id,
+                        'router_id': router.id,
+                        'hostname': router.hostname,
+                        'timestamp': rollup.bucket.isoformat(),
+                        'resolution': resolution,
+                        'samples': rollup.count,
+                        **rollup_values(rollup, ROUTER_FIELDS)
+                    } for rollup in rollups], safe=False)
+
                 metrics_data = [{
                     'id': metric.id,
                     'router_id': router.id,
@@ -45,31 +85,29 @@ class RouterMetricsView(View):
 
                 return JsonResponse(metrics_data, safe=False)
             else:
-                # Get latest metrics for all routers
-                latest_metrics = []
-                for router in Router.objects.all():
-                    latest_metric = RouterMetric.objects.filter(router=router).order_by('-timestamp').first()
-                    if latest_metric:
-                        latest_metrics.append({
-                            'id': latest_metric.id,
-                            'router_id': router.id,
-                            'hostname': router.hostname,
-                            'timestamp': latest_metric.timestamp.isoformat(),
-                            'cpu_usage_5s': latest_metric.cpu_usage_5s or 0,
-                            'cpu_usage_1m': latest_metric.cpu_usage_1m or 0,
-                            'cpu_usage_5m': latest_metric.cpu_usage_5m or 0,
-                            'mem_used_percent': latest_metric.mem_used_percent or 0,
-                            'mem_total': latest_metric.mem_total or 0,
-                            'mem_used': latest_metric.mem_used or 0,
-                            'mem_free': latest_metric.mem_free or 0,
-                            'storage_used_percent': latest_metric.storage_used_percent or 0,
-                            'storage_total': latest_metric.storage_total or 0,
-                            'storage_used': latest_metric.storage_used or 0,
-                            'storage_free': latest_metric.storage_free or 0
-                        })
+                # Get latest metrics for all routers in a single query
+                latest_metrics = [{
+                    'id': latest_metric.metric_id,
+                    'router_id': latest_metric.router_id,
+                    'hostname': latest_metric.router.hostname,
+                    'timestamp': latest_metric.timestamp.isoformat(),
+                    'cpu_usage_5s': latest_metric.cpu_usage_5s or 0,
+                    'cpu_usage_1m': latest_metric.cpu_usage_1m or 0,
+                    'cpu_usage_5m': latest_metric.cpu_usage_5m or 0,
+                    'mem_used_percent': latest_metric.mem_used_percent or 0,
+                    'mem_total': latest_metric.mem_total or 0,
+                    'mem_used': latest_metric.mem_used or 0,
+                    'mem_free': latest_metric.mem_free or 0,
+                    'storage_used_percent': latest_metric.storage_used_percent or 0,
+                    'storage_total': latest_metric.storage_total or 0,
+                    'storage_used': latest_metric.storage_used or 0,
+                    'storage_free': latest_metric.storage_free or 0
+                } for latest_metric in LatestRouterMetric.objects.select_related('router').order_by('router__hostname')]
 
                 return JsonResponse(latest_metrics, safe=False)
 
+        except ValueError as e:
+            return JsonResponse({'message': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'message': str(e)}, status=500)
 
@@ -89,6 +127,18 @@ class InterfaceMetricsView(View):
                     timestamp__gte=since
                 ).order_by('timestamp')
 
+                # Long ranges are served from rollups to stay within the point budget
+                resolution = get_resolution(request, hours, metrics.count)
+                if resolution:
+                    rollups = NetworkMonitor.metric_rollup.get_series(InterfaceMetricRollup, interface.id, since, resolution)
+                    return JsonResponse([{
+                        'timestamp': rollup.bucket.isoformat(),
+                        'operational_status': rollup.operational_status,
+                        'resolution': resolution,
+                        'samples': rollup.count,
+                        **rollup_values(rollup, INTERFACE_FIELDS, INTERFACE_COUNTER_FIELDS)
+                    } for rollup in rollups], safe=False)
+
                 metrics_data = [{
                     'timestamp': metric.timestamp.isoformat(),
                     'operational_status': metric.operational_status,
@@ -104,30 +154,31 @@ class InterfaceMetricsView(View):
 
                 return JsonResponse(metrics_data, safe=False)
             else:
-                # Get latest metrics for all interfaces
-                latest_metrics = []
-                for interface in Interface.objects.select_related('router').all():
-                    latest_metric = InterfaceMetric.objects.filter(interface=interface).order_by('-timestamp').first()
-                    if latest_metric:
-                        latest_metrics.append({
-                            'interface_id': interface.id,
-                            'name': interface.name,
-                            'router_id': interface.router.id,
-                            'router_hostname': interface.router.hostname,
-                            'timestamp': latest_metric.timestamp.isoformat(),
-                            'operational_status': latest_metric.operational_status,
-                            'in_octets': latest_metric.in_octets,
-                            'out_octets': latest_metric.out_octets,
-                            'in_errors': latest_metric.in_errors,
-                            'out_errors': latest_metric.out_errors,
-                            'in_discards': latest_metric.in_discards,
-                            'out_discards': latest_metric.out_discards,
-                            'bps_in': latest_metric.bps_in,
-                            'bps_out': latest_metric.bps_out
-                        })
+                # Get latest metrics for all interfaces in a single query, as plain rows since this list can be large
+                latest_metrics = [{
+                    'interface_id': latest_metric['interface_id'],
+                    'name': latest_metric['interface__name'],
+                    'router_id': latest_metric['interface__router_id'],
+                    'router_hostname': latest_metric['interface__router__hostname'],
+                    'timestamp': latest_metric['timestamp'].isoformat(),
+                    'operational_status': latest_metric['operational_status'],
+                    'in_octets': latest_metric['in_octets'],
+                    'out_octets': latest_metric['out_octets'],
+                    'in_errors': latest_metric['in_errors'],
+                    'out_errors': latest_metric['out_errors'],
+                    'in_discards': latest_metric['in_discards'],
+                    'out_discards': latest_metric['out_discards'],
+                    'bps_in': latest_metric['bps_in'],
+                    'bps_out': latest_metric['bps_out']
+                } for latest_metric in LatestInterfaceMetric.objects.order_by('interface_id').values(
+                    'interface_id', 'interface__name', 'interface__router_id', 'interface__router__hostname',
+                    *INTERFACE_VALUE_FIELDS
+                )]
 
                 return JsonResponse(latest_metrics, safe=False)
 
+        except ValueError as e:
+            return JsonResponse({'message': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'message': str(e)}, status=500)
 
@@ -146,27 +197,26 @@ class DashboardStatsView(View):
             high_memory_routers = []
             high_storage_routers = []
 
-            for router in Router.objects.all():
-                latest_metric = RouterMetric.objects.filter(router=router).order_by('-timestamp').first()
-                if latest_metric:
-                    if latest_metric.cpu_usage_5m >= 70:  # CPU threshold
-                        high_cpu_routers.append({
-                            'id': router.id,
-                            'hostname': router.hostname,
-                            'usage': latest_metric.cpu_usage_5m
-                        })
-                    if latest_metric.mem_used_percent >= 80:  # Memory threshold
-                        high_memory_routers.append({
-                            'id': router.id,
-                            'hostname': router.hostname,
-                            'usage': latest_metric.mem_used_percent
-                        })
-                    if latest_metric.storage_used_percent >= 80:  # Storage threshold
-                        high_storage_routers.append({
-                            'id': router.id,
-                            'hostname': router.hostname,
-                            'usage': latest_metric.storage_used_percent
-                        })
+            for latest_metric in LatestRouterMetric.objects.select_related('router').order_by('router__hostname'):
+                router = latest_metric.router
+                if latest_metric.cpu_usage_5m >= 70:  # CPU threshold
+                    high_cpu_routers.append({
+                        'id': router.id,
+                        'hostname': router.hostname,
+                        'usage': latest_metric.cpu_usage_5m
+                    })
+                if latest_metric.mem_used_percent >= 80:  # Memory threshold
+                    high_memory_routers.append({
+                        'id': router.id,
+                        'hostname': router.hostname,
+                        'usage': latest_metric.mem_used_percent
+                    })
+                if latest_metric.storage_used_percent >= 80:  # Storage threshold
+                    high_storage_routers.append({
+                        'id': router.id,
+                        'hostname': router.hostname,
+                        'usage': latest_metric.storage_used_percent
+                    })
 
             return JsonResponse({
                 'total_routers': total_routers,
@@ -44,6 +44,12 @@ class SetupStatusView(View):
             'bgp_as': settings.bgp_as,
             'monitoring_interval': settings.monitoring_interval,
             'discovery_interval': settings.discovery_interval,
+            'raw_metrics_retention_days': settings.raw_metrics_retention_days,
+            'rollup_1m_retention_days': settings.rollup_1m_retention_days,
+            'rollup_5m_retention_days': settings.rollup_5m_retention_days,
+            'rollup_1h_retention_days': settings.rollup_1h_retention_days,
+            'notification_retention_days': settings.notification_retention_days,
+            'retention_interval': settings.retention_interval,
         }
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -106,6 +112,11 @@ class SettingsSetupView(View):
                 'monitoring_interval', 'discovery_interval'
             ]
             
+            optional_fields = [
+                'raw_metrics_retention_days', 'rollup_1m_retention_days', 'rollup_5m_retention_days',
+                'rollup_1h_retention_days', 'notification_retention_days', 'retention_interval'
+            ]
+            
             # Check for missing or empty fields
             missing = [f for f in required_fields if not data.get(f)]
             if missing:
@@ -127,6 +138,12 @@ class SettingsSetupView(View):
                     'message': 'Discovery interval must be an integer'
                 }, status=400)
 
+            invalid = [f for f in optional_fields if data.get(f) is not None and (not isinstance(data[f], int) or isinstance(data[f], bool) or data[f] < 1)]
+            if invalid:
+                return JsonResponse({
+                    'message': f'Retention settings must be positive integers: {", ".join(invalid)}'
+                }, status=400)
+
             # Create settings
             settings = Settings(
                 restconf_username=data['restconf_username'],
@@ -144,6 +161,11 @@ class SettingsSetupView(View):
                 discovery_interval=data['discovery_interval'],
             )
 
+            # Retention settings are optional and keep their defaults when omitted
+            for field in optional_fields:
+                if data.get(field) is not None:
+                    setattr(settings, field, data[field])
+
             # Validate and save
             settings.save()
             
@@ -7,6 +7,52 @@ from django.utils.decorators import method_decorator
 from django.shortcuts import get_object_or_404
 from core.models import Site, Customer, Interface, OSPFProcess
 from core.modules.network_controller import NetworkController
+from core.modules.jobs import ProvisioningJobs
+
+def get_site(site_id):
+    # Jobs wait for their routers, so they read the site once they hold them instead of when they were queued
+    site = Site.objects.select_related('customer', 'assigned_interface__router', 'router', 'vrf').filter(id=site_id).first()
+    if site is None:
+        raise ValueError(f"Site {site_id} no longer exists")
+    return site
+
+def create_site(customer_id, interface_id, **kwargs):
+    # Runs as a provisioning job, the created site is reported as the job result
+    customer = Customer.objects.filter(id=customer_id).first()
+    interface = Interface.objects.select_related('router').filter(id=interface_id).first()
+    if customer is None or interface is None:
+        raise ValueError('Customer or assigned interface no longer exists')
+    site, success = NetworkController.create_site(customer=customer, interface=interface, **kwargs)
+    if not success:
+        return False, None
+    return True, {
+        'id': site.id,
+        'name': site.name,
+        'customer_id': site.customer.id,
+        'description': site.description,
+        'location': site.location,
+        'dhcp_scope': str(ipaddress.IPv4Network(f"{site.dhcp_scope.network}/{site.dhcp_scope.subnet_mask}", strict=False)),
+        'assigned_interface_id': site.assigned_interface.id,
+        'router_id': site.router.id if site.router else None,
+        'status' : site.assigned_interface.router.reachable
+    }
+
+def delete_site(site_id):
+    return NetworkController.delete_site(get_site(site_id))
+
+def enable_routing(site_id):
+    site = get_site(site_id)
+    if not site.router:
+        raise ValueError('Site has no assigned router')
+    if not site.assigned_interface:
+        raise ValueError('Site has no assigned interface')
+    return NetworkController.enable_routing(site)
+
+def disable_routing(site_id):
+    site = get_site(site_id)
+    if not site.has_routing:
+        raise ValueError('Site routing is not enabled')
+    return NetworkController.disable_routing(site)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class SiteView(View):
@@ -183,32 +229,23 @@ class SiteView(View):
                     'message': 'Invalid customer_id or assigned_interface_id'
                 }, status=400)
 
-            # Create site using NetworkController
-            site, success = NetworkController.create_site(
+            # Create site using NetworkController in the background
+            job = ProvisioningJobs.enqueue(
+                'create_site',
+                f"Create site {data['name']} for {customer.name}",
+                [interface.router.management_ip_address],
+                create_site,
+                customer.id,
+                interface.id,
                 name=data['name'],
-                customer=customer,
-                interface=interface,
                 description=data.get('description', ''),
                 location=data.get('location', '')
             )
 
-            if not success:
-                return JsonResponse({
-                    'message': 'Failed to create site'
-                }, status=500)
-
-            # Return site data
             return JsonResponse({
-                'id': site.id,
-                'name': site.name,
-                'customer_id': site.customer.id,
-                'description': site.description,
-                'location': site.location,
-                'dhcp_scope': str(ipaddress.IPv4Network(f"{site.dhcp_scope.network}/{site.dhcp_scope.subnet_mask}", strict=False)),
-                'assigned_interface_id': site.assigned_interface.id,
-                'router_id': site.router.id if site.router else None,
-                'status' : site.assigned_interface.router.reachable
-            }, status=201)
+                'message': f"Creation of site {data['name']} queued",
+                'job': ProvisioningJobs.get(job.id)
+            }, status=202)
         
         except json.JSONDecodeError:
             return JsonResponse({
@@ -268,22 +305,23 @@ class SiteView(View):
             # Get site
             site = get_object_or_404(Site, id=site_id)
             
-            # Store name for confirmation message
-            site_name = site.name
+            # Delete the site in the background
+            job = ProvisioningJobs.enqueue(
+                'delete_site',
+                f"Delete site {site.name}",
+                [
+                    site.assigned_interface.router.management_ip_address if site.assigned_interface else None,
+                    site.router.management_ip_address if site.router else None
+                ],
+                delete_site,
+                site.id
+            )
+
+            return JsonResponse({
+                'message': f'Deletion of site {site.name} queued',
+                'job': ProvisioningJobs.get(job.id)
+            }, status=202)
 
-            # Delete the site
-            success = NetworkController.delete_site(site)
-            
-            if success:
-                return JsonResponse({
-                    'message': f'Site {site_name} successfully deleted'
-                })
-            else:
-                if not success:
-                    return JsonResponse({
-                        'message': f'Failed to delete site'
-                    }, status=400)
-                
         except Exception as exception:
             return JsonResponse({
                     'message': f'Failed to delete site'
@@ -305,19 +343,19 @@ class SiteRoutingView(View):
                     'message': 'Site has no assigned interface'
                 }, status=400)
             
-            # Setup routing using NetworkController
-            success = NetworkController.enable_routing(site)
-            
-            if success:
-                site.has_routing = True
-                site.save()
-                return JsonResponse({
-                    'message': f'Successfully configured routing for site {site.name}'
-                })
-            else:
-                return JsonResponse({
-                    'message': 'Failed to configure routing'
-                }, status=500)
+            # Setup routing using NetworkController in the background
+            job = ProvisioningJobs.enqueue(
+                'enable_routing',
+                f"Enable routing for site {site.name}",
+                [site.assigned_interface.router.management_ip_address, site.router.management_ip_address],
+                enable_routing,
+                site.id
+            )
+
+            return JsonResponse({
+                'message': f'Routing configuration for site {site.name} queued',
+                'job': ProvisioningJobs.get(job.id)
+            }, status=202)
                 
         except Exception as e:
             return JsonResponse({
@@ -333,19 +371,22 @@ class SiteRoutingView(View):
                     'message': 'Site routing is not enabled'
                 }, status=400)
             
-            # Disable routing using NetworkController
-            success = NetworkController.disable_routing(site)
-            
-            if success:
-                site.has_routing = False
-                site.save()
-                return JsonResponse({
-                    'message': f'Successfully disabled routing for site {site.name}'
-                })
-            else:
-                return JsonResponse({
-                    'message': 'Failed to disable routing'
-                }, status=500)
+            # Disable routing using NetworkController in the background
+            job = ProvisioningJobs.enqueue(
+                'disable_routing',
+                f"Disable routing for site {site.name}",
+                [
+                    site.assigned_interface.router.management_ip_address if site.assigned_interface else None,
+                    site.router.management_ip_address if site.router else None
+                ],
+                disable_routing,
+                site.id
+            )
+
+            return JsonResponse({
+                'message': f'Routing removal for site {site.name} queued',
+                'job': ProvisioningJobs.get(job.id)
+            }, status=202)
                 
         except Exception as e:
             return JsonResponse({
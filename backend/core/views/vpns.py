@@ -5,6 +5,50 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from core.models import VPN, Site, Customer
 from core.modules.network_controller import NetworkController
+from core.modules.jobs import ProvisioningJobs
+from core.views.sites import get_site
+
+def provider_edge_address(site):
+    return site.assigned_interface.router.management_ip_address if site.assigned_interface else None
+
+def get_vpn(vpn_id):
+    # Like sites, the VPN is read once the job holds its routers
+    vpn = VPN.objects.select_related('customer').filter(id=vpn_id).first()
+    if vpn is None:
+        raise ValueError(f"VPN {vpn_id} no longer exists")
+    return vpn
+
+def update_vpn_sites(vpn_id, add_site_ids, remove_site_ids):
+    # Runs as a provisioning job, the result of every site is reported as the job result
+    vpn = get_vpn(vpn_id)
+    sites = Site.objects.filter(id__in=[*add_site_ids, *remove_site_ids]).select_related('vrf__router', 'assigned_interface__router', 'router').in_bulk()
+    results = NetworkController.update_vpn_sites(
+        vpn,
+        [sites[site_id] for site_id in add_site_ids if site_id in sites],
+        [sites[site_id] for site_id in remove_site_ids if site_id in sites]
+    )
+    for site_id in [*add_site_ids, *remove_site_ids]:
+        if site_id not in sites:
+            results[site_id] = {'success': False, 'message': f"Site {site_id} no longer exists"}
+    vpn.save()
+    return all(result['success'] for result in results.values()), {'sites': results}
+
+def delete_vpn(vpn_id):
+    return NetworkController.delete_vpn(get_vpn(vpn_id))
+
+def add_site_to_vpn(site_id, vpn_id):
+    site, vpn = get_site(site_id), get_vpn(vpn_id)
+    if vpn.customer_id and site.customer_id != vpn.customer_id:
+        raise ValueError('Site must belong to the same customer as the VPN')
+    if not site.vrf or not site.ospf_process_id:
+        raise ValueError('Site routing must be enabled before adding to VPN')
+    return NetworkController.add_site_to_vpn(site, vpn)
+
+def remove_site_from_vpn(site_id, vpn_id):
+    site, vpn = get_site(site_id), get_vpn(vpn_id)
+    if not vpn.sites.filter(id=site.id).exists():
+        raise ValueError('Site is not part of this VPN')
+    return NetworkController.remove_site_from_vpn(site, vpn)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class VPNView(View):
@@ -113,41 +157,41 @@ class VPNView(View):
                 current_site_ids = set(vpn.sites.values_list('id', flat=True))
                 
                 # Sites to add
-                sites_to_add = new_site_ids - current_site_ids
-                for site_id in sites_to_add:
-                    try:
-                        site = Site.objects.get(id=site_id)
-                        if site.customer != vpn.customer:
-                            return JsonResponse({
-                                'error': f'Site {site_id} belongs to a different customer'
-                            }, status=400)
-                        if not site.vrf or not site.ospf_process_id:
-                            return JsonResponse({
-                                'error': f'Site {site_id} routing must be enabled before adding to VPN'
-                            }, status=400)
-                        if not NetworkController.add_site_to_vpn(site, vpn):
-                            return JsonResponse({
-                                'error': f'Failed to add site {site_id} to VPN'
-                            }, status=500)
-                    except Site.DoesNotExist:
+                sites_to_add = Site.objects.filter(id__in=new_site_ids - current_site_ids).select_related('vrf__router', 'assigned_interface__router')
+                if len(sites_to_add) != len(new_site_ids - current_site_ids):
+                    missing_ids = (new_site_ids - current_site_ids) - {site.id for site in sites_to_add}
+                    return JsonResponse({
+                        'error': f'Site {min(missing_ids)} not found'
+                    }, status=404)
+                for site in sites_to_add:
+                    if site.customer_id != vpn.customer_id:
+                        return JsonResponse({
+                            'error': f'Site {site.id} belongs to a different customer'
+                        }, status=400)
+                    if not site.vrf or not site.ospf_process_id:
                         return JsonResponse({
-                            'error': f'Site {site_id} not found'
-                        }, status=404)
+                            'error': f'Site {site.id} routing must be enabled before adding to VPN'
+                        }, status=400)
                 
                 # Sites to remove
-                sites_to_remove = current_site_ids - new_site_ids
-                for site_id in sites_to_remove:
-                    try:
-                        site = Site.objects.get(id=site_id)
-                        if not NetworkController.remove_site_from_vpn(site, vpn):
-                            return JsonResponse({
-                                'error': f'Failed to remove site {site_id} from VPN'
-                            }, status=500)
-                    except Site.DoesNotExist:
-                        pass  # Skip if site no longer exists
+                sites_to_remove = Site.objects.filter(id__in=current_site_ids - new_site_ids).select_related('vrf__router', 'assigned_interface__router')
 
-                # Update the VPN's sites m2m field to match the new set
-                vpn.sites.set(list(new_site_ids))
+                # Membership changes are pushed in bulk in the background
+                if sites_to_add or sites_to_remove:
+                    vpn.save()
+                    job = ProvisioningJobs.enqueue(
+                        'update_vpn_sites',
+                        f"Add {len(sites_to_add)} sites to and remove {len(sites_to_remove)} sites from VPN {vpn.name}",
+                        [provider_edge_address(site) for site in [*sites_to_add, *sites_to_remove]],
+                        update_vpn_sites,
+                        vpn.id,
+                        [site.id for site in sites_to_add],
+                        [site.id for site in sites_to_remove]
+                    )
+                    return JsonResponse({
+                        'message': 'VPN site changes queued',
+                        'job': ProvisioningJobs.get(job.id)
+                    }, status=202)
             
             vpn.save()
             
@@ -183,10 +227,14 @@ class VPNView(View):
             if vpn.discovered:
                 return JsonResponse({'error': 'Cannot delete discovered VPNs'}, status=400)
             
-            if NetworkController.delete_vpn(vpn):
-                return JsonResponse({'message': 'VPN deleted successfully'})
-            else:
-                return JsonResponse({'error': 'Failed to delete VPN'}, status=500)
+            job = ProvisioningJobs.enqueue(
+                'delete_vpn',
+                f"Delete VPN {vpn.name}",
+                [provider_edge_address(site) for site in vpn.sites.all()],
+                delete_vpn,
+                vpn.id
+            )
+            return JsonResponse({'message': 'VPN deletion queued', 'job': ProvisioningJobs.get(job.id)}, status=202)
             
         except VPN.DoesNotExist:
             return JsonResponse({'error': 'VPN not found'}, status=404)
@@ -218,10 +266,15 @@ class VPNSiteView(View):
             if not site.vrf or not site.ospf_process_id:
                 return JsonResponse({'error': 'Site routing must be enabled before adding to VPN'}, status=400)
             
-            if NetworkController.add_site_to_vpn(site, vpn):
-                return JsonResponse({'message': 'Site added to VPN successfully'})
-            else:
-                return JsonResponse({'error': 'Failed to add site to VPN'}, status=500)
+            job = ProvisioningJobs.enqueue(
+                'add_site_to_vpn',
+                f"Add site {site.name} to VPN {vpn.name}",
+                [provider_edge_address(site)],
+                add_site_to_vpn,
+                site.id,
+                vpn.id
+            )
+            return JsonResponse({'message': 'Adding site to VPN queued', 'job': ProvisioningJobs.get(job.id)}, status=202)
             
         except (VPN.DoesNotExist, Site.DoesNotExist):
             return JsonResponse({'error': 'VPN or Site not found'}, status=404)
@@ -237,10 +290,15 @@ class VPNSiteView(View):
             if site not in vpn.sites.all():
                 return JsonResponse({'error': 'Site is not part of this VPN'}, status=400)
             
-            if NetworkController.remove_site_from_vpn(site, vpn):
-                return JsonResponse({'message': 'Site removed from VPN successfully'})
-            else:
-                return JsonResponse({'error': 'Failed to remove site from VPN'}, status=500)
+            job = ProvisioningJobs.enqueue(
+                'remove_site_from_vpn',
+                f"Remove site {site.name} from VPN {vpn.name}",
+                [provider_edge_address(site)],
+                remove_site_from_vpn,
+                site.id,
+                vpn.id
+            )
+            return JsonResponse({'message': 'Removing site from VPN queued', 'job': ProvisioningJobs.get(job.id)}, status=202)
             
         except (VPN.DoesNotExist, Site.DoesNotExist):
             return JsonResponse({'error': 'VPN or Site not found'}, status=404)
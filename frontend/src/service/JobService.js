@@ -0,0 +1,41 @@
+import axios from 'axios'
+
+const API_URL = 'http://127.0.0.1:8000/api/jobs/'
+
+export default {
+  /**
+   * Fetch a provisioning job
+   * @param {number} id - Job ID
+   * @returns {Promise<Object>} Job status, progress events and result
+   */
+  async getJob(id) {
+    try {
+      const response = await axios.get(`${API_URL}${id}/`)
+      return response.data
+    } catch (error) {
+      console.error('Error fetching job:', error)
+      throw error
+    }
+  },
+
+  /**
+   * Wait for a provisioning job to finish
+   * @param {number} id - Job ID
+   * @param {number} interval - Polling interval in milliseconds
+   * @returns {Promise<Object>} The finished job, rejects if the job failed
+   */
+  async waitForJob(id, interval = 1000) {
+    let job = await this.getJob(id)
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, interval))
+      job = await this.getJob(id)
+    }
+    if (job.status === 'failed') {
+      const error = new Error(job.error || 'Provisioning job failed')
+      error.response = { data: { message: error.message, error: error.message } }
+      error.job = job
+      throw error
+    }
+    return job
+  },
+}
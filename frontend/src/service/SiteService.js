@@ -1,4 +1,5 @@
 import axios from 'axios'
+import JobService from './JobService'
 
 const API_URL = 'http://127.0.0.1:8000/api/sites/'
 
@@ -35,7 +36,8 @@ export default {
   async createSite(site) {
     try {
       const response = await axios.post(API_URL, site)
-      return response.data
+      const job = await JobService.waitForJob(response.data.job.id)
+      return job.result
     } catch (error) {
       console.error('Error creating site:', error)
       throw error
@@ -65,7 +67,8 @@ export default {
    */
   async deleteSite(id) {
     try {
-      await axios.delete(`${API_URL}${id}/`)
+      const response = await axios.delete(`${API_URL}${id}/`)
+      await JobService.waitForJob(response.data.job.id)
     } catch (error) {
       console.error('Error deleting site:', error)
       throw error
@@ -76,7 +79,7 @@ export default {
    * Enable routing for a site
    * @param {number} siteId - Site ID
    * @param {Object} params - Routing parameters
-   * @returns {Promise<Object>} Response data
+   * @returns {Promise<Object>} The finished provisioning job
    */
   async enableRouting(siteId, params = {}) {
     try {
@@ -84,6 +87,9 @@ export default {
         `http://127.0.0.1:8000/api/sites/${siteId}/enable-routing/`,
         params
       )
+      if (response.status === 202) {
+        return await JobService.waitForJob(response.data.job.id)
+      }
       return response.data
     } catch (error) {
       console.error('Error enabling routing for site:', error)
@@ -94,13 +100,16 @@ export default {
   /**
    * Disable routing for a site
    * @param {number} siteId - Site ID
-   * @returns {Promise<Object>} Response data
+   * @returns {Promise<Object>} The finished provisioning job
    */
   async disableRouting(siteId) {
     try {
       const response = await axios.delete(
         `http://127.0.0.1:8000/api/sites/${siteId}/enable-routing/`,
       )
+      if (response.status === 202) {
+        return await JobService.waitForJob(response.data.job.id)
+      }
       return response.data
     } catch (error) {
       console.error('Error disabling routing for site:', error)
@@ -1,4 +1,5 @@
 import axios from 'axios'
+import JobService from './JobService'
 
 const API_URL = 'http://127.0.0.1:8000/api/vpns/'
 
@@ -31,7 +32,8 @@ export default {
 
   async deleteVPN(id) {
     try {
-      await axios.delete(`${API_URL}${id}/`)
+      const response = await axios.delete(`${API_URL}${id}/`)
+      await JobService.waitForJob(response.data.job.id)
       return true
     } catch (error) {
       throw error
@@ -41,6 +43,10 @@ export default {
   async updateVPN(id, vpnData) {
     try {
       const response = await axios.patch(`${API_URL}${id}/`, vpnData)
+      if (response.status === 202) {
+        const job = await JobService.waitForJob(response.data.job.id)
+        return job.result
+      }
       return response.data
     } catch (error) {
       if (error.response?.status === 405) {